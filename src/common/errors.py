@@ -27,6 +27,13 @@ class SourceError(CompileError):
 class LexError(SourceError): pass
 class SynError(SourceError): pass
 
+class ErrorReport(CompileError):
+    ''' All errors found in a program, in source order. '''
+    def __init__(self, errors):
+        self.errors = sorted(errors, key=lambda error: error.linepos)
+    def __str__(self):
+        return '\n'.join(str(error) for error in self.errors)
+
 E_PAR_MISMATCH = 'Parenthesis mismatch'
 E_RESERVED_NAME = 'Identifier \'{0}\' is reserved and not allowed for using'
 E_CALL = 'Called object is neither a procedure nor a function'
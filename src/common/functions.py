@@ -6,29 +6,42 @@ import functools
 def quote(string):
     return '"' + string + '"'
 
+# body of an initializer without any code besides docstring
+_empty_code = (lambda: None).__code__.co_code
+
 def copy_args(func):
-    ''' Initializes object attributes by the initializer signature '''
+    ''' Initializes object attributes by the initializer signature.
+
+    The initializer is generated once per class from the signature, so
+    creating an object costs as much as a hand-written initializer does.
+    It only assigns attributes, so it works for classes with __slots__;
+    names of the copied arguments are available as __init__.argnames. '''
     argspec = inspect.getargspec(func)
     argnames = argspec.args[1:]
+    defaults = argspec.defaults or ()
+
+    params = ['self'] + argnames[:len(argnames) - len(defaults)]
+    namespace = {'_func': func}
+    for i, name in enumerate(argnames[len(argnames) - len(defaults):]):
+        namespace['_default{0}'.format(i)] = defaults[i]
+        params.append('{0}=_default{1}'.format(name, i))
+    call = ['self'] + argnames
+    if argspec.varargs:
+        params.append('*' + argspec.varargs)
+        call.append('*' + argspec.varargs)
+    if argspec.keywords:
+        params.append('**' + argspec.keywords)
+        call.append('**' + argspec.keywords)
+
+    body = ['self.{0} = {0}'.format(name) for name in argnames]
+    if func.__code__.co_code != _empty_code:
+        body.append('_func({0})'.format(', '.join(call)))
+    source = 'def __init__({0}):\n    {1}\n'.format(
+        ', '.join(params), '\n    '.join(body or ['pass']))
+    exec source in namespace
 
-    if argspec.defaults:
-        defaults = dict(zip(argnames[-len(argspec.defaults):], argspec.defaults))
-    else:
-        defaults = {}
-
-    @functools.wraps(func)
-    def __init__(self, *args, **kwargs):
-        args_it = iter(args)
-        for key in argnames:
-            if key in kwargs:
-                value = kwargs[key]
-            else:
-                try:
-                    value = args_it.next()
-                except StopIteration:
-                    value = defaults[key]
-            setattr(self, key, value)
-        func(self, *args, **kwargs)
+    __init__ = functools.wraps(func)(namespace['__init__'])
+    __init__.argnames = tuple(argnames)
     return __init__
 
 def rlist(list_):
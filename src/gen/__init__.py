@@ -1 +1 @@
-__all__ = ['asm', 'main', 'optimizer']
+__all__ = ['allocator', 'asm', 'main', 'optimizer', 'ssa', 'sse']
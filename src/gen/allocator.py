@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+from common.functions import copy_args
+from tok.token import tt
+from syn.tree import *
+from syn.table import *
+from syn.visitor import Visitor
+
+# registers preserved by called functions, printf keeps them too
+CALLEE_SAVED = ('ebx', 'esi', 'edi')
+
+def base_type(symbol):
+    type_ = symbol.type
+    while isinstance(type_, SymTypeAlias):
+        type_ = type_.type
+    return type_
+
+def is_integer(symbol):
+    return isinstance(base_type(symbol), SymTypeInt)
+
+def is_real(symbol):
+    return isinstance(base_type(symbol), SymTypeReal)
+
+class RegisterAllocator(Visitor):
+    ''' Keeps variables of a function or of the main program in registers,
+    callee-saved ones by default. Live range of a variable is the part of
+    the body from its first to its last occurrence, extended to cover every
+    loop it is used in, as the value may be needed by the next iteration.
+    Ranges are given registers by linear scan, when registers are not
+    enough the variable used least often in loops stays in memory. '''
+
+    @copy_args
+    def __init__(self, get_symbol, registers=CALLEE_SAVED):
+        pass
+
+    def scan(self, body):
+        # numbers nodes of the body in the order code is generated for them
+        self.position = 0
+        self.branches = self.depth = 0
+        self.ranges = {}
+        self.weights = {}
+        self.loops = []
+        self.escaped = set()
+        self.defined = set()
+        self.walk(self.handlers, body)
+
+    def references(self, body):
+        ''' Symbols of variables used in the body. '''
+        self.scan(body)
+        return set(self.ranges)
+
+    def allocate(self, body, candidates, initialized=()):
+        ''' Maps variables among candidates to registers. Initialized
+        variables have values at the start of the body, those of them in
+        self.loaded are read before assigned and have to be loaded into
+        their registers first. '''
+        self.scan(body)
+        intervals = []
+        for symbol, (start, end) in self.ranges.iteritems():
+            if symbol not in candidates or symbol in self.escaped:
+                continue
+            if symbol in initialized and symbol not in self.defined:
+                start = 0
+            start, end = self.extend([start, end])
+            intervals.append((start, end, symbol.name, symbol))
+        intervals.sort()
+        allocation, active = {}, []
+        free = list(reversed(self.registers))
+        for start, end, _, symbol in intervals:
+            for interval in active[:]:
+                if interval[0] < start:
+                    active.remove(interval)
+                    free.append(allocation[interval[2]])
+            if free:
+                allocation[symbol] = free.pop()
+                active.append((end, symbol.name, symbol))
+                continue
+            interval = (end, symbol.name, symbol)
+            spilled = min(active + [interval], key=lambda interval:
+                (self.weights[interval[2]], -interval[0]))
+            if spilled is not interval:
+                allocation[symbol] = allocation.pop(spilled[2])
+                active.remove(spilled)
+                active.append(interval)
+        self.loaded = [symbol for symbol in initialized
+            if symbol in allocation and symbol not in self.defined]
+        return allocation
+
+    def extend(self, interval):
+        changed = True
+        while changed:
+            changed = False
+            for start, end in self.loops:
+                if (interval[0] <= end and interval[1] >= start and
+                    (interval[0] > start or interval[1] < end)
+                ):
+                    interval[0] = min(interval[0], start)
+                    interval[1] = max(interval[1], end)
+                    changed = True
+        return interval
+
+    def count(self):
+        self.position += 1
+        return self.position
+
+    def use(self, symbol, assigned=False):
+        position = self.count()
+        if symbol not in self.ranges:
+            self.ranges[symbol] = [position, position]
+            # value assigned on every path replaces the initial one
+            if assigned and not self.branches:
+                self.defined.add(symbol)
+        self.ranges[symbol][1] = position
+        # uses in loops are run many times
+        self.weights[symbol] = self.weights.get(symbol, 0) + 10 ** self.depth
+
+    def visit_variable(self, var):
+        self.use(self.get_symbol(var))
+
+    def visit_call(self, call):
+        self.count()
+        args = self.get_symbol(call.caller).args
+        for arg, formal in zip(call.args, args):
+            if not formal.by_value and isinstance(arg, SynVar):
+                # address of the variable is passed
+                self.escaped.add(self.get_symbol(arg))
+            yield arg
+
+    def visit_operation(self, expr):
+        self.count()
+        if expr.operation.type != tt.assign:
+            for op in expr.operands:
+                yield op
+            return
+        # target is written after the value is computed
+        left, right = expr.operands
+        yield right
+        if type(left) is SynVar:
+            self.use(self.get_symbol(left), assigned=True)
+        else:
+            yield left
+
+    def visit_branches(self, stmt, *children):
+        # children are not run on every path through the body
+        start = self.count()
+        loop = not isinstance(stmt, SynStatementIf)
+        self.branches += 1
+        self.depth += loop
+        for child in children:
+            if child is not None:
+                yield child
+        self.branches -= 1
+        self.depth -= loop
+        if loop:
+            self.loops.append((start, self.count()))
+
+    def visit_for(self, stmt):
+        yield stmt.assignment
+        # counter is incremented after the action
+        yield self.visit_branches(stmt, stmt.check, stmt.action, stmt.counter)
+
+    def visit_children(self, node, *children):
+        self.count()
+        for child in children:
+            yield child
+
+    handlers = {
+        SynConst: lambda self, expr: self.count(),
+        SynVar: visit_variable,
+        SynCall: visit_call,
+        SynOperation: visit_operation,
+        SynSubscript: lambda self, expr:
+            self.visit_children(expr, expr.array, expr.index),
+        SynFieldRequest: lambda self, expr:
+            self.visit_children(expr, expr.record),
+        SynCastToReal: lambda self, expr:
+            self.visit_children(expr, expr.expression),
+        SynStatementBlock: lambda self, stmt:
+            self.visit_children(stmt, *stmt.statements),
+        SynStatementIf: lambda self, stmt: self.visit_branches(
+            stmt, stmt.condition, stmt.action, stmt.else_action),
+        SynStatementWhile: lambda self, stmt:
+            self.visit_branches(stmt, stmt.condition, stmt.action),
+        SynStatementRepeat: lambda self, stmt:
+            self.visit_branches(stmt, stmt.action, stmt.condition),
+        SynStatementFor: visit_for,
+        SynStatementWrite: lambda self, stmt:
+            self.visit_children(stmt, *stmt.args),
+        SynStatementResult: lambda self, stmt:
+            self.visit_children(stmt, stmt.value),
+        SynNode: lambda self, stmt: self.count(),
+    }
@@ -4,13 +4,18 @@ import sys
 import os
 import StringIO
 import functools
+import struct
 
 from common.errors import GenError
 from common.functions import copy_args
 from tok.token import tt
 from syn.tree import *
 from syn.table import *
-from optimizer import Optimizer
+from syn.constants import constant_value
+from syn.visitor import Visitor, Return
+from optimizer import Optimizer, REGISTERS
+from allocator import RegisterAllocator, CALLEE_SAVED, is_integer
+from ssa import SSA
 import asm
 
 
@@ -28,16 +33,122 @@ if is_windows():
 else:
     HEADER = open(os.path.join(FASM_PATH, 'nix32header.asm')).read()
 
-
-class Generator(object):
+# registers which have the lowest byte addressable
+BYTE_REGISTERS = {'eax': 'al', 'ebx': 'bl', 'ecx': 'cl', 'edx': 'dl'}
+
+# condition codes of comparisons of signed integers and of reals
+INTEGER_CONDITIONS = {
+    tt.equal:            'e',
+    tt.not_equal:        'ne',
+    tt.less:             'l',
+    tt.less_or_equal:    'le',
+    tt.greater:          'g',
+    tt.greater_or_equal: 'ge',
+}
+REAL_CONDITIONS = {
+    tt.equal:            'e',
+    tt.not_equal:        'ne',
+    tt.less:             'b',
+    tt.less_or_equal:    'be',
+    tt.greater:          'a',
+    tt.greater_or_equal: 'ae',
+}
+# comparisons of swapped operands
+SWAPPED_CONDITIONS = {
+    tt.equal:            tt.equal,
+    tt.not_equal:        tt.not_equal,
+    tt.less:             tt.greater,
+    tt.less_or_equal:    tt.greater_or_equal,
+    tt.greater:          tt.less,
+    tt.greater_or_equal: tt.less_or_equal,
+}
+# jumps taken when integer comparison is false
+FALSE_JUMPS = {
+    tt.equal:            'jne',
+    tt.not_equal:        'je',
+    tt.less:             'jge',
+    tt.less_or_equal:    'jg',
+    tt.greater:          'jle',
+    tt.greater_or_equal: 'jl',
+}
+REAL_FALSE_JUMPS = {
+    tt.equal:            'jne',
+    tt.not_equal:        'je',
+    tt.less:             'jae',
+    tt.less_or_equal:    'ja',
+    tt.greater:          'jbe',
+    tt.greater_or_equal: 'jb',
+}
+
+# operations done in place on a variable kept in register
+UPDATE_COMMANDS = {
+    tt.plus:      'add',
+    tt.minus:     'sub',
+    tt.mul:       'imul',
+    tt.logic_xor: 'xor',
+}
+COMMUTATIVE = set([tt.plus, tt.mul, tt.logic_xor])
+
+FLOAT_COMMANDS = {
+    tt.plus:  'fadd',
+    tt.minus: 'fsub',
+    tt.mul:   'fmul',
+    tt.div:   'fdiv',
+}
+# size of the FPU register stack
+FPU_REGISTERS = 8
+# FPU control word: exceptions masked, single precision, rounding to nearest.
+# Precision control rounds significands of results to 24 bits, but values
+# on the FPU stack keep the 15-bit exponent: they overflow and underflow as
+# 32-bit reals only when they leave the FPU, stored to a variable, passed
+# to a function or written
+FPU_CONTROL = 0x7f
+
+# integer operations taking the right operand from an instruction
+# argument, the rest of operations need it in a register
+IMMEDIATE_OPERANDS = set(INTEGER_CONDITIONS) | set([
+    tt.assign, tt.plus, tt.minus, tt.mul, tt.logic_or, tt.logic_and,
+    tt.logic_xor, tt.shl, tt.shr])
+MEMORY_OPERANDS = set(INTEGER_CONDITIONS) | set([
+    tt.assign, tt.plus, tt.minus, tt.mul, tt.int_div, tt.int_mod,
+    tt.logic_or, tt.logic_xor])
+
+def real_bits(value):
+    # reals are 32-bit floats, their bits are used as immediate values;
+    # type name used as a value is left as it is, like integer ones
+    if not isinstance(value, (int, long, float)):
+        return value
+    return struct.unpack('<I', struct.pack('<f', value))[0]
+
+def combine(first, second):
+    # registers needed for two values kept at the same time
+    if first == second:
+        return first + 1
+    return max(first, second)
+
+class Generator(Visitor):
     @copy_args
     def __init__(self, program, parser, enable_optimizer=False):
         self.instructions = []
         self.declarations = []
         self.loops = []
         self.string_consts = {}
+        self.real_consts = {}
         self.output = StringIO.StringIO()
         self.label_count = 0
+        # registers needed by expressions, see need()
+        self.needs = {}
+        # variables of the current body kept in registers, the rest of
+        # registers is used by expressions
+        self.registers = {}
+        self.pool = REGISTERS
+        self.variable_registers = set()
+        # FPU registers needed by real expressions and FPU registers taken
+        # by values waiting for the expression being generated
+        self.fpu_needs = {}
+        self.fpu = 0
+        # whether expressions call functions and read memory, see effects()
+        self.effects_cache = {}
 
     def get_type(self, *expressions):
         return map(self.parser.expr_type, *expressions)
@@ -63,6 +174,15 @@ class Generator(object):
             self.allocate(name, string_, dup=False)
         return name
 
+    def allocate_real(self, value):
+        # FPU instructions take constants from memory
+        bits = real_bits(value)
+        if bits not in self.real_consts:
+            self.real_consts[bits] = 'F' + str(len(self.real_consts))
+            self.declarations.append(asm.Declaration(
+                self.real_consts[bits], bits, False, 'dd'))
+        return self.memory(asm.Offset(self.real_consts[bits]))
+
     def get_labels(self, count=1):
         result = []
         for i in range(count):
@@ -104,8 +224,10 @@ class Generator(object):
             type_ = type_.type
         return '{0}${1}'.format(self.TYPE2STR[type(type_)], name)
 
-    def get_variable_name(self, name):
-        symbol = self.parser.find_symbol(name)
+    def get_symbol(self, var):
+        return var.resolve(self.parser.symtable_stack)
+
+    def get_variable_name(self, symbol):
         if isinstance(symbol, SymFunctionArgument):
             return symbol.name
         else:
@@ -119,27 +241,40 @@ class Generator(object):
                 if isinstance(type_, stype))
 
         variables = generator(SymVar)
-        functions = generator(SymTypeFunction)
+        functions = list(generator(SymTypeFunction))
 
         # reserve memory for global variables
         for name, type_ in variables:
+            if isinstance(type_, SymConst) and constant_value(type_) is not None:
+                continue # value of constant is substituted into expressions
             gen_name = self.generate_variable_name(name, type_.type)
             self.allocate(gen_name, type_.size)
             self.parser.symtable[name].gen_name = gen_name
 
+        # functions are named first, any of them can call any other
+        shared = set()
+        for name, type_ in functions:
+            type_.gen_name = self.generate_variable_name(name, type_)
+            # globals used by functions are changed by calls
+            self.parser.symtable_stack.append(type_.table)
+            shared |= RegisterAllocator(self.get_symbol).references(type_.body)
+            self.parser.symtable_stack.pop()
+
         # generate functions
         for name, type_ in functions:
-            gen_name = self.generate_variable_name(name, type_)
-            self.parser.symtable[name].gen_name = gen_name
             self.parser.symtable_stack.append(type_.table)
-            self.generate_label(gen_name)
+            self.generate_label(type_.gen_name)
             self.cmd(
                 ('push', 'ebp'),
                 ('sub', 'esp', 4), # for function result
                 ('mov', 'ebp', 'esp'),
                 ('sub', 'esp', type_.declarations.size),
             )
-            self.generate_statement(type_.body)
+            arguments = [arg for arg in type_.args if arg.by_value]
+            type_.body = self.generate_body(type_.body,
+                [symbol for symbol in type_.declarations.itervalues()
+                    if type(symbol) is SymVar] + arguments,
+                arguments)
             self.cmd(
                 ('add', 'esp', type_.declarations.size),
                 ('pop', 'eax'), # function result
@@ -150,7 +285,28 @@ class Generator(object):
             self.parser.symtable_stack.pop()
 
         self.generate_label('main')
-        self.generate_statement(self.program)
+        start = len(self.instructions)
+        variables = sorted(
+            (symbol for name, symbol in self.parser.symtable.iteritems()
+                if type(symbol) is SymVar and symbol not in shared),
+            key=lambda symbol: symbol.name)
+        # global variables are zeroed at start
+        self.program = self.generate_body(
+            self.program, variables, variables, variables)
+        if any(isinstance(command, asm.Command) and
+            command.mnem.startswith('f') for command in self.instructions
+        ):
+            # control word of the caller is restored at the end
+            self.declarations.extend((
+                asm.Declaration('FPU', FPU_CONTROL, False, 'dw'),
+                asm.Declaration('FPU_CALLER', 0, False, 'dw'),
+            ))
+            word = lambda name: asm.SizeCast('word', asm.Offset(name))
+            self.instructions[start:start] = [
+                asm.Command('fnstcw', word('FPU_CALLER')),
+                asm.Command('fldcw', word('FPU')),
+            ]
+            self.cmd('fldcw', word('FPU_CALLER'))
 
         if is_windows():
             self.cmd('stdcall', asm.Offset('ExitProcess'), 0)
@@ -174,428 +330,914 @@ class Generator(object):
         if is_windows():
             self.output.write("section '.code' readable executable\n\n")
         if self.enable_optimizer:
-            self.instructions = Optimizer(self.instructions).optimize()
+            self.instructions = Optimizer(
+                self.instructions, self.variable_registers).optimize()
         write_list(self.instructions)
 
         self.output.write('\n')
         return self.output.getvalue()
 
-    def generate_statement(self, stmt, lvalue=False):
+    def generate_statement(self, stmt):
+        self.walk(self.handlers, stmt)
 
-        def jump_if_zero(label):
-            self.cmd(
-                ('pop', 'eax'),
-                ('test', 'eax', 'eax'),
-                ('jz', label),
-            )
+    # registers keeping variables, kinds of variables kept in them and
+    # commands loading the variables
+    VARIABLE_REGISTERS = (
+        (CALLEE_SAVED, is_integer, 'mov'),
+    )
 
-        def generate_operation():
-            if len(stmt.operands) == 2:
-                self.generate_binary(stmt)
-            else:
-                self.generate_unary(stmt)
+    def generate_body(self, body, variables, initialized, zeroed=()):
+        ''' Generates statements of function or of the main program keeping
+        variables in callee-saved registers. Registers are saved and
+        restored, so the caller finds them unchanged. Optimized body is
+        returned. '''
+        if self.enable_optimizer:
+            allocator = RegisterAllocator(self.get_symbol)
+            allocator.scan(body)
+            tracked = [symbol for symbol in variables
+                if is_integer(symbol) and symbol not in allocator.escaped]
+            body = SSA(self.get_symbol, self.parser, tracked,
+                zeroed).optimize(body)
+        start = len(self.instructions)
+        for registers, kind, load in self.VARIABLE_REGISTERS:
+            allocator = RegisterAllocator(self.get_symbol, registers)
+            allocation = allocator.allocate(
+                body, set(filter(kind, variables)), initialized)
+            for symbol in allocator.loaded:
+                self.cmd(load, allocation[symbol],
+                    self.memory(self.variable_address(symbol)))
+            self.registers.update(allocation)
+        self.variable_registers.update(self.registers.itervalues())
+        self.pool = tuple(reg for reg in REGISTERS
+            if reg not in self.registers.values())
+        self.generate_statement(body)
+        save, restore = self.saving_commands(
+            self.used_registers(self.instructions[start:]))
+        self.instructions[start:start] = save
+        self.instructions.extend(restore)
+        self.registers, self.pool = {}, REGISTERS
+        return body
+
+    def saving_commands(self, used):
+        ''' Commands saving callee-saved registers among used ones and
+        commands restoring them. '''
+        saved = [reg for reg in CALLEE_SAVED
+            if reg in used or BYTE_REGISTERS.get(reg) in used]
+        return ([asm.Command('push', reg) for reg in saved],
+            [asm.Command('pop', reg) for reg in reversed(saved)])
+
+    def used_registers(self, instructions):
+        names = set()
+        for command in instructions:
+            for arg in getattr(command, 'args', ()):
+                if isinstance(arg, asm.SizeCast):
+                    arg = arg.arg
+                if isinstance(arg, asm.Offset):
+                    arg = arg.reg
+                names.add(arg)
+        return names
+
+    def register(self, expr):
+        # register keeping the variable, None if it is in memory
+        if type(expr) is SynVar:
+            return self.registers.get(self.get_symbol(expr))
+        return None
+
+    def memory(self, address):
+        return asm.SizeCast('dword', address)
+
+    def is_real(self, expr):
+        return isinstance(self.parser.expr_type(expr), SymTypeReal)
+
+    # Real values are kept on the FPU register stack, the value being
+    # computed is on its top.
+
+    def free_real_registers(self):
+        return FPU_REGISTERS - self.fpu
+
+    def load_real(self, operand):
+        self.cmd('fld', operand)
+
+    def store_real(self, operand):
+        self.cmd('fstp', operand)
+
+    def spill_real(self):
+        self.cmd('sub', 'esp', 4)
+        self.store_real(self.stack())
+
+    def reload_real(self):
+        self.load_real(self.stack())
+        self.cmd('add', 'esp', 4)
+
+    def load_real_from(self, reg):
+        self.cmd('push', reg)
+        self.reload_real()
+
+    def push_double(self):
+        # printf takes reals as doubles, the value is rounded to 32 bits
+        # first as it would be stored to a variable
+        self.cmd(
+            ('sub', 'esp', 8),
+            ('fstp', self.stack()),
+            ('fld', self.stack()),
+            ('fstp', asm.SizeCast('qword', asm.Offset('esp'))),
+        )
+
+    # Integer expressions are evaluated into registers. Handler of an
+    # expression gets a tuple of registers it may change and leaves the
+    # value in the first of them, the others are preserved. Real values are
+    # kept in registers too, self.fpu of them wait for the value being
+    # computed. They are stored to memory only by assignments, calls and
+    # write.
+
+    def need(self, expr):
+        ''' Number of registers needed to evaluate the expression without
+        keeping intermediate values on the stack (Sethi-Ullman number). '''
+        need = self.needs.get(expr)
+        if need is None:
+            need = self.walk(self.need_handlers, expr)
+        return need
+
+    def labeled(self, expr, need):
+        self.needs[expr] = need
+        return need
+
+    def need_of_variable(self, expr):
+        return self.labeled(expr, max(1, self.address_need(expr)))
+
+    def need_of_cast(self, expr):
+        need = self.needs.get(expr.expression)
+        if need is None:
+            need = yield expr.expression
+        yield Return(self.labeled(expr, need))
+
+    def need_of_operation(self, expr):
+        needs = []
+        for op in expr.operands:
+            need = self.needs.get(op)
+            if need is None:
+                need = yield op
+            needs.append(need)
+        if len(needs) == 2 and not self.is_real(expr.operands[0]):
+            left, right = needs
+            if self.operand(expr.operands[1], expr.operation.type) is not None:
+                right = 0
+            yield Return(self.labeled(expr, combine(left, right)))
+        # operands of real operations are evaluated one after another
+        yield Return(self.labeled(expr, max(needs + [1])))
+
+    need_handlers = {
+        SynConst: lambda self, expr: self.labeled(expr, 1),
+        SynVar: need_of_variable,
+        SynSubscript: need_of_variable,
+        SynFieldRequest: need_of_variable,
+        SynCall: lambda self, expr: self.labeled(expr, len(REGISTERS)),
+        SynCastToReal: need_of_cast,
+        SynOperation: need_of_operation,
+    }
+
+    def fpu_need(self, expr):
+        ''' Number of FPU registers needed to evaluate real expression
+        without storing intermediate values to memory. '''
+        need = self.fpu_needs.get(expr)
+        if need is None:
+            need = self.walk(self.fpu_need_handlers, expr)
+        return need
+
+    def fpu_need_of_operation(self, expr):
+        needs = []
+        for op in expr.operands:
+            need = self.fpu_needs.get(op)
+            if need is None:
+                need = yield op
+            needs.append(need)
+        if len(needs) == 2:
+            left, right = needs
+            if (expr.operation.type in FLOAT_COMMANDS and
+                self.real_operand(expr.operands[1]) is not None
+            ):
+                right = 0
+            needs = [combine(left, right)]
+        self.fpu_needs[expr] = needs[0]
+        yield Return(needs[0])
+
+    fpu_need_handlers = {
+        SynOperation: fpu_need_of_operation,
+        # casts and calls load a single value
+        SynExpr: lambda self, expr: 1,
+    }
 
-        def generate_subscript():
-            self.generate_statement(stmt.array, lvalue=True)
-            array_type = self.parser.expr_type(stmt.array)
-            self.generate_statement(stmt.index)
-            is_local = self.parser.find_symbol(stmt.array.name).is_local()
+    def effects(self, expr):
+        ''' Pair of whether evaluation of the expression calls functions,
+        which may change variables, and whether it reads variables kept
+        in memory. '''
+        effects = self.effects_cache.get(expr)
+        if effects is None:
+            effects = self.walk(self.effects_handlers, expr)
+        return effects
+
+    def effects_of_parts(self, expr, parts, reads):
+        calls = False
+        for part in parts:
+            effects = self.effects_cache.get(part)
+            if effects is None:
+                effects = yield part
+            calls, reads = calls or effects[0], reads or effects[1]
+        self.effects_cache[expr] = calls, reads
+        yield Return((calls, reads))
+
+    effects_handlers = {
+        SynConst: lambda self, expr: (False, False),
+        # variable kept in register isn't changed by calls
+        SynVar: lambda self, expr: (False, self.register(expr) is None),
+        SynSubscript: lambda self, expr:
+            self.effects_of_parts(expr, (expr.array, expr.index), True),
+        SynFieldRequest: lambda self, expr:
+            self.effects_of_parts(expr, (expr.record,), True),
+        SynCall: lambda self, expr: (True, True),
+        SynCastToReal: lambda self, expr:
+            self.effects_of_parts(expr, (expr.expression,), False),
+        SynOperation: lambda self, expr:
+            self.effects_of_parts(expr, expr.operands, False),
+    }
+
+    def in_order(self, left, right):
+        ''' Whether operands have to be evaluated in the source order: one
+        of them calls a function which may change what the other reads. '''
+        left_calls, left_reads = self.effects(left)
+        right_calls, right_reads = self.effects(right)
+        return left_calls and right_reads or right_calls and left_reads
+
+    def const_index(self, stmt):
+        index = stmt.index
+        if isinstance(index, SynConst) and index.token.type == tt.integer:
+            return index.token.value
+        return None
+
+    def static_address(self, stmt):
+        ''' Address of variable, record field or array element which is
+        known without computing anything at run time, None otherwise. '''
+        offset = 0
+        while not isinstance(stmt, SynVar):
+            if isinstance(stmt, SynFieldRequest):
+                offset += stmt.field.symbol.offset
+                stmt = stmt.record
+            elif (isinstance(stmt, SynSubscript) and
+                self.const_index(stmt) is not None
+            ):
+                array_type = self.parser.expr_type(stmt.array)
+                size = array_type.type.size
+                offset += (
+                    self.const_index(stmt) - array_type.range.leftbound) * size
+                stmt = stmt.array
+            else:
+                return None
+        address = self.variable_address(self.get_symbol(stmt))
+        return asm.Offset(address.reg, address.offset + offset)
+
+    def address_need(self, stmt):
+        if self.static_address(stmt) is not None:
+            return 0
+        if isinstance(stmt, SynFieldRequest):
+            return self.address_need(stmt.record)
+        if self.const_index(stmt) is not None:
+            return self.address_need(stmt.array)
+        base, index = self.address_need(stmt.array), self.need(stmt.index)
+        return combine(base, index) if base else max(index, 1)
+
+    def operand(self, expr, optype):
+        ''' Immediate value or memory operand which can be used as the right
+        operand of integer operation without loading it into a register,
+        None if there is no such one. '''
+        if isinstance(expr, SynConst):
+            if optype in IMMEDIATE_OPERANDS:
+                return expr.token.value
+        elif (optype in MEMORY_OPERANDS and
+            isinstance(expr, (SynVar, SynSubscript, SynFieldRequest))
+        ):
+            register = self.register(expr)
+            if register is not None:
+                return register
+            address = self.static_address(expr)
+            if address is not None:
+                return self.memory(address)
+        return None
+
+    def real_operand(self, expr):
+        ''' Memory operand of a real value used by FPU instruction without
+        loading the value, None if there is no such one. Integers aren't
+        taken by fiadd and others, as they would be used without rounding
+        to 32-bit real. '''
+        if isinstance(expr, SynConst):
+            return self.allocate_real(expr.token.value)
+        if (isinstance(expr, (SynVar, SynSubscript, SynFieldRequest)) and
+            self.register(expr) is None
+        ):
+            address = self.static_address(expr)
+            if address is not None:
+                return self.memory(address)
+        return None
+
+    def load(self, expr, regs):
+        yield expr, regs
+
+    def generate_pair(self, first, second, regs, in_order=False):
+        ''' Evaluates two values into the first two registers, the value
+        needing more registers goes first unless in_order is set. Values
+        are given as pairs of the need and function making generator from
+        registers, results of the generators are returned. '''
+        (first_need, first), (second_need, second) = first, second
+        count = len(regs)
+        if second_need < count and (in_order or first_need >= second_need):
+            a = yield first(regs)
+            b = yield second(regs[1:])
+        elif in_order:
+            # the first value waits on the stack
+            a = yield first(regs)
+            self.cmd('push', regs[0])
+            b = yield second(regs)
             self.cmd(
-                ('pop', 'eax'), # index
-                ('add' if is_local else 'sub',
-                    'eax', array_type.range.leftbound),
-                ('imul', 'eax', array_type.type.size),
-                ('pop', 'ebx'), # base
+                ('mov', regs[1], regs[0]),
+                ('pop', regs[0]),
             )
-            if is_local:
-                self.cmd(
-                    ('sub', 'eax', 'ebx'),
-                    ('neg', 'eax'),
-                )
+        elif first_need < second_need and first_need < count:
+            b = yield second((regs[1], regs[0]) + regs[2:])
+            a = yield first(regs[:1] + regs[2:])
+        else:
+            # registers are not enough, the second value waits on the stack
+            b = yield second(regs)
+            self.cmd('push', regs[0])
+            a = yield first(regs)
+            self.cmd('pop', regs[1])
+        yield Return((a, b))
+
+    def generate_operands(self, expr, regs):
+        ''' Evaluates the left operand of integer operation into the first
+        register, gives the right operand of instruction. Operands are
+        evaluated in the source order if one of them calls a function and
+        the other reads memory. '''
+        left, right = expr.operands
+        operand = self.operand(right, expr.operation.type)
+        if operand is not None:
+            yield left, regs
+            yield Return(operand)
+        yield self.generate_pair(
+            (self.need(left), functools.partial(self.load, left)),
+            (self.need(right), functools.partial(self.load, right)),
+            regs, self.in_order(left, right))
+        yield Return(regs[1])
+
+    def generate_push(self, expr, regs):
+        # arguments of calls and write are passed on the stack
+        if self.is_real(expr):
+            operand = None
+            if (not isinstance(expr, SynCastToReal) and
+                self.register(expr) is None
+            ):
+                operand = self.operand(expr, tt.assign)
+            if isinstance(expr, SynConst):
+                self.cmd('push', real_bits(expr.token.value))
+            elif operand is not None:
+                self.cmd('push', operand)
+            else:
+                yield expr, regs
+                self.spill_real()
+        elif isinstance(expr, SynConst):
+            self.cmd('push', expr.token.value)
+        else:
+            operand = self.operand(expr, tt.assign)
+            if operand is None:
+                yield expr, regs
+                operand = regs[0]
+            self.cmd('push', operand)
+
+    def generate_condition(self, expr, false_label):
+        # jumps to the label if the condition is false
+        regs = self.pool
+        if (isinstance(expr, SynOperation) and
+            expr.operation.type in FALSE_JUMPS
+        ):
+            if self.is_real(expr.operands[0]):
+                optype = yield self.generate_real_comparison(expr, regs)
+                self.cmd(REAL_FALSE_JUMPS[optype], false_label)
             else:
-                self.cmd('add', 'eax', 'ebx')
-            self.cmd('push', 'eax' if lvalue else self.dword('eax'))
-
-        def generate_call():
-            reserved_space = 0
-            for arg in reversed(stmt.args):
-                self.generate_statement(arg)
-                reserved_space += arg.type_(self.parser.symtable_stack).size
-            self.generate_statement(stmt.caller, lvalue=True)
+                yield self.generate_comparison(expr, regs)
+                self.cmd(FALSE_JUMPS[expr.operation.type], false_label)
+        else:
+            yield expr, regs
             self.cmd(
-                ('pop', 'eax'),
-                ('call', 'eax'),
-                ('add', 'esp', reserved_space),
+                ('test', regs[0], regs[0]),
+                ('jz', false_label),
             )
-            func = self.parser.find_symbol(stmt.caller.name)
-            if func.has_result:
-                self.cmd('push', 'eax')
 
-        def generate_cast():
-            self.generate_statement(stmt.expression)
+    def generate_comparison(self, expr, regs):
+        # variable kept in register is compared without copying it
+        left, right = expr.operands
+        register = self.register(left)
+        operand = self.operand(right, expr.operation.type)
+        if register is None:
+            operand = yield self.generate_operands(expr, regs)
+            register = regs[0]
+        elif operand is None:
+            yield right, regs
+            operand = regs[0]
+        self.cmd('cmp', register, operand)
+
+    def generate_real_operands(self, expr, regs):
+        ''' Loads operands of real operation on the FPU stack, the operand
+        needing more registers goes first unless the source order has to be
+        kept, as for integer operands. If the registers are not enough, the
+        first operand waits in memory on the stack. Gives whether the left
+        operand is on the top and the memory operand or None. '''
+        left, right = expr.operands
+        first, second = left, right
+        if (self.fpu_need(left) < self.fpu_need(right) and
+            not self.in_order(left, right)
+        ):
+            first, second = right, left
+        yield first, regs
+        if self.fpu_need(second) < self.free_real_registers():
+            self.fpu += 1
+            yield second, regs
+            self.fpu -= 1
+            yield Return((second is left, None))
+        self.spill_real()
+        yield second, regs
+        yield Return((second is left, self.stack()))
+
+    def generate_real_comparison(self, expr, regs):
+        # sets flags as unsigned comparison does, gives the operation
+        # which is true for the flags
+        left_on_top, memory = yield self.generate_real_operands(expr, regs)
+        if memory is not None:
+            self.reload_real()
+            left_on_top = not left_on_top
+        self.cmd(
+            ('fcomip', 'st0', 'st1'),
+            ('fstp', 'st0'),
+        )
+        optype = expr.operation.type
+        yield Return(optype if left_on_top else SWAPPED_CONDITIONS[optype])
+
+    def set_flag(self, reg, condition):
+        # register is set to 1 if the condition is true, otherwise to 0
+        if reg in BYTE_REGISTERS:
             self.cmd(
-                ('fild', self.stack()),
-                ('fstp', self.stack()),
+                ('set' + condition, BYTE_REGISTERS[reg]),
+                ('movzx', reg, BYTE_REGISTERS[reg]),
             )
-
-        def generate_write():
-            formats = {
-                SymTypeInt: '%d',
-                SymTypeReal: '%f',
-            }
-
-            format_string = ''
-            occupied_size = 0
-            for arg in reversed(stmt.args):
-                self.generate_statement(arg)
-                arg_type = type(self.parser.expr_type(arg))
-                format_string += formats[arg_type]
-                occupied_size += 4
-
-            format_string = "'{0}', {1}".format(
-                format_string, '10, 0' if stmt.newline else '0')
-
-            format_string_name = self.allocate_string(format_string)
-
-            if arg_type is SymTypeReal:
-                self.cmd(
-                    ('fld', self.stack()),
-                    ('sub', 'esp', '4'),
-                    ('fstp', asm.SizeCast('qword', asm.Offset('esp'))),
-                )
-                occupied_size += 4
-
+        else:
+            end = self.get_labels()
             self.cmd(
-                ('push', format_string_name),
-                ('call', self.call('printf')),
-                ('add', 'esp', occupied_size + 4),
+                ('mov', reg, 1),
+                ('j' + condition, end),
+                ('xor', reg, reg),
             )
-
-        def generate_variable():
-
-            def generate_variable(symbol):
-                if symbol.is_local():
-                    # substract 4 -- skip saved ebp
-                    generate_by_offset(-symbol.offset - 4)
-                else:
-                    generate_by_name()
-
-            def generate_by_offset(offset):
-                if lvalue:
-                    self.cmd(
-                        ('mov', 'eax', 'ebp'),
-                        ('sub', 'eax', abs(offset)),
-                        ('push', 'eax'),
-                    )
-                else:
-                    self.cmd('push', self.dword('ebp', offset))
-
-            def generate_by_name():
-                name = self.get_variable_name(stmt.name)
-                if lvalue:
-                    self.cmd('push', name)
-                else:
-                    self.cmd('push', self.dword(name))
-
-            handlers = {
-                SymFunctionArgument:
-                    # return value + saved ebp + function result = 12
-                    lambda: generate_by_offset(symbol.offset + 12),
-                SymTypeFunction: generate_by_name,
-                SymVar: lambda: generate_variable(symbol),
-            }
-            symbol = self.parser.find_symbol(stmt.name)
-            handlers[type(symbol)]()
-
-        def generate_while():
-            start, end = self.get_labels(2)
-            self.loops.append((start, end))
-            self.generate_label(start)
-            self.generate_statement(stmt.condition)
-            jump_if_zero(end)
-            self.generate_statement(stmt.action)
-            self.cmd('jmp', start)
             self.generate_label(end)
-            self.loops.pop()
-
-        def generate_repeat():
-            start, check, end = self.get_labels(3)
-            self.loops.append((check, end))
-            self.generate_label(start)
-            self.generate_statement(stmt.action)
-            self.generate_label(check)
-            self.generate_statement(stmt.condition)
-            jump_if_zero(start)
-            self.generate_label(end)
-            self.loops.pop()
-
-        def generate_for():
-            start, inc, end = self.get_labels(3)
-            self.loops.append((inc, end))
-            self.generate_statement(stmt.assignment)
-            self.generate_label(start)
-            self.generate_statement(stmt.check)
-            jump_if_zero(end)
-            self.generate_statement(stmt.action)
-            self.generate_label(inc)
-            self.generate_statement(stmt.counter, lvalue=True)
+
+    def generate_operation(self, stmt, regs=None):
+        if stmt.operation.type == tt.assign:
+            return self.generate_assignment(stmt)
+        return self.generate_expression(stmt, regs)
+
+    def generate_expression(self, expr, regs):
+        if len(expr.operands) == 1:
+            yield expr.operands[0], regs
+            self.generate_unary(expr, regs[0])
+        elif expr.operation.type in REAL_CONDITIONS and self.is_real(
+            expr.operands[0]
+        ):
+            optype = yield self.generate_real_comparison(expr, regs)
+            self.set_flag(regs[0], REAL_CONDITIONS[optype])
+        elif self.is_real(expr.operands[0]):
+            yield self.generate_float_binary(expr, regs)
+        elif expr.operation.type in INTEGER_CONDITIONS:
+            yield self.generate_comparison(expr, regs)
+            self.set_flag(regs[0], INTEGER_CONDITIONS[expr.operation.type])
+        else:
+            operand = yield self.generate_operands(expr, regs)
+            self.generate_binary(expr, regs, operand)
+
+    def generate_assignment(self, stmt):
+        left, right = stmt.operands
+        regs = self.pool
+        register = self.register(left)
+        if self.is_real(left):
+            yield self.generate_real_assignment(left, right, regs)
+        elif register is not None:
+            command, value = 'mov', right
+            if (isinstance(right, SynOperation) and
+                right.operation.type in UPDATE_COMMANDS and
+                len(right.operands) == 2
+            ):
+                # variable is changed in its register
+                first, second = right.operands
+                if (self.register(second) == register and
+                    right.operation.type in COMMUTATIVE
+                ):
+                    first, second = second, first
+                if self.register(first) == register:
+                    command = UPDATE_COMMANDS[right.operation.type]
+                    value = second
+            operand = self.operand(value, tt.assign)
+            if operand is None:
+                yield value, regs
+                operand = regs[0]
+            self.cmd(command, register, operand)
+        elif isinstance(right, SynConst) or self.register(right) is not None:
+            address = yield self.generate_address(left, regs)
             self.cmd(
-                ('pop', 'eax'),
-                ('inc', self.dword('eax')),
-                ('jmp', start),
-            )
-            self.generate_label(end)
-            self.loops.pop()
-
-        def generate_if():
-            self.generate_statement(stmt.condition)
-            else_case, endif = self.get_labels(2)
-            jump_if_zero(else_case)
-            self.generate_statement(stmt.action)
-            self.cmd('jmp', endif)
-            self.generate_label(else_case)
-            if stmt.else_action:
-                self.generate_statement(stmt.else_action)
-            self.generate_label(endif)
-
-        def generate_result():
-            self.generate_statement(stmt.value)
+                'mov', self.memory(address), self.operand(right, tt.assign))
+        else:
+            address, _ = yield self.generate_pair(
+                (self.address_need(left),
+                    functools.partial(self.generate_address, left)),
+                (self.need(right), functools.partial(self.load, right)),
+                regs)
+            self.cmd('mov', self.memory(address), regs[1])
+
+    def generate_real_assignment(self, left, right, regs):
+        if isinstance(right, SynConst):
+            address = yield self.generate_address(left, regs)
             self.cmd(
-                ('pop', 'eax'),
-                ('mov', self.function_result(), 'eax'),
-            )
-
-        def generate_block():
-            for statement in stmt.statements:
-                self.generate_statement(statement)
-
-        handlers = {
-            SynOperation: generate_operation,
-            SynSubscript: generate_subscript,
-            SynCall: generate_call,
-            SynCastToReal: generate_cast,
-            SynVar: generate_variable,
-            SynConst: lambda: self.cmd('push', stmt.name),
-            SynStatementIf: generate_if,
-            SynStatementFor: generate_for,
-            SynStatementWhile: generate_while,
-            SynStatementRepeat: generate_repeat,
-            SynStatementBreak: lambda: self.cmd('jmp', self.loops[-1][1]),
-            SynStatementContinue: lambda: self.cmd('jmp', self.loops[-1][0]),
-            SynStatementBlock: generate_block,
-            SynStatementWrite: generate_write,
-            SynStatementResult: generate_result,
-            SynEmptyStatement: lambda: self.cmd('nop'),
-        }
-        handlers[type(stmt)]()
-
-    def generate_binary(self, binop):
-
-        def generate_assignment():
-            self.cmd('mov', self.dword('eax'), 'ebx')
-
-        def generate_logic_or():
-            true, false, end = self.get_labels(3)
+                'mov', self.memory(address), real_bits(right.token.value))
+            return
+        yield right, regs
+        # value waits while the address is computed
+        self.fpu += 1
+        address = yield self.generate_address(left, regs)
+        self.fpu -= 1
+        self.store_real(self.memory(address))
+
+    def generate_address(self, stmt, regs):
+        ''' Generator computing address of variable, array element or
+        record field, gives it as asm.Offset. Constant parts of address
+        (offsets of fields, constant indices) are folded into the offset,
+        a part computed at run time is in the first register. '''
+        address = self.static_address(stmt)
+        if address is not None:
+            yield Return(address)
+        if isinstance(stmt, SynFieldRequest):
+            address = yield self.generate_address(stmt.record, regs)
+            yield Return(asm.Offset(
+                address.reg, address.offset + stmt.field.symbol.offset))
+        array_type = self.parser.expr_type(stmt.array)
+        size = array_type.type.size
+        index = self.const_index(stmt)
+        if index is not None:
+            address = yield self.generate_address(stmt.array, regs)
+            yield Return(asm.Offset(address.reg,
+                address.offset + (index - array_type.range.leftbound) * size))
+        base_need = self.address_need(stmt.array)
+        if base_need:
+            address, _ = yield self.generate_pair(
+                (base_need,
+                    functools.partial(self.generate_address, stmt.array)),
+                (self.need(stmt.index),
+                    functools.partial(self.load, stmt.index)),
+                regs)
             self.cmd(
-                ('test', 'eax', 'eax'),
-                ('jnz', true),
-                ('test', 'ebx', 'ebx'),
-                ('jz', false),
+                ('imul', regs[1], size),
+                ('add', regs[0], regs[1]),
             )
-            self.generate_label(true)
+        else:
+            address = self.static_address(stmt.array)
+            yield stmt.index, regs
             self.cmd(
-                ('mov', 'eax', 1),
-                ('jmp', end),
+                ('imul', regs[0], size),
+                ('add', regs[0], address.reg),
             )
-            self.generate_label(false)
-            self.cmd('xor', 'eax', 'eax')
-            self.generate_label(end)
-            self.cmd('push', 'eax')
+        yield Return(asm.Offset(
+            regs[0], address.offset - array_type.range.leftbound * size))
 
-        def generate_logic_and():
-            false, end = self.get_labels(2)
+    def variable_address(self, symbol):
+        if isinstance(symbol, SymFunctionArgument):
+            # return value + saved ebp + function result = 12
+            return asm.Offset('ebp', symbol.offset + 12)
+        elif isinstance(symbol, SymTypeFunction) or not symbol.is_local():
+            return asm.Offset(self.get_variable_name(symbol))
+        # locals are below ebp, fields and elements are at higher addresses
+        return asm.Offset('ebp', -symbol.offset - symbol.size)
+
+    def generate_variable(self, stmt, regs):
+        register = self.register(stmt)
+        if register is None:
+            address = yield self.generate_address(stmt, regs)
+            register = self.memory(address)
+        if self.is_real(stmt):
+            self.load_real(register)
+        else:
+            self.cmd('mov', regs[0], register)
+
+    def generate_constant(self, stmt, regs):
+        if not self.is_real(stmt):
+            self.cmd('mov', regs[0], stmt.token.value)
+        elif real_bits(stmt.token.value) == 0:
+            self.cmd('fldz')
+        elif stmt.token.value == 1:
+            self.cmd('fld1')
+        else:
+            self.cmd('fld', self.allocate_real(stmt.token.value))
+
+    def generate_call(self, stmt, regs=None):
+        # called function keeps only callee-saved registers, registers
+        # aren't given to a call made as a statement
+        used = regs is not None
+        regs = regs or self.pool
+        # real values waiting for the call are kept in memory, the called
+        # function uses their registers
+        waiting = self.fpu
+        while self.fpu:
+            self.fpu -= 1
+            self.spill_real()
+        saved = [reg for reg in self.pool
+            if reg not in regs and reg not in CALLEE_SAVED]
+        for reg in saved:
+            self.cmd('push', reg)
+        reserved_space = 0
+        for arg in reversed(stmt.args):
+            yield self.generate_push(arg, regs)
+            reserved_space += arg.type_(self.parser.symtable_stack).size
+        func = self.get_symbol(stmt.caller)
+        self.cmd('call', self.get_variable_name(func))
+        if reserved_space:
+            self.cmd('add', 'esp', reserved_space)
+        if func.has_result and regs[0] != 'eax':
+            self.cmd('mov', regs[0], 'eax')
+        for reg in reversed(saved):
+            self.cmd('pop', reg)
+        while self.fpu < waiting:
+            self.reload_real()
+            self.fpu += 1
+        if used and func.has_result and self.is_real(stmt):
+            # real result is returned in eax, it is loaded only when used,
+            # the FPU stack is empty between statements
+            self.load_real_from(regs[0])
+
+    def generate_cast(self, stmt, regs):
+        operand = self.operand(stmt.expression, tt.assign)
+        if isinstance(operand, asm.SizeCast):
+            self.cmd('fild', operand)
+        else:
+            if operand is None:
+                yield stmt.expression, regs
+                operand = regs[0]
             self.cmd(
-                ('test', 'eax', 'eax'),
-                ('jz', false),
-                ('test', 'ebx', 'ebx'),
-                ('jz', false),
-                ('mov', 'eax', 1),
-                ('jmp', end),
+                ('push', operand),
+                ('fild', self.stack()),
+                ('add', 'esp', 4),
             )
-            self.generate_label(false)
-            self.cmd('xor', 'eax', 'eax')
-            self.generate_label(end)
-            self.cmd('push', 'eax')
+        # integers are loaded exactly, addition rounds them to 24 bits as
+        # precision control rounds any result
+        self.cmd('fadd', self.allocate_real(0.0))
+
+    def generate_write(self, stmt):
+        formats = {
+            SymTypeInt: '%d',
+            SymTypeReal: '%f',
+        }
 
-        def generate_comparison(setcc):
-            self.cmd(
-                ('cmp', 'eax', 'ebx'),
-                (setcc, 'al'),
-                ('movzx', 'eax', 'al'),
-                ('push', 'eax'),
-            )
+        format_string = ''
+        occupied_size = 0
+        for arg in reversed(stmt.args):
+            arg_type = type(self.parser.expr_type(arg))
+            format_string = formats[arg_type] + format_string
+            if arg_type is SymTypeReal:
+                yield arg, self.pool
+                self.push_double()
+                occupied_size += 8
+            else:
+                yield self.generate_push(arg, self.pool)
+                occupied_size += 4
 
-        def generate_shift(shift):
+        format_string = "'{0}', {1}".format(
+            format_string, '10, 0' if stmt.newline else '0')
+
+        format_string_name = self.allocate_string(format_string)
+
+        self.cmd(
+            ('push', format_string_name),
+            ('call', self.call('printf')),
+            ('add', 'esp', occupied_size + 4),
+        )
+
+    def generate_while(self, stmt):
+        start, end = self.get_labels(2)
+        self.loops.append((start, end))
+        self.generate_label(start)
+        yield self.generate_condition(stmt.condition, end)
+        yield stmt.action
+        self.cmd('jmp', start)
+        self.generate_label(end)
+        self.loops.pop()
+
+    def generate_repeat(self, stmt):
+        start, check, end = self.get_labels(3)
+        self.loops.append((check, end))
+        self.generate_label(start)
+        yield stmt.action
+        self.generate_label(check)
+        yield self.generate_condition(stmt.condition, start)
+        self.generate_label(end)
+        self.loops.pop()
+
+    def generate_for(self, stmt):
+        start, inc, end = self.get_labels(3)
+        self.loops.append((inc, end))
+        yield stmt.assignment
+        self.generate_label(start)
+        yield self.generate_condition(stmt.check, end)
+        yield stmt.action
+        self.generate_label(inc)
+        counter = self.register(stmt.counter)
+        if counter is None:
+            address = yield self.generate_address(stmt.counter, self.pool)
+            counter = self.memory(address)
+        self.cmd(
+            ('inc', counter),
+            ('jmp', start),
+        )
+        self.generate_label(end)
+        self.loops.pop()
+
+    def generate_if(self, stmt):
+        else_case, endif = self.get_labels(2)
+        yield self.generate_condition(stmt.condition, else_case)
+        yield stmt.action
+        self.cmd('jmp', endif)
+        self.generate_label(else_case)
+        if stmt.else_action:
+            yield stmt.else_action
+        self.generate_label(endif)
+
+    def generate_result(self, stmt):
+        value = stmt.value
+        if self.is_real(value):
+            yield value, self.pool
+            self.store_real(self.function_result())
+        elif isinstance(value, SynConst):
+            self.cmd('mov', self.function_result(), value.token.value)
+        else:
+            register = self.register(value)
+            if register is None:
+                yield value, self.pool
+                register = self.pool[0]
+            self.cmd('mov', self.function_result(), register)
+
+    def generate_block(self, stmt):
+        for statement in stmt.statements:
+            yield statement
+
+    handlers = {
+        SynOperation: generate_operation,
+        SynSubscript: generate_variable,
+        SynFieldRequest: generate_variable,
+        SynCall: generate_call,
+        SynCastToReal: generate_cast,
+        SynVar: generate_variable,
+        SynConst: generate_constant,
+        SynStatementIf: generate_if,
+        SynStatementFor: generate_for,
+        SynStatementWhile: generate_while,
+        SynStatementRepeat: generate_repeat,
+        SynStatementBreak: lambda self, stmt:
+            self.cmd('jmp', self.loops[-1][1]),
+        SynStatementContinue: lambda self, stmt:
+            self.cmd('jmp', self.loops[-1][0]),
+        SynStatementBlock: generate_block,
+        SynStatementWrite: generate_write,
+        SynStatementResult: generate_result,
+        SynEmptyStatement: lambda self, stmt:
+            self.cmd('nop'),
+    }
+
+    def generate_binary(self, binop, regs, operand):
+        # left operand is in the first register
+        reg = regs[0]
+
+        def generate_division(result):
+            # dividend is extended with zero, quotient is put into eax
+            # and remainder into edx
+            saved = [r for r in ('eax', 'edx') if r not in regs]
+            on_stack = operand in ('eax', 'edx')
+            if on_stack:
+                self.cmd('push', operand)
+            for r in saved:
+                self.cmd('push', r)
+            if reg != 'eax':
+                self.cmd('mov', 'eax', reg)
             self.cmd(
-                ('pop', 'ecx'),
-                ('pop', 'eax'),
-                (shift, 'eax', 'cl'),
-                ('push', 'eax'),
+                ('xor', 'edx', 'edx'),
+                ('idiv', self.stack(4 * len(saved)) if on_stack else operand),
             )
+            if reg != result:
+                self.cmd('mov', reg, result)
+            for r in reversed(saved):
+                self.cmd('pop', r)
+            if on_stack:
+                self.cmd('add', 'esp', 4)
 
-        def integer_binary(function):
-            @functools.wraps(function)
-            def wraps(**kwargs):
+        def generate_shift(shift):
+            # count of bits is taken from cl
+            if not isinstance(operand, str):
+                self.cmd(shift, reg, operand & 31)
+            elif operand == 'ecx':
+                self.cmd(shift, reg, 'cl')
+            elif reg == 'ecx':
                 self.cmd(
-                    ('pop', 'ebx'),
-                    ('pop', 'eax'),
+                    ('xchg', 'ecx', operand),
+                    (shift, operand, 'cl'),
+                    ('mov', 'ecx', operand),
                 )
-                return function(**kwargs)
-            return wraps
+            else:
+                saved = 'ecx' not in regs
+                if saved:
+                    self.cmd('push', 'ecx')
+                self.cmd(
+                    ('mov', 'ecx', operand),
+                    (shift, reg, 'cl'),
+                )
+                if saved:
+                    self.cmd('pop', 'ecx')
 
-        def generate_float_assignment():
+        def generate_logic_or():
+            # carry is set only for zero, so sbb makes -1 of zero and 0 of
+            # the rest of values
             self.cmd(
-                ('pop', 'ebx'),
-                ('pop', 'eax'),
+                ('or', reg, operand),
+                ('cmp', reg, 1),
+                ('sbb', reg, reg),
+                ('inc', reg),
             )
-            generate_assignment()
 
-        def generate_float_arithmetic(command):
+        def generate_logic_and():
+            if not isinstance(operand, str):
+                if operand:
+                    self.cmd(
+                        ('cmp', reg, 1),
+                        ('sbb', reg, reg),
+                        ('inc', reg),
+                    )
+                else:
+                    self.cmd('xor', reg, reg)
+                return
             self.cmd(
-                ('fld', self.stack(offset=4)),
-                (command, self.stack()),
-                ('add', 'esp', 4),
-                ('fstp', self.stack()),
+                ('cmp', reg, 1),
+                ('sbb', reg, reg),
+                ('cmp', operand, 1),
+                ('sbb', operand, operand),
+                ('or', reg, operand),
+                ('inc', reg),
             )
 
-        def generate_float_comparison(setcc):
+        BINARY_HANDLERS = {
+            tt.plus: lambda: self.cmd('add', reg, operand),
+            tt.minus: lambda: self.cmd('sub', reg, operand),
+            tt.mul: lambda: self.cmd('imul', reg, operand),
+            tt.int_div: lambda: generate_division('eax'),
+            tt.int_mod: lambda: generate_division('edx'),
+            tt.logic_or: generate_logic_or,
+            tt.logic_and: generate_logic_and,
+            tt.logic_xor: lambda: self.cmd('xor', reg, operand),
+            tt.shr: lambda: generate_shift('shr'),
+            tt.shl: lambda: generate_shift('shl'),
+        }
+        BINARY_HANDLERS[binop.operation.type]()
+
+    def generate_float_binary(self, binop, regs):
+        # result replaces the operands on the FPU stack
+        command = FLOAT_COMMANDS[binop.operation.type]
+        operand = self.real_operand(binop.operands[1])
+        if operand is not None:
+            yield binop.operands[0], regs
+            self.cmd(command, operand)
+            return
+        left_on_top, memory = yield self.generate_real_operands(binop, regs)
+        # reversed commands subtract and divide in the other order
+        ordered = binop.operation.type in (tt.minus, tt.div)
+        if memory is not None:
+            reverse = 'r' if ordered and not left_on_top else ''
             self.cmd(
-                ('xor', 'eax', 'eax'),
-                ('fld', self.stack()),
-                ('fld', self.dword('esp', offset=4)),
-                ('fcomip', 'st0', 'st1'),
-                (setcc, 'al'),
-                ('add', 'esp', 8),
-                ('push', 'eax'),
+                (command + reverse, memory),
+                ('add', 'esp', 4),
             )
+        else:
+            reverse = 'r' if ordered and left_on_top else ''
+            self.cmd(command + reverse + 'p', 'st1', 'st0')
 
-        integer, real = SymTypeInt, SymTypeReal
-        BINARY_HANDLERS = {
-            (integer, tt.assign): generate_assignment,
-
-            (integer, tt.plus): lambda: self.cmd(
-                ('add', 'eax', 'ebx'),
-                ('push', 'eax'),
-            ),
-
-            (integer, tt.minus): lambda: self.cmd(
-                ('sub', 'eax', 'ebx'),
-                ('push', 'eax'),
-            ),
-
-            (integer, tt.mul): lambda: self.cmd(
-                ('imul', 'ebx'),
-                ('push', 'eax'),
-            ),
-
-            (integer, tt.int_div): lambda: self.cmd(
-                ('xor', 'edx', 'edx'),
-                ('idiv', 'ebx'),
-                ('push', 'eax'),
-            ),
-
-            (integer, tt.int_mod): lambda: self.cmd(
-                ('xor', 'edx', 'edx'),
-                ('idiv', 'ebx'),
-                ('push', 'edx'),
-            ),
-            (integer, tt.div): lambda:
-                generate_float_arithmetic('fdiv'),
-
-            (integer, tt.equal):
-                lambda: generate_comparison('sete'),
-            (integer, tt.not_equal):
-                lambda: generate_comparison('setne'),
-            (integer, tt.less):
-                lambda: generate_comparison('setl'),
-            (integer, tt.less_or_equal):
-                lambda: generate_comparison('setle'),
-            (integer, tt.greater):
-                lambda: generate_comparison('setg'),
-            (integer, tt.greater_or_equal):
-                lambda: generate_comparison('setge'),
-
-            (integer, tt.logic_or): generate_logic_or,
-            (integer, tt.logic_and): generate_logic_and,
-            (integer, tt.logic_xor): lambda: self.cmd(
-                ('xor', 'eax', 'ebx'),
-                ('push', 'eax'),
-            ),
-
-            (integer, tt.shr): lambda: generate_shift('shr'),
-            (integer, tt.shl): lambda: generate_shift('shl'),
-
-            (real, tt.assign): generate_float_assignment,
-
-            (real, tt.plus): lambda:
-                generate_float_arithmetic('fadd'),
-            (real, tt.minus): lambda:
-                generate_float_arithmetic('fsub'),
-            (real, tt.mul): lambda:
-                generate_float_arithmetic('fmul'),
-            (real, tt.div): lambda:
-                generate_float_arithmetic('fdiv'),
-
-            (real, tt.equal):
-                lambda: generate_float_comparison('sete'),
-            (real, tt.not_equal):
-                lambda: generate_float_comparison('setne'),
-            (real, tt.less):
-                lambda: generate_float_comparison('setb'),
-            (real, tt.less_or_equal):
-                lambda: generate_float_comparison('setbe'),
-            (real, tt.greater):
-                lambda: generate_float_comparison('seta'),
-            (real, tt.greater_or_equal):
-                lambda: generate_float_comparison('setae'),
-        }
-        for key, func in BINARY_HANDLERS.iteritems():
-            if key.count(integer) and key[-1] not in (tt.shr, tt.shl, tt.div):
-                BINARY_HANDLERS[key] = integer_binary(func)
-
-        left, right = binop.operands
-        lvalue = binop.operation.type == tt.assign
-        self.generate_statement(left, lvalue)
-        self.generate_statement(right)
-        # left type == right type
-        operand_type = type(self.parser.expr_type(left))
-        BINARY_HANDLERS[operand_type, binop.operation.type]()
-
-    def generate_unary(self, unop):
+    def generate_unary(self, unop, reg):
         integer, real = SymTypeInt, SymTypeReal
         UNARY_HANDLERS = {
             (integer, tt.logic_not): lambda: self.cmd(
-                ('pop', 'eax'),
-                ('test', 'eax', 'eax'),
-                ('sete', 'al'),
-                ('movzx', 'eax', 'al'),
-                ('push', 'eax'),
+                ('cmp', reg, 1),
+                ('sbb', reg, reg),
+                ('neg', reg),
             ),
 
-            (integer, tt.minus): lambda: self.cmd(
-                ('pop', 'eax'),
-                ('neg', 'eax'),
-                ('push', 'eax'),
-            ),
+            (integer, tt.minus): lambda: self.cmd('neg', reg),
 
-            (real, tt.minus): lambda: self.cmd(
-                ('fld', self.stack()),
-                ('fchs'),
-                ('fstp', self.stack()),
-            ),
+            (real, tt.minus): lambda: self.cmd('fchs'),
         }
 
-        operand = unop.operands[0]
-        self.generate_statement(operand)
-        operand_type = type(self.parser.expr_type(operand))
+        operand_type = type(self.parser.expr_type(unop.operands[0]))
         UNARY_HANDLERS[operand_type, unop.operation.type]()
@@ -0,0 +1,745 @@
+# -*- coding: utf-8 -*-
+
+from common.functions import copy_args
+from tok.token import Token, tt
+from syn.tree import *
+from syn.table import *
+from syn.visitor import Visitor, Return
+from syn.constants import compute, constant_value, literal, to_integer
+
+# operations giving the same result for swapped operands
+COMMUTATIVE = frozenset([tt.plus, tt.mul, tt.logic_and, tt.logic_or,
+    tt.logic_xor, tt.equal, tt.not_equal])
+
+# integer operations the representation computes, results of the other
+# expressions are not known
+OPERATIONS = COMMUTATIVE | frozenset([tt.minus, tt.int_div, tt.int_mod,
+    tt.shl, tt.shr, tt.logic_not, tt.less, tt.less_or_equal, tt.greater,
+    tt.greater_or_equal])
+
+# lattice value of a value which is not constant, values which are not in
+# the lattice yet may still turn out to be constant
+VARYING = object()
+
+def meet(first, second):
+    if first is None:
+        return second
+    if second is None or first == second:
+        return first
+    return VARYING
+
+def link(pred, succ):
+    pred.succs.append(succ)
+    succ.preds.append(pred)
+
+def variable(symbol, linepos):
+    ''' Variable node for the symbol, placed at the given position. '''
+    token = Token(tt.identifier, symbol.name, symbol.name)
+    token.line, token.pos = linepos
+    return SynVar(token, symbol)
+
+class Value(object):
+    ''' Instruction of the representation, defines a single value. '''
+    def __init__(self, block, args=()):
+        self.block, self.args = block, list(args)
+
+class Constant(Value):
+    def __init__(self, block, value):
+        Value.__init__(self, block)
+        self.value = value
+
+class Phi(Value):
+    # args are values of the variable coming from block.preds
+    def __init__(self, block, args, symbol):
+        Value.__init__(self, block, args)
+        self.symbol = symbol
+
+class Operation(Value):
+    def __init__(self, block, args, optype):
+        Value.__init__(self, block, args)
+        self.optype = optype
+
+class Unknown(Value):
+    ''' Value read from memory, returned by a call or computed by real
+    arithmetic, as well as the value of a variable at the start of the body
+    which isn't known to be zero. '''
+
+class Block(object):
+    def __init__(self, index):
+        self.index = index
+        self.preds, self.succs = [], []
+        self.phis, self.values = [], []
+        # the block goes to succs[0] if the condition isn't zero, to
+        # succs[1] otherwise
+        self.condition = None
+
+class Definition(object):
+    ''' Assignment of a value to a tracked variable. '''
+    @copy_args
+    def __init__(self, symbol, value, stmt): pass
+    __slots__ = __init__.argnames
+
+class SSA(Visitor):
+    ''' Static single assignment form of a function or of the main program.
+
+    Tracked variables are integer variables whose address is never taken.
+    Basic blocks are built from the statements, an assignment to a tracked
+    variable makes its value the current one, values joined where paths
+    meet become phis. Everything else stays in memory: reads of it give
+    unknown values and statements changing it are kept as they are.
+
+    The form is optimized by sparse conditional constant propagation, global
+    value numbering and dead code elimination, then the results are written
+    back into the tree: constant expressions become literals, expressions
+    computing a value already kept in a variable read the variable, branches
+    which are never taken and assignments whose values are never used are
+    removed. Code generator lowers the tree to instructions. '''
+
+    @copy_args
+    def __init__(self, get_symbol, parser, tracked, zeroed=()):
+        self.symbols = sorted(tracked, key=lambda symbol: symbol.name)
+
+    def optimize(self, body):
+        self.build(body)
+        self.propagate()
+        self.number()
+        self.mark()
+        body = self.run(self.rewrite_statement(body), self.rewrite_handlers)
+        return body if body is not None else SynStatementBlock()
+
+    # construction
+
+    def build(self, body):
+        self.blocks = []
+        # values and current variable values of expression nodes
+        self.values, self.envs = {}, {}
+        # blocks statements start in, first blocks of loop actions
+        self.places, self.bodies = {}, {}
+        self.definitions = {}
+        # (block, node) evaluated for its side effects or for a branch,
+        # (block, definition) kept when the block is reached
+        self.effects, self.kept = [], []
+        self.increments = set()
+        self.forward = {}
+        self.loops = []
+        self.calls = 0
+        self.block = self.new_block()
+        self.env = {}
+        for symbol in self.symbols:
+            if symbol in self.zeroed:
+                value = Constant(self.block, 0)
+            else:
+                value = Unknown(self.block)
+            self.env[symbol] = self.add(value)
+        self.run(self.build_statement(body), self.build_handlers)
+        self.remove_trivial()
+
+    def new_block(self):
+        block = Block(len(self.blocks))
+        self.blocks.append(block)
+        return block
+
+    def add(self, value):
+        if isinstance(value, Phi):
+            value.block.phis.append(value)
+        else:
+            value.block.values.append(value)
+        return value
+
+    def record(self, node, value):
+        self.values[node] = value
+        self.envs[node] = self.env
+        return value
+
+    def enter(self, incoming):
+        ''' Starts a block reached from the blocks of (block, env) pairs,
+        different values of a variable coming from them are joined. '''
+        block = self.new_block()
+        for pred, _ in incoming:
+            link(pred, block)
+        env = incoming[0][1]
+        if len(incoming) > 1:
+            env = {}
+            for symbol in self.symbols:
+                args = [values[symbol] for _, values in incoming]
+                if all(arg is args[0] for arg in args):
+                    env[symbol] = args[0]
+                else:
+                    env[symbol] = self.add(Phi(block, args, symbol))
+        self.block, self.env = block, env
+        return block
+
+    def enter_loop(self):
+        # values coming back from the loop aren't known yet, so every
+        # variable gets a phi, the needless ones are removed afterwards
+        header = self.enter([(self.block, self.env)])
+        self.env = dict((symbol, self.add(Phi(header, [self.env[symbol]],
+            symbol))) for symbol in self.symbols)
+        return header
+
+    def close_loop(self, header, incoming):
+        for pred, env in incoming:
+            link(pred, header)
+            for phi in header.phis:
+                phi.args.append(env[phi.symbol])
+
+    def branch(self, condition, node):
+        self.block.condition = condition
+        self.effects.append((self.block, node))
+        return self.block, self.env
+
+    def resolve(self, value):
+        while value in self.forward:
+            value = self.forward[value]
+        return value
+
+    def remove_trivial(self):
+        ''' Replaces phis joining a single value with the value. '''
+        changed = True
+        while changed:
+            changed = False
+            for block in self.blocks:
+                for phi in block.phis[:]:
+                    args = set(map(self.resolve, phi.args))
+                    args.discard(phi)
+                    if len(args) == 1:
+                        self.forward[phi] = args.pop()
+                        block.phis.remove(phi)
+                        changed = True
+        for block in self.blocks:
+            for value in block.phis + block.values:
+                value.args = map(self.resolve, value.args)
+            if block.condition is not None:
+                block.condition = self.resolve(block.condition)
+
+    def value_of(self, node):
+        value = self.values.get(node)
+        return self.resolve(value) if value is not None else None
+
+    def build_statement(self, stmt):
+        self.places[stmt] = self.block
+        yield stmt
+        if isinstance(stmt, SynCall):
+            self.effects.append((self.block, stmt))
+
+    def build_block(self, stmt):
+        for child in stmt.statements:
+            yield self.build_statement(child)
+
+    def build_assignment(self, stmt):
+        self.places[stmt] = self.block
+        left, right = stmt.operands
+        calls = self.calls
+        value = yield right
+        symbol = self.get_symbol(left) if type(left) is SynVar else None
+        if symbol not in self.env:
+            # target in memory, indices are computed
+            while not isinstance(left, SynVar):
+                if isinstance(left, SynSubscript):
+                    yield left.index
+                    left = left.array
+                else:
+                    left = left.record
+            self.effects.append((self.block, stmt))
+            return
+        definition = self.definitions[stmt] = Definition(symbol, value, stmt)
+        if self.calls > calls:
+            self.effects.append((self.block, right))
+            self.kept.append((self.block, definition))
+        self.env = dict(self.env)
+        self.env[symbol] = value
+
+    def build_if(self, stmt):
+        condition = yield stmt.condition
+        start, env = self.branch(condition, stmt.condition)
+        self.enter([(start, env)])
+        yield self.build_statement(stmt.action)
+        ends = [(self.block, self.env)]
+        self.enter([(start, env)])
+        if stmt.else_action is not None:
+            yield self.build_statement(stmt.else_action)
+        ends.append((self.block, self.env))
+        self.enter(ends)
+
+    def build_while(self, stmt):
+        header = self.enter_loop()
+        condition = yield stmt.condition
+        start, env = self.branch(condition, stmt.condition)
+        self.loops.append(([], []))
+        self.bodies[stmt] = self.enter([(start, env)])
+        yield self.build_statement(stmt.action)
+        continues, breaks = self.loops.pop()
+        self.close_loop(header, [(self.block, self.env)] + continues)
+        self.enter([(start, env)] + breaks)
+
+    def build_repeat(self, stmt):
+        header = self.enter_loop()
+        self.loops.append(([], []))
+        yield self.build_statement(stmt.action)
+        continues, breaks = self.loops.pop()
+        self.enter([(self.block, self.env)] + continues)
+        condition = yield stmt.condition
+        start, env = self.branch(condition, stmt.condition)
+        # exit is taken when the condition holds
+        self.enter([(start, env)] + breaks)
+        self.close_loop(header, [(start, env)])
+
+    def build_for(self, stmt):
+        yield stmt.assignment
+        symbol = self.get_symbol(stmt.counter)
+        header = self.enter_loop()
+        condition = yield stmt.check
+        start, env = self.branch(condition, stmt.check)
+        self.loops.append(([], []))
+        body = self.bodies[stmt] = self.enter([(start, env)])
+        if stmt.assignment in self.definitions:
+            # counter is assigned by the loop whenever it runs
+            self.kept.append((body, self.definitions[stmt.assignment]))
+        yield self.build_statement(stmt.action)
+        continues, breaks = self.loops.pop()
+        self.enter([(self.block, self.env)] + continues)
+        if symbol in self.env:
+            one = self.add(Constant(self.block, 1))
+            increment = self.add(
+                Operation(self.block, [self.env[symbol], one], tt.plus))
+            self.increments.add(increment)
+            self.env = dict(self.env)
+            self.env[symbol] = increment
+        self.close_loop(header, [(self.block, self.env)])
+        self.enter([(start, env)] + breaks)
+
+    def build_jump(self, stmt, index):
+        self.loops[-1][index].append((self.block, self.env))
+        # statements after the jump are never run
+        self.block = self.new_block()
+
+    def build_effect(self, stmt, *children):
+        for child in children:
+            yield child
+        self.effects.append((self.block, stmt))
+
+    def build_constant(self, expr):
+        value = expr.token.value
+        if expr.token.type == tt.integer and isinstance(value, (int, long)):
+            value = Constant(self.block, to_integer(value))
+        else:
+            value = Unknown(self.block)
+        return self.record(expr, self.add(value))
+
+    def build_variable(self, expr):
+        symbol = self.get_symbol(expr)
+        if symbol in self.env:
+            return self.record(expr, self.env[symbol])
+        value = None
+        if isinstance(symbol, SymConst):
+            value = constant_value(symbol)
+        if isinstance(value, int):
+            return self.record(expr, self.add(Constant(self.block, value)))
+        return self.record(expr, self.add(Unknown(self.block)))
+
+    def build_operation(self, expr):
+        if expr.operation.type == tt.assign:
+            yield self.build_assignment(expr)
+            return
+        args = []
+        for op in expr.operands:
+            args.append((yield op))
+        optype = expr.operation.type
+        if optype in OPERATIONS and all(
+            isinstance(self.parser.expr_type(op), SymTypeInt)
+                for op in expr.operands
+        ):
+            value = Operation(self.block, args, optype)
+        else:
+            value = Unknown(self.block)
+        yield Return(self.record(expr, self.add(value)))
+
+    def build_unknown(self, expr, *children):
+        for child in children:
+            yield child
+        yield Return(self.record(expr, self.add(Unknown(self.block))))
+
+    def build_call(self, expr):
+        self.calls += 1
+        return self.build_unknown(expr, *expr.args)
+
+    build_handlers = {
+        SynConst: build_constant,
+        SynVar: build_variable,
+        SynOperation: build_operation,
+        SynCall: build_call,
+        SynSubscript: lambda self, expr:
+            self.build_unknown(expr, expr.array, expr.index),
+        SynFieldRequest: lambda self, expr:
+            self.build_unknown(expr, expr.record),
+        SynCastToReal: lambda self, expr:
+            self.build_unknown(expr, expr.expression),
+        SynStatementBlock: build_block,
+        SynStatementIf: build_if,
+        SynStatementWhile: build_while,
+        SynStatementRepeat: build_repeat,
+        SynStatementFor: build_for,
+        SynStatementBreak: lambda self, stmt: self.build_jump(stmt, 1),
+        SynStatementContinue: lambda self, stmt: self.build_jump(stmt, 0),
+        SynStatementWrite: lambda self, stmt:
+            self.build_effect(stmt, *stmt.args),
+        SynStatementResult: lambda self, stmt:
+            self.build_effect(stmt, stmt.value),
+        SynNode: lambda self, stmt: None,
+    }
+
+    # sparse conditional constant propagation
+
+    def propagate(self):
+        ''' Finds constant values and reachable blocks. Values are assumed
+        constant and blocks unreachable until shown otherwise, so constants
+        coming around loops and through branches never taken are found. '''
+        users = {}
+        for block in self.blocks:
+            for value in block.phis + block.values:
+                for arg in value.args:
+                    users.setdefault(arg, []).append(value)
+            if block.condition is not None:
+                users.setdefault(block.condition, []).append(block)
+        self.lattice, self.edges, self.reachable = {}, set(), set()
+        flow, changed = [(None, self.blocks[0])], []
+        while flow or changed:
+            if not flow:
+                for user in users.get(changed.pop(), ()):
+                    if isinstance(user, Block):
+                        if user in self.reachable:
+                            flow.extend(self.successors(user))
+                    elif user.block in self.reachable:
+                        self.evaluate(user, changed)
+                continue
+            edge = flow.pop()
+            if edge in self.edges:
+                continue
+            self.edges.add(edge)
+            block = edge[1]
+            for phi in block.phis:
+                self.evaluate(phi, changed)
+            if block in self.reachable:
+                continue
+            self.reachable.add(block)
+            for value in block.values:
+                self.evaluate(value, changed)
+            flow.extend(self.successors(block))
+
+    def successors(self, block):
+        if block.condition is None:
+            return [(block, succ) for succ in block.succs]
+        value = self.lattice.get(block.condition)
+        if value is None:
+            return []
+        if value is VARYING:
+            return [(block, succ) for succ in block.succs]
+        return [(block, block.succs[0 if value else 1])]
+
+    def incoming(self, phi):
+        # args coming by edges which are taken
+        return [arg for pred, arg in zip(phi.block.preds, phi.args)
+            if (pred, phi.block) in self.edges]
+
+    def evaluate(self, value, changed):
+        old = self.lattice.get(value)
+        if old is VARYING:
+            return
+        if isinstance(value, Constant):
+            new = value.value
+        elif isinstance(value, Phi):
+            new = None
+            for arg in self.incoming(value):
+                new = meet(new, self.lattice.get(arg))
+        elif isinstance(value, Operation):
+            args = [self.lattice.get(arg) for arg in value.args]
+            if None in args:
+                return
+            new = VARYING
+            if VARYING not in args:
+                result = compute(value.optype, args)
+                if result is not None:
+                    new = result
+        else:
+            new = VARYING
+        if new is not None and new != old:
+            self.lattice[value] = new
+            changed.append(value)
+
+    def constant(self, value):
+        constant = self.lattice.get(value)
+        return constant if isinstance(constant, int) else None
+
+    # global value numbering
+
+    def number(self):
+        ''' Values computed by the same operation from values with the same
+        numbers get the same number, which is the first value of them. '''
+        self.numbers, table = {}, {}
+        for block in self.order():
+            for value in block.phis + block.values:
+                self.numbers[value] = self.value_number(value, table)
+        self.holders = {}
+
+    def order(self):
+        # reverse postorder of reachable blocks, operands of a value other
+        # than phi are numbered before it
+        entry = self.blocks[0]
+        seen, order, stack = set([entry]), [], [(entry, iter(entry.succs))]
+        while stack:
+            block, succs = stack[-1]
+            for succ in succs:
+                if (block, succ) in self.edges and succ not in seen:
+                    seen.add(succ)
+                    stack.append((succ, iter(succ.succs)))
+                    break
+            else:
+                stack.pop()
+                order.append(block)
+        order.reverse()
+        return order
+
+    def value_number(self, value, table):
+        constant = self.constant(value)
+        if constant is not None:
+            key = (None, constant)
+        elif isinstance(value, Operation):
+            args = [self.numbers.get(arg) for arg in value.args]
+            if None in args:
+                return value
+            if value.optype in COMMUTATIVE:
+                args.sort(key=id)
+            key = (value.optype,) + tuple(args)
+        elif isinstance(value, Phi):
+            args = [self.numbers.get(arg) for arg in self.incoming(value)]
+            if None in args:
+                # value coming around a loop isn't numbered yet
+                return value
+            if all(arg is args[0] for arg in args):
+                return args[0]
+            key = (value.block,) + tuple(args)
+        else:
+            return value
+        return table.setdefault(key, value)
+
+    def holder(self, node, number):
+        ''' Tracked variable keeping a value with the number where the
+        expression node is computed. '''
+        env = self.envs[node]
+        holders = self.holders.get(id(env))
+        if holders is None:
+            holders = self.holders[id(env)] = {}
+            for symbol in self.symbols:
+                value = self.numbers.get(self.resolve(env[symbol]))
+                if value is not None:
+                    holders.setdefault(value, symbol)
+        return holders.get(number)
+
+    def replacement(self, node):
+        ''' Node giving the value of the expression without computing it,
+        None if there is no such node. '''
+        value = self.value_of(node)
+        if value is None:
+            return None
+        constant = self.constant(value)
+        if constant is not None:
+            if isinstance(node, SynConst):
+                return None
+            return literal(constant, node.pos)
+        if isinstance(value, Operation) and value in self.numbers:
+            symbol = self.holder(node, self.numbers[value])
+            if symbol is not None:
+                return variable(symbol, node.pos)
+        return None
+
+    # dead code elimination
+
+    def mark(self):
+        ''' Finds assignments needed by statements changing memory and by
+        conditions. Expressions replaced by literals need nothing, values of
+        phis are needed from every path which is taken. '''
+        defined = {}
+        for definition in self.definitions.itervalues():
+            defined.setdefault(
+                self.resolve(definition.value), []).append(definition)
+        self.replacements = {}
+        live, self.needed = set(), set()
+        nodes = [node for block, node in self.effects
+            if block in self.reachable]
+        values = []
+        for block, definition in self.kept:
+            if block in self.reachable:
+                self.needed.add(definition)
+        while nodes or values:
+            if nodes:
+                node = nodes.pop()
+                replacement = self.replace(node)
+                if replacement is not None:
+                    if type(replacement) is SynVar:
+                        values.append(self.resolve(
+                            self.envs[node][replacement.symbol]))
+                elif isinstance(node, SynVar):
+                    value = self.value_of(node)
+                    if value is not None:
+                        values.append(value)
+                else:
+                    nodes.extend(children(node))
+                continue
+            value = values.pop()
+            if value in live:
+                continue
+            live.add(value)
+            for definition in defined.get(value, ()):
+                stmt = definition.stmt
+                if (self.places[stmt] in self.reachable and
+                    definition not in self.needed
+                ):
+                    self.needed.add(definition)
+                    nodes.append(stmt.operands[1])
+            if isinstance(value, Phi):
+                values.extend(self.incoming(value))
+            elif value in self.increments:
+                values.extend(value.args)
+
+    def replace(self, node):
+        if node not in self.replacements:
+            self.replacements[node] = self.replacement(node)
+        return self.replacements[node]
+
+    # writing back
+
+    def rewrite_statement(self, stmt):
+        if self.places[stmt] not in self.reachable:
+            yield Return(None)
+        stmt = yield stmt
+        yield Return(stmt)
+
+    def rewrite_action(self, stmt):
+        stmt = yield self.rewrite_statement(stmt)
+        yield Return(stmt if stmt is not None else SynStatementBlock())
+
+    def rewrite_block(self, stmt):
+        statements = []
+        for child in stmt.statements:
+            child = yield self.rewrite_statement(child)
+            if child is not None:
+                statements.append(child)
+        stmt.statements = statements
+        yield Return(stmt)
+
+    def rewrite_assignment(self, stmt):
+        left = stmt.operands[0]
+        definition = self.definitions.get(stmt)
+        if definition is not None and definition not in self.needed:
+            yield Return(None)
+        right = stmt.operands[1] = yield stmt.operands[1]
+        if definition is not None:
+            if (type(right) is SynVar and
+                self.get_symbol(right) is definition.symbol
+            ):
+                yield Return(None)
+            yield Return(stmt)
+        while not isinstance(left, SynVar):
+            if isinstance(left, SynSubscript):
+                left.index = yield left.index
+                left = left.array
+            else:
+                left = left.record
+        yield Return(stmt)
+
+    def rewrite_operation(self, expr):
+        if expr.operation.type == tt.assign:
+            return self.rewrite_assignment(expr)
+        return self.rewrite_expression(expr, expr.operands)
+
+    def rewrite_expression(self, expr, children=()):
+        replacement = self.replace(expr)
+        if replacement is not None:
+            yield Return(replacement)
+        if isinstance(expr, SynSubscript):
+            expr.array = yield expr.array
+            expr.index = yield expr.index
+        elif isinstance(expr, SynFieldRequest):
+            expr.record = yield expr.record
+        elif isinstance(expr, SynCastToReal):
+            expr.expression = yield expr.expression
+        for i, child in enumerate(children):
+            children[i] = yield child
+        yield Return(expr)
+
+    def rewrite_if(self, stmt):
+        constant = self.constant(self.value_of(stmt.condition))
+        if constant is not None:
+            # only one of the actions is ever run
+            action = stmt.action if constant else stmt.else_action
+            if action is None:
+                yield Return(None)
+            action = yield self.rewrite_statement(action)
+            yield Return(action)
+        stmt.condition = yield stmt.condition
+        stmt.action = yield self.rewrite_action(stmt.action)
+        if stmt.else_action is not None:
+            stmt.else_action = yield self.rewrite_statement(stmt.else_action)
+        yield Return(stmt)
+
+    def rewrite_loop(self, stmt):
+        if stmt in self.bodies and self.bodies[stmt] not in self.reachable:
+            yield Return(None)
+        stmt.condition = yield stmt.condition
+        stmt.action = yield self.rewrite_action(stmt.action)
+        yield Return(stmt)
+
+    def rewrite_for(self, stmt):
+        if self.bodies[stmt] not in self.reachable:
+            # counter keeps its initial value
+            assignment = yield self.rewrite_statement(stmt.assignment)
+            yield Return(assignment)
+        operands = stmt.assignment.operands
+        stmt.initial = operands[1] = yield operands[1]
+        operands = stmt.check.operands
+        stmt.final = operands[1] = yield operands[1]
+        stmt.action = yield self.rewrite_action(stmt.action)
+        yield Return(stmt)
+
+    def rewrite_write(self, stmt):
+        args = []
+        for arg in stmt.args:
+            args.append((yield arg))
+        stmt.args = tuple(args)
+        yield Return(stmt)
+
+    def rewrite_result(self, stmt):
+        stmt.value = yield stmt.value
+        yield Return(stmt)
+
+    rewrite_handlers = {
+        SynOperation: rewrite_operation,
+        SynCall: lambda self, expr: self.rewrite_expression(expr, expr.args),
+        SynExpr: rewrite_expression,
+        SynStatementBlock: rewrite_block,
+        SynStatementIf: rewrite_if,
+        SynStatementWhile: rewrite_loop,
+        SynStatementRepeat: rewrite_loop,
+        SynStatementFor: rewrite_for,
+        SynStatementWrite: rewrite_write,
+        SynStatementResult: rewrite_result,
+        SynNode: lambda self, stmt: stmt,
+    }
+
+def children(node):
+    ''' Expressions computed for the node. '''
+    if isinstance(node, SynOperation):
+        return node.operands
+    if isinstance(node, SynSubscript):
+        return [node.array, node.index]
+    if isinstance(node, SynFieldRequest):
+        return [node.record]
+    if isinstance(node, SynCastToReal):
+        return [node.expression]
+    if isinstance(node, SynCall):
+        return node.args
+    if isinstance(node, SynStatementWrite):
+        return node.args
+    if isinstance(node, SynStatementResult):
+        return [node.value]
+    return []
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+
+from tok.token import tt
+from syn.tree import *
+from syn.visitor import Return
+from allocator import is_real
+from main import Generator, SWAPPED_CONDITIONS, COMMUTATIVE, real_bits
+import asm
+
+XMM_REGISTERS = tuple('xmm' + str(i) for i in range(8))
+# registers of real variables are taken from xmm7 down, the rest keeps
+# values being computed
+XMM_SAVED = ('xmm7', 'xmm6', 'xmm5', 'xmm4')
+
+SSE_COMMANDS = {
+    tt.plus:  'addss',
+    tt.minus: 'subss',
+    tt.mul:   'mulss',
+    tt.div:   'divss',
+}
+SIGN_BIT = 0x80000000
+
+class SSEGenerator(Generator):
+    ''' Generator computing reals by scalar SSE2 instructions instead of the
+    FPU. Value being computed is in the xmm register following registers of
+    the values waiting for it, real variables are kept in XMM_SAVED. These
+    are saved by functions changing them like callee-saved registers, but
+    printf doesn't keep them: variables of the function are saved around
+    write, and a function calling printf saves all of XMM_SAVED for its
+    callers. '''
+
+    VARIABLE_REGISTERS = Generator.VARIABLE_REGISTERS + (
+        (XMM_SAVED, is_real, 'movss'),
+    )
+
+    def xmm(self, offset=0):
+        return XMM_REGISTERS[self.fpu + offset]
+
+    def free_real_registers(self):
+        taken = set(self.registers.itervalues()) & set(XMM_SAVED)
+        return len(XMM_REGISTERS) - len(taken) - self.fpu
+
+    def load_real(self, operand):
+        if operand in XMM_REGISTERS:
+            self.cmd('movaps', self.xmm(), operand)
+        else:
+            self.cmd('movss', self.xmm(), operand)
+
+    def store_real(self, operand):
+        self.cmd('movss', operand, self.xmm())
+
+    def load_real_from(self, reg):
+        self.cmd('movd', self.xmm(), reg)
+
+    def push_double(self):
+        self.cmd(
+            ('cvtss2sd', self.xmm(), self.xmm()),
+            ('sub', 'esp', 8),
+            ('movsd', asm.SizeCast('qword', asm.Offset('esp')), self.xmm()),
+        )
+
+    def saving_xmm(self, registers):
+        # registers are kept on the stack
+        if not registers:
+            return [], []
+        size = 4 * len(registers)
+        return (
+            [asm.Command('sub', 'esp', size)] +
+            [asm.Command('movss', self.stack(4 * i), reg)
+                for i, reg in enumerate(registers)],
+            [asm.Command('movss', reg, self.stack(4 * i))
+                for i, reg in enumerate(registers)] +
+            [asm.Command('add', 'esp', size)])
+
+    def saving_commands(self, used):
+        save, restore = Generator.saving_commands(self, used)
+        # printf may change any xmm register, variables of callers too
+        writes = 'printf' in used
+        xmm_save, xmm_restore = self.saving_xmm(
+            [reg for reg in XMM_SAVED if reg in used or writes])
+        return save + xmm_save, xmm_restore + restore
+
+    def real_operand(self, expr):
+        ''' Register or memory operand of a real value used by SSE
+        instruction without loading the value, None if there is no such
+        one. '''
+        if isinstance(expr, SynConst):
+            return self.allocate_real(expr.token.value)
+        if isinstance(expr, (SynVar, SynSubscript, SynFieldRequest)):
+            register = self.register(expr)
+            if register is not None:
+                return register
+            address = self.static_address(expr)
+            if address is not None:
+                return self.memory(address)
+        return None
+
+    def generate_real_comparison(self, expr, regs):
+        # variable kept in register is compared without copying it
+        left, right = expr.operands
+        optype = expr.operation.type
+        register = self.register(left)
+        operand = self.real_operand(right)
+        if operand is not None:
+            if register is None:
+                yield left, regs
+                register = self.xmm()
+            self.cmd('comiss', register, operand)
+            yield Return(optype)
+        if register is not None:
+            yield right, regs
+            self.cmd('comiss', register, self.xmm())
+            yield Return(optype)
+        left_on_top, memory = yield self.generate_real_operands(expr, regs)
+        if memory is not None:
+            # lea frees the memory keeping the flags
+            self.cmd(
+                ('comiss', self.xmm(), memory),
+                ('lea', 'esp', asm.Offset('esp', 4)),
+            )
+        else:
+            # the value computed first is in the lower register
+            self.cmd('comiss', self.xmm(), self.xmm(1))
+            left_on_top = not left_on_top
+        yield Return(optype if left_on_top else SWAPPED_CONDITIONS[optype])
+
+    def generate_real_assignment(self, left, right, regs):
+        register = self.register(left)
+        operand = self.real_operand(right)
+        if register is None and operand in XMM_REGISTERS:
+            address = yield self.generate_address(left, regs)
+            self.cmd('movss', self.memory(address), operand)
+            return
+        if register is None:
+            yield Generator.generate_real_assignment(self, left, right, regs)
+            return
+        command, value = 'movss', right
+        if (isinstance(right, SynOperation) and
+            right.operation.type in SSE_COMMANDS and
+            len(right.operands) == 2
+        ):
+            # variable is changed in its register
+            first, second = right.operands
+            if (self.register(second) == register and
+                right.operation.type in COMMUTATIVE
+            ):
+                first, second = second, first
+            if self.register(first) == register:
+                command = SSE_COMMANDS[right.operation.type]
+                value = second
+        operand = self.real_operand(value)
+        if operand is None:
+            yield value, regs
+            operand = self.xmm()
+        if command == 'movss' and operand in XMM_REGISTERS:
+            command = 'movaps'
+        self.cmd(command, register, operand)
+
+    def generate_constant(self, stmt, regs):
+        if not self.is_real(stmt):
+            Generator.generate_constant(self, stmt, regs)
+        elif real_bits(stmt.token.value) == 0:
+            self.cmd('xorps', self.xmm(), self.xmm())
+        else:
+            self.load_real(self.allocate_real(stmt.token.value))
+
+    def generate_cast(self, stmt, regs):
+        # integer is taken from register or memory
+        operand = self.operand(stmt.expression, tt.assign)
+        if operand is None or isinstance(stmt.expression, SynConst):
+            yield stmt.expression, regs
+            operand = regs[0]
+        self.cmd('cvtsi2ss', self.xmm(), operand)
+
+    def generate_write(self, stmt):
+        save, restore = self.saving_xmm(sorted(
+            set(self.registers.itervalues()) & set(XMM_SAVED)))
+        self.instructions.extend(save)
+        yield Generator.generate_write(self, stmt)
+        self.instructions.extend(restore)
+
+    handlers = dict(Generator.handlers)
+    handlers.update({
+        SynConst: generate_constant,
+        SynCastToReal: generate_cast,
+        SynStatementWrite: generate_write,
+    })
+
+    def generate_float_binary(self, binop, regs):
+        # result replaces the left operand
+        command = SSE_COMMANDS[binop.operation.type]
+        operand = self.real_operand(binop.operands[1])
+        if operand is not None:
+            yield binop.operands[0], regs
+            self.cmd(command, self.xmm(), operand)
+            return
+        left_on_top, memory = yield self.generate_real_operands(binop, regs)
+        ordered = binop.operation.type in (tt.minus, tt.div)
+        if memory is None:
+            if left_on_top and ordered:
+                self.cmd(
+                    (command, self.xmm(1), self.xmm()),
+                    ('movaps', self.xmm(), self.xmm(1)),
+                )
+            else:
+                self.cmd(command, self.xmm(), self.xmm(1))
+        elif left_on_top or not ordered:
+            self.cmd(
+                (command, self.xmm(), memory),
+                ('add', 'esp', 4),
+            )
+        else:
+            # left operand waits in memory, the right one is put next to it
+            self.spill_real()
+            self.cmd(
+                ('movss', self.xmm(), self.stack(4)),
+                (command, self.xmm(), self.stack()),
+                ('add', 'esp', 8),
+            )
+
+    def generate_unary(self, unop, reg):
+        if not self.is_real(unop):
+            Generator.generate_unary(self, unop, reg)
+            return
+        # sign bit is changed in integer register
+        self.cmd(
+            ('movd', reg, self.xmm()),
+            ('xor', reg, SIGN_BIT),
+            ('movd', self.xmm(), reg),
+        )
@@ -12,7 +12,9 @@ Usage: spc [option] [filename1] [filename2] [...]
 -s, --simple-decl    parse expressions with simple declarations
 -d, --decl           parse normal Pascal declarations
 -f, --full-syntax    perform a full parse
--g, --generate       generate assembly code\
+-g, --generate       generate assembly code
+-r, --recover        report all errors of a program, not only the first one
+-x, --sse            compute reals by SSE2 instructions instead of the FPU\
 '''
 
 import sys
@@ -21,7 +23,7 @@ import getopt
 import subprocess
 
 from common.functions import quote
-from common.errors import CompileError
+from common.errors import CompileError, ErrorReport
 from tok.tokenizer import Tokenizer
 from tok.printer import print_tokens
 from syn.simple import SimpleParser
@@ -29,19 +31,28 @@ from syn.expressions import ExprParser
 from syn.full import Parser
 from syn.printer import SyntaxTreePrinter
 from gen.main import Generator, FASM_PATH
+from gen.sse import SSEGenerator
 
 class Compiler(object):
-    def __init__(self, program, fname):
-        self.tokenizer = Tokenizer(program)
+    def __init__(self, program, fname, recover=False, sse=False):
+        # in recovery mode all errors are collected, compilation stops
+        # when the program is checked
+        self.errors = [] if recover else None
+        self.tokenizer = Tokenizer(program, errors=self.errors)
         self.fname = fname
+        self.generator_class = SSEGenerator if sse else Generator
+
+    def check_errors(self):
+        if self.errors:
+            raise ErrorReport(self.errors)
 
     def tokenize(self):
-        tokens = []
         try:
-            for token in self.tokenizer:
-                tokens.append(token)
+            while not self.tokenizer.eof:
+                self.tokenizer.next_token()
         finally:
-            print_tokens(tokens)
+            print_tokens(self.tokenizer.tokens)
+        self.check_errors()
 
     def _common_parse(self):
         expressions = []
@@ -50,6 +61,7 @@ class Compiler(object):
                 expressions.append(expr)
         finally:
             SyntaxTreePrinter(expressions, self.fname).write()
+        self.check_errors()
 
     def parse_expressions(self):
         self.parser = ExprParser(self.tokenizer)
@@ -62,15 +74,17 @@ class Compiler(object):
     def parse_decl(self):
         from tok.token import tt
         self._get_symbol_table(Parser)
-        if self.parser.token.type == tt.kwBegin:
+        if self.parser.token_type == tt.kwBegin:
             self.parser.next_token()
             self._common_parse()
             self.parser.require_token(tt.kwEnd)
             self.parser.require_token(tt.dot)
+        self.check_errors()
 
     def parse(self):
-        self.parser = Parser(self.tokenizer)
+        self.parser = Parser(self.tokenizer, self.errors)
         program = self.parser.parse()
+        self.check_errors()
         self.parser.symtable.write()
         print ''
         program.display()
@@ -81,10 +95,11 @@ class Compiler(object):
         self.parser.symtable.write()
 
     def common_generate(self, optimize=False):
-        self.parser = Parser(self.tokenizer)
+        self.parser = Parser(self.tokenizer, self.errors)
         program = self.parser.parse()
         self.parser.check_program(program)
-        self.generator = Generator(program, self.parser, optimize)
+        self.check_errors()
+        self.generator = self.generator_class(program, self.parser, optimize)
         return self.generator.generate()
 
     def generate(self):
@@ -146,6 +161,9 @@ def main(argv):
     for key in compiler_actions:
         compiler_options[key] = key[0]
     compiler_actions['compile'] = Compiler.compile_
+    # modifiers of other options
+    compiler_options['recover'] = 'r'
+    compiler_options['sse'] = 'x'
 
     try:
         opts, args = getopt.getopt(
@@ -158,6 +176,8 @@ def main(argv):
 
     present = lambda o: o in opts or compiler_options[o] in opts
 
+    recover, sse = present('recover'), present('sse')
+    opts = [o for o in opts if o not in ('recover', 'r', 'sse', 'x')]
     if present('help') or len(opts) > 1:
         return usage()
 
@@ -176,8 +196,13 @@ def main(argv):
                if present(opt))
     try:
         for option, fname in job:
-            with open(fname, buffering=10) as source:
-                compiler_actions[option](Compiler(source, fname))
+            with open(fname) as source:
+                compiler_actions[option](
+                    Compiler(source, fname, recover, sse))
+    except ErrorReport, report:
+        for e in report.errors:
+            error(fname + str(e))
+        return 2
     except CompileError, e:
         return error(fname + str(e))
     return 0
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+import math
+import struct
+import operator
+
+from tok.token import Token, tt
+from tree import SynConst, SynVar, SynOperation, SynCastToReal
+from table import SymConst, SymTypeAlias, SymTypeReal
+from visitor import Visitor, Return
+
+def to_integer(value):
+    # integers are 32-bit registers at run time
+    return int((value + 2 ** 31) % 2 ** 32 - 2 ** 31)
+
+def to_real(value):
+    # reals are stored in 32 bits, result of every operation is rounded
+    try:
+        value = struct.unpack('f', struct.pack('f', value))[0]
+    except OverflowError:
+        return None
+    return value if not (math.isinf(value) or math.isnan(value)) else None
+
+def compare(op):
+    return lambda a, b: int(op(a, b))
+
+def int_div(a, b):
+    # dividend is extended with zero, not with its sign, so only
+    # non-negative dividends are computed the same way as at run time
+    if a < 0 or b == 0:
+        return None
+    quotient = a // abs(b)
+    return quotient if b > 0 else -quotient
+
+def int_mod(a, b):
+    quotient = int_div(a, b)
+    return None if quotient is None else a - quotient * b
+
+comparisons = {
+    tt.equal:            compare(operator.eq),
+    tt.not_equal:        compare(operator.ne),
+    tt.less:             compare(operator.lt),
+    tt.less_or_equal:    compare(operator.le),
+    tt.greater:          compare(operator.gt),
+    tt.greater_or_equal: compare(operator.ge),
+}
+
+integer_ops = dict(comparisons, **{
+    tt.plus:      operator.add,
+    tt.minus:     operator.sub,
+    tt.mul:       operator.mul,
+    tt.int_div:   int_div,
+    tt.int_mod:   int_mod,
+    tt.logic_and: lambda a, b: int(bool(a and b)),
+    tt.logic_or:  lambda a, b: int(bool(a or b)),
+    tt.logic_xor: operator.xor,
+    tt.shl:       lambda a, b: a << (b & 31),
+    tt.shr:       lambda a, b: (a & 0xffffffff) >> (b & 31),
+})
+
+real_ops = dict(comparisons, **{
+    tt.plus:  operator.add,
+    tt.minus: operator.sub,
+    tt.mul:   operator.mul,
+    tt.div:   lambda a, b: a / b if b else None,
+})
+
+def constant_value(symbol):
+    ''' Value of constant symbol converted to its declared type, None if
+    the constant can't be computed at compile time. '''
+    value = evaluate(symbol.value)
+    type_ = symbol.type
+    while not type_.is_type() or isinstance(type_, SymTypeAlias):
+        type_ = type_.type
+    if isinstance(type_, SymTypeReal):
+        return to_real(float(value)) if value is not None else None
+    return value if isinstance(value, int) else None
+
+class Evaluator(Visitor):
+    def evaluate(self, expr):
+        ''' Computes value of expression made of literals and constants
+        the same way it is computed at run time. Returns int or float, or
+        None if the expression isn't constant. '''
+        return self.walk(self.handlers, expr)
+
+    def literal_value(self, expr):
+        # type names integer and real are tokens of these types too, their
+        # values are the names
+        value = expr.token.value
+        if not isinstance(value, (int, long, float)):
+            return None
+        if expr.token.type == tt.integer:
+            return to_integer(value)
+        if expr.token.type == tt.real:
+            return to_real(value)
+        return None
+
+    def variable_value(self, expr):
+        if isinstance(expr.symbol, SymConst):
+            return constant_value(expr.symbol)
+        return None
+
+    def cast_value(self, expr):
+        value = yield expr.expression
+        if value is not None:
+            yield Return(to_real(float(value)))
+
+    def operation_value(self, expr):
+        values = []
+        for op in expr.operands:
+            value = yield op
+            if value is None:
+                yield Return(None)
+            values.append(value)
+        yield Return(compute(expr.operation.type, values))
+
+    handlers = {
+        SynConst: literal_value,
+        SynVar: variable_value,
+        SynCastToReal: cast_value,
+        SynOperation: operation_value,
+        object: lambda self, expr: None,
+    }
+
+evaluate = Evaluator().evaluate
+
+def compute(optype, values):
+    is_real = any(isinstance(value, float) for value in values)
+    if len(values) == 1:
+        value, = values
+        if optype == tt.minus:
+            return to_real(-value) if is_real else to_integer(-value)
+        if optype == tt.logic_not and not is_real:
+            return int(value == 0)
+        return None
+    if optype == tt.div:
+        is_real = True
+    if is_real:
+        # integer operand is cast to real
+        values = [to_real(float(value)) for value in values]
+        if None in values:
+            return None
+    ops = real_ops if is_real else integer_ops
+    if optype not in ops:
+        return None
+    value = ops[optype](*values)
+    if value is None or optype in comparisons:
+        return value
+    return to_real(value) if is_real else to_integer(value)
+
+def literal(value, linepos):
+    ''' Constant node for the value, placed at the given position. '''
+    ttype = tt.real if isinstance(value, float) else tt.integer
+    token = Token(ttype, str(value), value)
+    token.line, token.pos = linepos
+    return SynConst(token)
@@ -4,6 +4,7 @@ from common.functions import copy_args
 from common.errors import *
 from tok.token import tt
 from tree import *
+from visitor import Visitor, Return
 
 binary_ops = [
     [
@@ -34,61 +35,101 @@ binary_ops = [
     ],
     [],
 ]
-max_priority = len(binary_ops) - 1
+# binding power of an operation is its priority in binary_ops
+binding_powers = dict(
+    (op, priority) for priority, ops in enumerate(binary_ops) for op in ops)
+
+class ExprParser(Visitor):
+    ''' Parsing methods which may be nested to any depth are generators run
+    by Visitor.run(), a nested construct is parsed by yielding generator
+    of its parsing method. Python stack stays the same at any depth. '''
 
-class ExprParser(object):
     @copy_args
     def __init__(self, tokenizer): pass
 
     def __iter__(self):
-        while self.token.type != tt.eof:
+        while self.token_type != tt.eof:
             yield self.parse_expression()
 
     def e(self, message, pos=None):
         if pos is None:
-            pos = self.token.linepos
+            pos = self.token_linepos
         raise SynError(message, pos)
 
     @property
     def token(self):
         return self.tokenizer.get_token()
 
+    # type, value and position of the current token are read directly
+    # from the tokenizer without creating a Token object
+    @property
+    def token_type(self):
+        return self.tokenizer.token_type
+
+    @property
+    def token_value(self):
+        return self.tokenizer.token_value
+
+    @property
+    def token_linepos(self):
+        return self.tokenizer.linepos
+
+    @property
+    def prevpos(self):
+        return self.tokenizer.position(self._previous)
+
     def next_token(self):
-        self.prevpos = self.token.linepos
+        # position of the previous token is computed only for errors
+        self._previous = self.tokenizer.mark()
         self.tokenizer.next_token()
 
     def parse_expression(self):
+        return self.run(self.expression())
+
+    def expression(self):
+        # generator parsing an expression inside of another construct
         return self.internal_parse(0)
 
     def internal_parse(self, priority):
-        if priority < max_priority:
-            result = self.internal_parse(priority + 1)
-        else:
-            result = self.parse_factor()
-        while self.token.type in binary_ops[priority]:
-            operation = self.token
+        # operator precedence parsing: operations binding weaker than
+        # priority are left to the caller, all operations are left
+        # associative, so an operation is built as soon as the next one
+        # binds the same or weaker
+        operands = [(yield self.parse_factor())]
+        operations = []
+        power = binding_powers.get(self.token_type)
+        while power is not None and power >= priority:
+            while operations and binding_powers[operations[-1].type] >= power:
+                self.build_operation(operations, operands)
+            operations.append(self.token)
             self.next_token()
-            result = SynOperation(
-                operation, result, self.internal_parse(priority + 1))
-        return result
+            operands.append((yield self.parse_factor()))
+            power = binding_powers.get(self.token_type)
+        while operations:
+            self.build_operation(operations, operands)
+        yield Return(operands[0])
+
+    def build_operation(self, operations, operands):
+        right = operands.pop()
+        operands[-1] = SynOperation(operations.pop(), operands[-1], right)
 
     def parse_factor(self):
-        if self.token.type == tt.eof:
-            return None
-        position = self.token.linepos
+        if self.token_type == tt.eof:
+            yield Return(None)
+        start = self.tokenizer.mark()
 
-        if self.token.type == tt.lparen:
+        if self.token_type == tt.lparen:
             self.next_token()
-            result = self.parse_expression()
-            if self.token.type != tt.rparen:
-                self.e('Parenthesis mismatch', position)
-        elif self.token.type == tt.identifier:
+            result = yield self.expression()
+            if self.token_type != tt.rparen:
+                self.e('Parenthesis mismatch', self.tokenizer.position(start))
+        elif self.token_type == tt.identifier:
             result = self.parse_identifier()
-        elif self.token.type in (tt.integer, tt.real, tt.string_const):
+        elif self.token_type in (tt.integer, tt.real, tt.string_const):
             result = SynConst(self.token)
         else:
             self.e("Unexpected character '{0}'".format(self.token.text))
-        return self.return_factor(result)
+        yield Return(self.return_factor(result))
 
     def return_factor(self, factor):
         self.next_token()
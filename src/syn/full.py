@@ -1,16 +1,44 @@
 # -*- coding: utf-8 -*-
 
-import copy
-
 from common.errors import *
 from tok.token import tt, keywords
 from tree import *
 from table import *
 from expressions import ExprParser
-
-class Parser(ExprParser):
-    def __init__(self, tokenizer):
+from constants import evaluate, literal
+from visitor import Visitor, Return
+
+# tokens a bound of array range can start with
+bound_start = (
+    tt.integer, tt.real, tt.identifier, tt.lparen, tt.minus, tt.logic_not)
+
+int_ops = (
+    tt.logic_and, tt.logic_or,
+    tt.logic_xor, tt.logic_not,
+    tt.shr, tt.shl,
+    tt.int_div, tt.int_mod,
+)
+comparisons = (
+    tt.equal, tt.not_equal,
+    tt.less, tt.less_or_equal,
+    tt.greater, tt.greater_or_equal,
+)
+
+# tokens parsing resumes at after an error in recovery mode
+declaration_start = (
+    tt.kwBegin, tt.kwType, tt.kwConst, tt.kwVar, tt.kwFunction, tt.kwProcedure)
+declaration_sync = declaration_start + (tt.semicolon,)
+statement_sync = (tt.semicolon, tt.kwEnd)
+# tokens starting and ending parts of program which contain sync tokens
+nested_start = (tt.kwBegin, tt.kwRepeat, tt.kwRecord)
+nested_end = (tt.kwEnd, tt.kwUntil)
+
+class Parser(ExprParser, Visitor):
+    def __init__(self, tokenizer, errors=None):
         super(Parser, self).__init__(tokenizer)
+        # in recovery mode errors are appended to the list, parser skips
+        # the wrong declaration or statement and goes on
+        self.errors = errors
         self.end_of_program = False
         self.allow_empty = False
         self.symtable_stack = SymTableStack(SymTable())
@@ -39,24 +67,56 @@ class Parser(ExprParser):
         return self.get_root_type(type_)
 
     def expect(self, expected):
-        found = self.token.value or self.token.text
+        found = self.token_value or self.token.text
         self.e(E_EXPECTED, expected, found)
 
     def e(self, message, *args):
-        if self._saved_pos:
-            pos = self._saved_pos
+        if self._saved_pos is not None:
+            pos = self.tokenizer.position(self._saved_pos)
             self.clear_position()
         else:
-            pos = self.token.linepos
+            pos = self.token_linepos
         raise SynError(message, pos, *args)
 
     def save_position(self):
         # save current token position for error messages
-        self._saved_pos = self.token.linepos
+        self._saved_pos = self.tokenizer.mark()
 
     def clear_position(self):
         self._saved_pos = None
 
+    def report(self, error):
+        # raises the error, or only keeps it in recovery mode; of errors
+        # found at the same position only the first one is kept
+        if self.errors is None:
+            raise error
+        if not self.errors or self.errors[-1].linepos != error.linepos:
+            self.errors.append(error)
+
+    def state(self):
+        # parser state to return to after an error
+        return (self.block_depth, self.loop_depth, self.current_function,
+            len(self.symtable_stack.content))
+
+    def recover(self, error, state, sync):
+        ''' Reports the error and skips tokens up to one of sync tokens
+        which isn't inside of a nested block, record or loop. '''
+        self.report(error)
+        self.clear_position()
+        self.block_depth, self.loop_depth, self.current_function, tables = \
+            state
+        del self.symtable_stack.content[tables:]
+        self.allow_empty = False
+        depth = 0
+        while self.token_type != tt.eof:
+            if not depth and self.token_type in sync:
+                break
+            if self.token_type in nested_start:
+                depth += 1
+            elif depth and self.token_type in nested_end:
+                depth -= 1
+            self.next_token()
+
     def require_token(self, tokentype):
         current = self.token
         if current.type != tokentype:
@@ -74,210 +134,250 @@ class Parser(ExprParser):
         return name
 
     def parse(self):
-        self.parse_declarations()
-        if self.token.type == tt.eof:
-            self.expect(tt.kwBegin.text)
-        return self.parse_statement()
+        try:
+            self.parse_declarations()
+            if self.token_type == tt.eof:
+                self.expect(tt.kwBegin.text)
+            return self.run(self.parse_statement())
+        except SourceError as error:
+            # in recovery mode program is what has been parsed before
+            self.report(error)
+            return SynStatementBlock()
 
     def parse_declarations(self):
-
-        def parse_type(complex=True):
-            complex_handlers = {
-                tt.kwArray: parse_array,
-                tt.kwRecord: parse_record,
-            }
-            ttype = self.token.type
-            if ttype in complex_handlers:
-                if complex:
-                    self.next_token()
-                    return complex_handlers[ttype]()
-                else:
-                    self.e('Inline arrays and records are not allowed here')
-            type = self.find_symbol(self.token.value)
-            if type is None:
-                self.e("Unknown type '{0}'", self.token.value)
-            if not type.is_type():
-                self.expect('Typename')
+        while self.token_type in self.declaration_handlers:
+            parsefunc, args = self.declaration_handlers[self.token_type]
             self.next_token()
-            return type
-
-        def parse_array():
-            self.require_token(tt.lbracket)
-            lbound = self.require_token(tt.integer).value
-            self.save_position()
-            self.require_token(tt.double_dot)
-            rbound = self.require_token(tt.integer).value
-            self.require_token(tt.rbracket)
-            self.require_token(tt.kwOf)
-            atype = parse_type()
-            if lbound > rbound:
-                self.e('Upper bound of range is less than lower bound')
-            self.clear_position()
-            return SymTypeArray(atype, SymTypeRange(lbound, rbound))
-
-        def parse_record():
-            table = SymTable()
-            self.symtable_stack.append(table)
-            while self.token.type == tt.identifier:
-                parse_var_decl()
-            self.require_token(tt.kwEnd)
-            return SymTypeRecord(
-                self.anonymous_typename(), self.symtable_stack.pop())
-
-        def parse_ident():
-            name = self.token.value
-            self.save_position()
-            self.require_token(tt.identifier)
-            if name in keywords:
-                self.e(E_RESERVED_NAME)
-            if self.look_up:
-                search = self.find_symbol
-            else:
-                search = lambda name: name in self.symtable
-            if search(name):
-                self.e(E_REDECLARED, name)
-            self.clear_position()
-            return name
+            self.parse_declaration(parsefunc, *args)
+            while self.token_type == tt.identifier:
+                self.parse_declaration(parsefunc, *args)
+
+    def parse_declaration(self, parsefunc, *args):
+        state = self.state()
+        try:
+            parsefunc(self, *args)
+        except SourceError as error:
+            self.recover(error, state, declaration_sync)
+            if self.token_type == tt.semicolon:
+                self.next_token()
 
-        def parse_ident_list():
-            names = [parse_ident()]
-            while self.token.type == tt.comma:
+    def parse_type(self, complex=True):
+        ttype = self.token_type
+        if ttype in self.type_handlers:
+            if complex:
                 self.next_token()
-                names.append(parse_ident())
-            return names
-
-        def parse_type_decl():
-            typename = parse_ident()
-            self.require_token(tt.equal)
-            ttype = parse_type()
-            self.require_token(tt.semicolon)
-            if isinstance(ttype, SymTypeAlias):
-                ttype = ttype.type
-            self.symtable.insert(SymTypeAlias(typename, ttype))
-
-        def parse_const_decl():
-            constname = parse_ident()
-            if self.token.type == tt.colon:
+                return self.type_handlers[ttype](self)
+            else:
+                self.e('Inline arrays and records are not allowed here')
+        type = self.find_symbol(self.token_value)
+        if type is None:
+            self.e("Unknown type '{0}'", self.token_value)
+        if not type.is_type():
+            self.expect('Typename')
+        self.next_token()
+        return type
+
+    def parse_bound(self):
+        # bound of range is a constant integer expression
+        if self.token_type not in bound_start:
+            self.expect('integer')
+        start, found = self.tokenizer.mark(), self.token_value
+        # assignment binds weaker than anything else and isn't a part of
+        # bound, so '..' is expected after 1 in [1:=10]
+        bound = evaluate(self.run(self.internal_parse(1)))
+        if not isinstance(bound, int):
+            raise SynError(E_EXPECTED,
+                self.tokenizer.position(start), 'integer', found)
+        return bound
+
+    def parse_array(self):
+        self.require_token(tt.lbracket)
+        lbound = self.parse_bound()
+        self.save_position()
+        self.require_token(tt.double_dot)
+        rbound = self.parse_bound()
+        self.require_token(tt.rbracket)
+        self.require_token(tt.kwOf)
+        atype = self.parse_type()
+        if lbound > rbound:
+            self.e('Upper bound of range is less than lower bound')
+        self.clear_position()
+        return SymTypeArray(atype, SymTypeRange(lbound, rbound))
+
+    def parse_record(self):
+        table = SymTable()
+        self.symtable_stack.append(table)
+        while self.token_type == tt.identifier:
+            self.parse_declaration(Parser.parse_var_decl)
+        self.require_token(tt.kwEnd)
+        return SymTypeRecord(
+            self.anonymous_typename(), self.symtable_stack.pop())
+
+    type_handlers = {
+        tt.kwArray: parse_array,
+        tt.kwRecord: parse_record,
+    }
+
+    def parse_ident(self):
+        name = self.token_value
+        self.save_position()
+        self.require_token(tt.identifier)
+        if name in keywords:
+            self.e(E_RESERVED_NAME)
+        if self.look_up:
+            search = self.find_symbol
+        else:
+            search = lambda name: name in self.symtable
+        if search(name):
+            self.e(E_REDECLARED, name)
+        self.clear_position()
+        return name
+
+    def parse_ident_list(self):
+        names = [self.parse_ident()]
+        while self.token_type == tt.comma:
+            self.next_token()
+            names.append(self.parse_ident())
+        return names
+
+    def parse_type_decl(self):
+        typename = self.parse_ident()
+        self.require_token(tt.equal)
+        ttype = self.parse_type()
+        self.require_token(tt.semicolon)
+        if isinstance(ttype, SymTypeAlias):
+            ttype = ttype.type
+        self.symtable.insert(SymTypeAlias(typename, ttype))
+
+    def parse_const_decl(self):
+        constname = self.parse_ident()
+        if self.token_type == tt.colon:
+            self.next_token()
+            consttype = self.parse_type()
+        else:
+            consttype = None
+        self.require_token(tt.equal)
+        constvalue = self.parse_expression()
+        self.require_token(tt.semicolon)
+        # value is computed now, so the constant can be used in bounds
+        # of arrays and substituted into expressions
+        value = evaluate(constvalue)
+        if value is not None:
+            constvalue = literal(value, constvalue.pos)
+            if consttype is None:
+                consttype = self.get_type(constvalue)
+        if consttype is None:
+            consttype = SymTypeInt() # dummy type
+        self.symtable.insert(SymConst(constname, consttype, constvalue))
+
+    def parse_var_decl(self):
+        varnames = self.parse_ident_list()
+        self.require_token(tt.colon)
+        vartype = self.parse_type()
+        if self.token_type == tt.equal:
+            if len(varnames) > 1:
+                self.e('Only one variable can be initialized')
+            self.next_token()
+            varvalue = self.parse_expression()
+        else:
+            varvalue = None
+        self.require_token(tt.semicolon)
+        for var in varnames:
+            self.symtable.insert(SymVar(var, vartype, varvalue))
+
+    def parse_args(self, current_offset):
+        while self.token_type in (tt.kwVar, tt.identifier):
+            if self.token_type == tt.kwVar:
+                by_value = False
                 self.next_token()
-                consttype = parse_type()
             else:
-                consttype = SymTypeInt() # dummy type
-            self.require_token(tt.equal)
-            constvalue = self.parse_expression()
-            self.require_token(tt.semicolon)
-            self.symtable.insert(SymConst(constname, consttype, constvalue))
-
-        def parse_var_decl():
-            varnames = parse_ident_list()
+                by_value = True
+            names = self.parse_ident_list()
             self.require_token(tt.colon)
-            vartype = parse_type()
-            if self.token.type == tt.equal:
-                if len(varnames) > 1:
-                    self.e('Only one variable can be initialized')
+            type = self.parse_type(complex=False)
+            for name in names:
+                self.symtable.append(
+                    SymFunctionArgument(
+                        name, type, by_value, current_offset))
+                current_offset += 4
+            if self.token_type == tt.semicolon:
                 self.next_token()
-                varvalue = self.parse_expression()
-            else:
-                varvalue = None
-            self.require_token(tt.semicolon)
-            for var in varnames:
-                self.symtable.insert(SymVar(var, vartype, varvalue))
-
-        def parse_subprogram(has_result):
-            def parse():
-
-                def parse_args(current_offset):
-                    while self.token.type in (tt.kwVar, tt.identifier):
-                        if self.token.type == tt.kwVar:
-                            by_value = False
-                            self.next_token()
-                        else:
-                            by_value = True
-                        names = parse_ident_list()
-                        self.require_token(tt.colon)
-                        type = parse_type(complex=False)
-                        for name in names:
-                            self.symtable.append(
-                                SymFunctionArgument(
-                                    name, type, by_value, current_offset))
-                            current_offset += 4
-                        if self.token.type == tt.semicolon:
-                            self.next_token()
-                            if self.token.type == tt.rparen:
-                                self.expect('parameter')
-
-                name = parse_ident()
-                function = SymTypeFunction(name)
-                self.symtable.insert(function)
-                function.args = []
-                self.symtable_stack.append(function.args)
-                current_offset = 0
-                if self.token.type == tt.lparen:
-                    self.next_token()
-                    if self.token.type != tt.rparen:
-                        parse_args(current_offset)
-                    self.require_token(tt.rparen)
-                if has_result:
-                    self.require_token(tt.colon)
-                    function.type = parse_type(complex=False)
-                else:
-                    function.type = None
-                function.has_result = has_result
-                self.require_token(tt.semicolon)
-                function.declarations = SymTable()
-                self.symtable_stack.append(function.declarations)
-                self.look_up = True
-                self.parse_declarations()
-                self.look_up = False
-                self.block_depth += 1
-                self.current_function = function
-                function.body = self.parse_statement_block()
-                self.current_function = None
-                self.block_depth -= 1
-                self.require_token(tt.semicolon)
-                self.symtable_stack.pop()
-                self.symtable_stack.pop()
-                function.table = dict(function.declarations)
-                for name in function.table:
-                    setattr(function.table[name], 'local', True)
-                function.table.update(dict((s.name, s) for s in function.args))
-
-            return parse
-
-        declarations = {
-            tt.kwType: parse_type_decl,
-            tt.kwConst: parse_const_decl,
-            tt.kwVar: parse_var_decl,
-            tt.kwFunction: parse_subprogram(True),
-            tt.kwProcedure: parse_subprogram(False),
-        }
-
-        while self.token.type in declarations:
-            parsefunc = declarations[self.token.type]
+                if self.token_type == tt.rparen:
+                    self.expect('parameter')
+
+    def parse_subprogram(self, has_result):
+        name = self.parse_ident()
+        function = SymTypeFunction(name)
+        self.symtable.insert(function)
+        function.args = SymArgumentList()
+        function.type, function.has_result = None, has_result
+        function.body = None
+        self.symtable_stack.append(function.args)
+        state = self.state()
+        try:
+            self.parse_header(function)
+        except SourceError as error:
+            # declarations and body are parsed after a wrong header
+            self.recover(error, state, declaration_start)
+        function.declarations = SymTable()
+        self.symtable_stack.append(function.declarations)
+        self.look_up = True
+        self.parse_declarations()
+        self.look_up = False
+        self.block_depth += 1
+        self.current_function = function
+        function.body = self.run(self.parse_statement_block())
+        self.current_function = None
+        self.block_depth -= 1
+        self.symtable_stack.pop()
+        self.symtable_stack.pop()
+        function.table = dict(function.declarations)
+        for name in function.table:
+            setattr(function.table[name], 'local', True)
+        function.table.update(dict((s.name, s) for s in function.args))
+        self.require_token(tt.semicolon)
+
+    def parse_header(self, function):
+        current_offset = 0
+        if self.token_type == tt.lparen:
             self.next_token()
-            parsefunc()
-            while self.token.type == tt.identifier:
-                parsefunc()
+            if self.token_type != tt.rparen:
+                self.parse_args(current_offset)
+            self.require_token(tt.rparen)
+        if function.has_result:
+            self.require_token(tt.colon)
+            function.type = self.parse_type(complex=False)
+        self.require_token(tt.semicolon)
+
+    # token type -> parsing method and its arguments
+    declaration_handlers = {
+        tt.kwType: (parse_type_decl, ()),
+        tt.kwConst: (parse_const_decl, ()),
+        tt.kwVar: (parse_var_decl, ()),
+        tt.kwFunction: (parse_subprogram, (True,)),
+        tt.kwProcedure: (parse_subprogram, (False,)),
+    }
 
     def expr_type(self, expr):
-        int_ops = (
-            tt.logic_and, tt.logic_or,
-            tt.logic_xor, tt.logic_not,
-            tt.shr, tt.shl,
-            tt.int_div, tt.int_mod,
-        )
-        comparisons = (
-            tt.equal, tt.not_equal,
-            tt.less, tt.less_or_equal,
-            tt.greater, tt.greater_or_equal,
-        )
-
-        if isinstance(expr, SynCall):
-            func = self.get_type(expr)
-            if func.has_result:
-                return func.type
-            return None
-        if not isinstance(expr, SynOperation):
-            return self.get_type(expr)
+        # type is computed once for every node and kept on it, casts to
+        # real are inserted into the tree at the same time
+        type_ = getattr(expr, 'resolved_type', None)
+        if type_ is None:
+            type_ = self.walk(self.expr_type_handlers, expr)
+        return type_
+
+    def typed(self, expr, type_):
+        expr.resolved_type = type_
+        return type_
+
+    def type_of_call(self, expr):
+        func = self.get_type(expr)
+        return self.typed(expr, func.type if func.has_result else None)
+
+    def type_of_operand(self, expr):
+        return self.typed(expr, self.get_type(expr))
+
+    def type_of_operation(self, expr):
         optype = expr.operation.type
         if optype == tt.assign:
            raise SynError('Illegal expression', expr.pos)
@@ -290,30 +390,39 @@ class Parser(ExprParser):
                         'Procedures are not allowed in expressions',
                         op.caller.pos)
 
-        types = map(self.expr_type, expr.operands)
+        types = []
+        for op in expr.operands:
+            type_ = getattr(op, 'resolved_type', None)
+            if type_ is None:
+                type_ = yield op
+            types.append(type_)
         ltype = types[0]
         if len(types) == 1:
             if (not isinstance(ltype, SymTypeInt) and
                 optype == tt.logic_not
             ):
                 raise SynError(E_ORDINAL_EXPECTED, expr.pos)
-            return ltype
-        else:
-            rtype = types[1]
-            if (optype != tt.div and
-                isinstance(ltype, SymTypeInt) and
-                isinstance(rtype, SymTypeInt)
-            ):
-                return self.find_symbol('integer')
-            if optype in int_ops:
-                raise SynError(E_INCOMPATIBLE_TYPES, expr.pos, ltype, rtype)
-            self.cast_to_real(expr, ltype, rtype)
-            if optype == tt.div:
-                self.cast_to_real(expr, *map(self.expr_type, expr.operands))
-            if optype in comparisons:
-                return self.find_symbol('integer')
-            else:
-                return self.find_symbol('real')
+            yield Return(self.typed(expr, ltype))
+        rtype = types[1]
+        if (optype != tt.div and
+            isinstance(ltype, SymTypeInt) and
+            isinstance(rtype, SymTypeInt)
+        ):
+            yield Return(self.typed(expr, self.find_symbol('integer')))
+        if optype in int_ops:
+            raise SynError(E_INCOMPATIBLE_TYPES, expr.pos, ltype, rtype)
+        self.cast_to_real(expr, ltype, rtype)
+        if optype == tt.div:
+            self.cast_to_real(expr, *map(self.expr_type, expr.operands))
+        if optype in comparisons:
+            yield Return(self.typed(expr, self.find_symbol('integer')))
+        yield Return(self.typed(expr, self.find_symbol('real')))
+
+    expr_type_handlers = {
+        SynCall: type_of_call,
+        SynOperation: type_of_operation,
+        object: type_of_operand,
+    }
 
     def cast_to_real(self, expr, ltype, rtype):
         if isinstance(ltype, SymTypeInt):
@@ -322,326 +431,438 @@ class Parser(ExprParser):
             expr.operands[1] = SynCastToReal(expr.operands[1])
 
     def check_program(self, program):
+        # constants are folded only in a program without errors
+        table = [func for name, func in self.symtable.iteritems()
+                 if isinstance(func, SymTypeFunction) and
+                    func.body is not None]
         self.check_types(program)
-        table = (func for name, func in self.symtable.iteritems()
-                 if isinstance(func, SymTypeFunction))
         for func in table:
             self.symtable_stack.append(func.table)
             self.check_types(func.body)
             self.symtable_stack.pop()
+        if self.errors:
+            return
+        self.fold_constants(program)
+        for func in table:
+            self.symtable_stack.append(func.table)
+            self.fold_constants(func.body)
+            self.symtable_stack.pop()
+
+    def fold_constants(self, stmt):
+        ''' Replaces constant expressions in checked statement with their
+        values, returns the statement. '''
+        return self.walk(self.fold_handlers, stmt)
+
+    def fold_block(self, stmt):
+        statements = []
+        for statement in stmt.statements:
+            statements.append((yield statement))
+        stmt.statements = statements
+        yield Return(stmt)
+
+    def fold_for(self, stmt):
+        stmt.assignment = yield stmt.assignment
+        stmt.check = yield stmt.check
+        stmt.initial = stmt.assignment.operands[1]
+        stmt.final = stmt.check.operands[1]
+        stmt.action = yield stmt.action
+        yield Return(stmt)
+
+    def fold_loop(self, stmt):
+        stmt.condition = yield stmt.condition
+        stmt.action = yield stmt.action
+        yield Return(stmt)
+
+    def fold_if(self, stmt):
+        stmt.condition = yield stmt.condition
+        stmt.action = yield stmt.action
+        if stmt.else_action:
+            stmt.else_action = yield stmt.else_action
+        yield Return(stmt)
+
+    def fold_write(self, stmt):
+        args = []
+        for arg in stmt.args:
+            args.append((yield arg))
+        stmt.args = tuple(args)
+        yield Return(stmt)
+
+    def fold_result(self, stmt):
+        stmt.value = yield stmt.value
+        yield Return(stmt)
+
+    def fold_operation(self, expr):
+        # operands are folded first, then the expression itself
+        operands = []
+        for op in expr.operands:
+            operands.append((yield op))
+        expr.operands = operands
+        if all(isinstance(op, SynConst) for op in operands):
+            expr = self.fold_value(expr)
+        yield Return(expr)
+
+    def fold_cast(self, expr):
+        expr.expression = yield expr.expression
+        yield Return(self.fold_value(expr))
+
+    def fold_call(self, expr):
+        args = []
+        for arg in expr.args:
+            args.append((yield arg))
+        expr.args = args
+        yield Return(expr)
+
+    def fold_subscript(self, expr):
+        expr.array = yield expr.array
+        expr.index = yield expr.index
+        yield Return(expr)
+
+    def fold_field_request(self, expr):
+        expr.record = yield expr.record
+        yield Return(expr)
+
+    def fold_value(self, expr):
+        value = evaluate(expr)
+        if value is None:
+            return expr
+        return literal(value, expr.pos)
+
+    fold_handlers = {
+        SynStatementBlock: fold_block,
+        SynStatementFor: fold_for,
+        SynStatementWhile: fold_loop,
+        SynStatementRepeat: fold_loop,
+        SynStatementIf: fold_if,
+        SynStatementWrite: fold_write,
+        SynStatementResult: fold_result,
+        SynOperation: fold_operation,
+        SynCastToReal: fold_cast,
+        SynCall: fold_call,
+        SynSubscript: fold_subscript,
+        SynFieldRequest: fold_field_request,
+        SynConst: lambda self, expr: expr,
+        SynVar: fold_value,
+        object: lambda self, stmt: stmt,
+    }
 
     def check_types(self, stmt):
+        self.walk(self.check_handlers, stmt)
+
+    def require_ordinal(self, *expressions):
+        for expr in expressions:
+            if isinstance(expr, SynOperation):
+                type_ = self.expr_type(expr)
+            else:
+                type_ = self.get_type(expr)
+            if not isinstance(type_, SymTypeInt):
+                raise SynError(E_ORDINAL_EXPECTED, expr.pos)
 
-        def require_ordinal(*expressions):
-            for expr in expressions:
-                if isinstance(expr, SynOperation):
-                    type_ = self.expr_type(expr)
+    def require_mutable(self, *expressions):
+        for expr in expressions:
+            if (isinstance(expr, SynConst) or
+                isinstance(expr, SynVar) and
+                isinstance(expr.symbol, SymConst) or
+                not isinstance(expr,
+                   (SynVar, SynSubscript, SynFieldRequest))
+            ):
+                raise SynError('Mutable expression expected', expr.pos)
+
+    def require_statement(self, expr):
+        is_statement = isinstance(expr,
+            (SynCall, SynEmptyStatement, \
+             SynStatementBreak, SynStatementContinue))
+        is_assignment = isinstance(expr, SynOperation) and \
+             expr.operation.type == tt.assign
+
+        if is_assignment:
+            self.require_mutable(expr.operands[0])
+
+            ltype, rtype = map(self.expr_type, expr.operands)
+            if ltype is not rtype:
+                if isinstance(ltype, SymTypeReal):
+                    self.cast_to_real(expr, ltype, rtype)
                 else:
-                    type_ = self.get_type(expr)
-                if not isinstance(type_, SymTypeInt):
-                    raise SynError(E_ORDINAL_EXPECTED, expr.pos)
-
-        def require_mutable(*expressions):
-            for expr in expressions:
-                if (isinstance(expr, SynConst) or
-                    not isinstance(expr,
-                       (SynVar, SynSubscript, SynFieldRequest))
+                    raise SynError(
+                        E_INCOMPATIBLE_TYPES, expr.pos, ltype, rtype)
+
+        elif isinstance(expr, SynCall):
+            function = expr.caller.resolve(self.symtable_stack)
+            formal = [(arg.type, arg)
+                for i, arg in enumerate(function.args)]
+            actual = [(self.expr_type(arg), i)
+                for i, arg in enumerate(expr.args)]
+            for (frm_type, frm), (act_type, act_index) in zip(formal, actual):
+                if not frm.by_value:
+                    self.require_mutable(expr.args[act_index])
+
+                if (isinstance(frm_type, SymTypeReal) and
+                    isinstance(act_type, SymTypeInt)
                 ):
-                    raise SynError('Mutable expression expected', expr.pos)
-
-        def require_statement(expr):
-            is_statement = isinstance(expr,
-                (SynCall, SynEmptyStatement, \
-                 SynStatementBreak, SynStatementContinue))
-            is_assignment = isinstance(expr, SynOperation) and \
-                 expr.operation.type == tt.assign
-
-            if is_assignment:
-                require_mutable(expr.operands[0])
-
-                ltype, rtype = map(self.expr_type, expr.operands)
-                if ltype is not rtype:
-                    if isinstance(ltype, SymTypeReal):
-                        self.cast_to_real(expr, ltype, rtype)
-                    else:
-                        raise SynError(
-                            E_INCOMPATIBLE_TYPES, expr.pos, ltype, rtype)
-
-            elif isinstance(expr, SynCall):
-                function = self.find_symbol(expr.caller.name)
-                formal = [(arg.type, arg)
-                    for i, arg in enumerate(function.args)]
-                actual = [(self.expr_type(arg), i)
-                    for i, arg in enumerate(expr.args)]
-                for (frm_type, frm), (act_type, act_index) in zip(formal, actual):
-                    if not frm.by_value:
-                        require_mutable(expr.args[act_index])
-
-                    if (isinstance(frm_type, SymTypeReal) and
-                        isinstance(act_type, SymTypeInt)
-                    ):
-                        expr.args[act_index] = SynCastToReal(expr.args[act_index])
-
-                    elif self.get_root_type(frm_type) != self.get_root_type(act_type):
-                        raise SynError(E_INCOMPATIBLE_TYPES,
-                            expr.args[act_index].pos, frm_type, act_type)
-
-            elif not is_statement:
-                raise SynError('Illegal expression', expr.pos)
-
-        def check_for():
-            require_ordinal(stmt.counter, stmt.initial, stmt.final)
-            require_mutable(stmt.counter)
-            self.check_types(stmt.action)
-
-        def check_while_repeat():
-            require_ordinal(stmt.condition)
-            self.check_types(stmt.action)
-
-        def check_if():
-            require_ordinal(stmt.condition)
-            self.check_types(stmt.action)
-            if stmt.else_action:
-                self.check_types(stmt.else_action)
-
-        def check_write():
-            for expr in stmt.args:
-                self.expr_type(expr)
-
-        def check_result():
-            pass
-
-        def check_block():
-            for statement in stmt.statements:
-                self.check_types(statement)
-
-        handlers = {
-            SynStatementBlock: check_block,
-            SynStatementFor: check_for,
-            SynStatementWhile: check_while_repeat,
-            SynStatementRepeat: check_while_repeat,
-            SynStatementIf: check_if,
-            SynStatementWrite: check_write,
-            SynStatementResult: check_result,
-        }
-
-        if type(stmt) in handlers:
-            handlers[type(stmt)]()
-        else:
-            require_statement(stmt)
+                    expr.args[act_index] = SynCastToReal(expr.args[act_index])
+
+                elif self.get_root_type(frm_type) != self.get_root_type(act_type):
+                    raise SynError(E_INCOMPATIBLE_TYPES,
+                        expr.args[act_index].pos, frm_type, act_type)
+
+        elif not is_statement:
+            raise SynError('Illegal expression', expr.pos)
+
+    def check_for(self, stmt):
+        self.require_ordinal(stmt.counter, stmt.initial, stmt.final)
+        self.require_mutable(stmt.counter)
+        yield stmt.action
+
+    def check_loop(self, stmt):
+        self.require_ordinal(stmt.condition)
+        yield stmt.action
+
+    def check_if(self, stmt):
+        self.require_ordinal(stmt.condition)
+        yield stmt.action
+        if stmt.else_action:
+            yield stmt.else_action
+
+    def check_write(self, stmt):
+        for expr in stmt.args:
+            self.expr_type(expr)
+
+    def check_block(self, stmt):
+        for statement in stmt.statements:
+            try:
+                yield statement
+            except SourceError as error:
+                self.report(error)
+
+    check_handlers = {
+        SynStatementBlock: check_block,
+        SynStatementFor: check_for,
+        SynStatementWhile: check_loop,
+        SynStatementRepeat: check_loop,
+        SynStatementIf: check_if,
+        SynStatementWrite: check_write,
+        SynStatementResult: lambda self, stmt: None,
+        object: require_statement,
+    }
 
     def parse_identifier(self): # virtual function
-        var, name = self.token, self.token.value
-        if self.token.type != tt.identifier:
+        var, name = self.token, self.token_value
+        if self.token_type != tt.identifier:
             self.expect(tt.identifier)
-        if not self.find_symbol(name):
+        symbol = self.find_symbol(name)
+        if not symbol:
             self.e(E_UNDECLARED, name)
-        return SynVar(var)
+        return SynVar(var, symbol)
 
     def parse_expression(self, expected='expression'): # virtual function
-        if self.token.value in keywords:
-            self.expect(expected)
-        return ExprParser.parse_expression(self)
+        return self.run(self.expression(expected))
 
-    def parse_factor(self): # virtual function
+    def expression(self, expected='expression'): # virtual function
+        if self.token_value in keywords:
+            self.expect(expected)
+        return ExprParser.expression(self)
 
-        def parse_call(result):
-            function = self.get_type(result)
-            params = []
-            if not isinstance(function, SymTypeFunction):
-                self.e(E_CALL)
-            self.next_token()
-            if self.token.type != tt.rparen:
-                params.append(self.parse_expression())
-                while self.token.type == tt.comma:
-                    self.next_token()
-                    params.append(self.parse_expression())
-                if self.token.type != tt.rparen:
-                    self.expect(tt.rparen.text)
-            if len(params) > len(function.args):
-                self.e('Too many actual parameters')
-            if len(params) < len(function.args):
-                self.e('Not enough actual parameters')
-            return SynCall(result, params)
-
-        def parse_field_request(result):
-            record = self.get_type(result)
-            if not isinstance(record, SymTypeRecord):
-                self.e(E_REQUEST_FIELD)
-            self.next_token()
-            self.symtable_stack.append(record.symtable)
-            result = SynFieldRequest(result, self.parse_identifier())
-            self.symtable_stack.pop()
-            return result
+    def parse_call(self, result):
+        function = self.get_type(result)
+        params = []
+        if not isinstance(function, SymTypeFunction):
+            self.e(E_CALL)
+        self.next_token()
+        if self.token_type != tt.rparen:
+            params.append((yield self.expression()))
+            while self.token_type == tt.comma:
+                self.next_token()
+                params.append((yield self.expression()))
+            if self.token_type != tt.rparen:
+                self.expect(tt.rparen.text)
+        if len(params) > len(function.args):
+            self.e('Too many actual parameters')
+        if len(params) < len(function.args):
+            self.e('Not enough actual parameters')
+        yield Return(SynCall(result, params))
+
+    def parse_field_request(self, result):
+        record = self.get_type(result)
+        if not isinstance(record, SymTypeRecord):
+            self.e(E_REQUEST_FIELD)
+        self.next_token()
+        self.symtable_stack.append(record.symtable)
+        result = SynFieldRequest(result, self.parse_identifier())
+        self.symtable_stack.pop()
+        yield Return(result)
+
+    def parse_subscript(self, result):
+        array = self.get_type(result)
+        if not isinstance(array, SymTypeArray):
+            self.e(E_SUBSCRIPT)
+        self.next_token()
+        index = yield self.expression()
+        if self.token_type != tt.rbracket:
+            self.expect(tt.rbracket.text)
+        yield Return(SynSubscript(result, index))
+
+    factor_handlers = {
+        tt.lparen: parse_call,
+        tt.dot: parse_field_request,
+        tt.lbracket: parse_subscript,
+    }
+    unary_ops = (tt.minus, tt.logic_not)
 
-        def parse_subscript(result):
-            array = self.get_type(result)
-            if not isinstance(array, SymTypeArray):
-                self.e(E_SUBSCRIPT)
-            self.next_token()
-            index = self.parse_expression()
-            if self.token.type != tt.rbracket:
-                self.expect(tt.rbracket.text)
-            return SynSubscript(result, index)
-
-        handlers = {
-            tt.lparen: parse_call,
-            tt.dot: parse_field_request,
-            tt.lbracket: parse_subscript,
-        }
-        unary_ops = (tt.minus, tt.logic_not)
-
-        op = self.token
-        if op.type in unary_ops:
+    def parse_factor(self): # virtual function
+        # unary operations apply to the whole factor after them
+        unary = []
+        while self.token_type in self.unary_ops:
+            unary.append(self.token)
             self.next_token()
-            result = SynOperation(op, self.parse_factor())
-        else:
-            result = ExprParser.parse_factor(self)
-        while self.token.type in handlers:
-            result = handlers[self.token.type](result)
+        result = yield ExprParser.parse_factor(self)
+        while self.token_type in self.factor_handlers:
+            result = yield self.factor_handlers[self.token_type](self, result)
             self.next_token()
-        return result
+        while unary:
+            result = SynOperation(unary.pop(), result)
+        yield Return(result)
 
     def parse_condition(self):
-        condition = self.parse_expression()
-        return condition
+        return self.expression()
 
     def parse_statement_block(self):
         self.next_token()
-        # prevent memory optimization
-        block = copy.deepcopy(SynStatementBlock())
-        while self.token.type == tt.semicolon:
+        block = SynStatementBlock()
+        while self.token_type == tt.semicolon:
             if self.allow_empty:
                 block.add(SynEmptyStatement())
                 self.allow_empty = False
             self.next_token()
-        while not self.end_of_program and self.token.type != tt.kwEnd:
-            if self.token.type == tt.eof:
+        while not self.end_of_program and self.token_type != tt.kwEnd:
+            if self.token_type == tt.eof:
                 self.e('Unexpected end of file')
-            statement = self.parse_statement()
-            block.add(statement)
-            if self.token.type != tt.kwEnd:
-                self.require_token(tt.semicolon)
-            while self.token.type == tt.semicolon:
+            state = self.state()
+            try:
+                statement = yield self.parse_statement()
+                block.add(statement)
+                if self.token_type != tt.kwEnd:
+                    self.require_token(tt.semicolon)
+            except SourceError as error:
+                self.recover(error, state, statement_sync)
+            while self.token_type == tt.semicolon:
                 self.next_token()
         self.next_token()
-        return block
-
-    def parse_statement(self):
+        yield Return(block)
 
-        def parse_action():
-            self.allow_empty = True
-            action = self.parse_statement()
-            self.allow_empty = False
-            return action
+    def parse_action(self):
+        self.allow_empty = True
+        action = yield self.parse_statement()
+        self.allow_empty = False
+        yield Return(action)
 
-        def parse_loop_action():
-            self.loop_depth += 1
-            action = parse_action()
-            self.loop_depth -= 1
-            return action
+    def parse_loop_action(self):
+        self.loop_depth += 1
+        action = yield self.parse_action()
+        self.loop_depth -= 1
+        yield Return(action)
 
-        def parse_statement_if():
+    def parse_statement_if(self):
+        self.next_token()
+        condition = yield self.parse_condition()
+        self.require_token(tt.kwThen)
+        action = yield self.parse_action()
+        if self.token_type == tt.kwElse:
             self.next_token()
-            condition = self.parse_condition()
-            self.require_token(tt.kwThen)
-            action = parse_action()
-            if self.token.type == tt.kwElse:
-                self.next_token()
-                else_action = parse_action()
-            else:
-                else_action = None
-            return SynStatementIf(condition, action, else_action)
+            else_action = yield self.parse_action()
+        else:
+            else_action = None
+        yield Return(SynStatementIf(condition, action, else_action))
 
-        def parse_statement_while():
-            self.next_token()
-            condition = self.parse_condition()
-            self.require_token(tt.kwDo)
-            action = parse_loop_action()
-            return SynStatementWhile(condition, action)
+    def parse_statement_while(self):
+        self.next_token()
+        condition = yield self.parse_condition()
+        self.require_token(tt.kwDo)
+        action = yield self.parse_loop_action()
+        yield Return(SynStatementWhile(condition, action))
 
-        def parse_statement_repeat():
-            self.next_token()
-            action = parse_loop_action()
-            self.require_token(tt.kwUntil)
-            condition = self.parse_condition()
-            return SynStatementRepeat(condition, action)
+    def parse_statement_repeat(self):
+        self.next_token()
+        action = yield self.parse_loop_action()
+        self.require_token(tt.kwUntil)
+        condition = yield self.parse_condition()
+        yield Return(SynStatementRepeat(condition, action))
 
-        def parse_statement_for():
-            self.next_token()
-            counter = self.parse_identifier()
+    def parse_statement_for(self):
+        self.next_token()
+        counter = self.parse_identifier()
+        self.next_token()
+        self.require_token(tt.assign)
+        initial = yield self.expression()
+        self.require_token(tt.kwTo)
+        final = yield self.expression()
+        self.require_token(tt.kwDo)
+        action = yield self.parse_loop_action()
+        yield Return(SynStatementFor(counter, initial, final, action))
+
+    def parse_break_or_continue(self, StatementClass):
+        if self.loop_depth:
             self.next_token()
-            self.require_token(tt.assign)
-            initial = self.parse_expression()
-            self.require_token(tt.kwTo)
-            final = self.parse_expression()
-            self.require_token(tt.kwDo)
-            action = parse_loop_action()
-            return SynStatementFor(counter, initial, final, action)
-
-        def parse_break_or_continue(StatementClass):
-            def parse():
-                if self.loop_depth:
-                    self.next_token()
-                    return StatementClass()
-                self.e(E_NOT_ALLOWED, self.token.value)
-            return parse
+            yield Return(StatementClass())
+        self.e(E_NOT_ALLOWED, self.token_value)
 
-        def parse_write(newline):
+    def parse_write(self, newline):
+        self.next_token()
+        self.require_token(tt.lparen)
+        messages = [(yield self.expression())]
+        while self.token_type == tt.comma:
             self.next_token()
-            self.require_token(tt.lparen)
-            messages = [self.parse_expression()]
-            while self.token.type == tt.comma:
-                self.next_token()
-                messages.append(self.parse_expression())
-            self.require_token(tt.rparen)
-            return SynStatementWrite(newline, *messages)
+            messages.append((yield self.expression()))
+        self.require_token(tt.rparen)
+        yield Return(SynStatementWrite(newline, *messages))
+
+    def parse_statement_result(self):
+        if (not self.current_function or
+            not self.current_function.has_result
+        ):
+            self.e(E_NOT_ALLOWED, self.token_value)
+        self.next_token()
+        self.require_token(tt.assign)
+        value = yield self.expression()
+        yield Return(SynStatementResult(value, self.current_function.type))
+
+    # token type -> parsing method and its arguments, methods are
+    # generators run by Visitor.run()
+    statement_handlers = {
+        tt.kwIf: (parse_statement_if, ()),
+        tt.kwWhile: (parse_statement_while, ()),
+        tt.kwRepeat: (parse_statement_repeat, ()),
+        tt.kwFor: (parse_statement_for, ()),
+        tt.kwBreak: (parse_break_or_continue, (SynStatementBreak,)),
+        tt.kwContinue: (parse_break_or_continue, (SynStatementContinue,)),
+        tt.kwWrite: (parse_write, (False,)),
+        tt.kwWriteln: (parse_write, (True,)),
+        tt.kwResult: (parse_statement_result, ()),
+    }
 
-        def parse_statement_result():
-            if (not self.current_function or
-                not self.current_function.has_result
-            ):
-                self.e(E_NOT_ALLOWED, self.token.value)
-            self.next_token()
-            self.require_token(tt.assign)
-            return SynStatementResult(
-                self.parse_expression(), self.current_function.type)
-
-        handlers = {
-            tt.kwIf: parse_statement_if,
-            tt.kwWhile: parse_statement_while,
-            tt.kwRepeat: parse_statement_repeat,
-            tt.kwFor: parse_statement_for,
-            tt.kwBreak: parse_break_or_continue(SynStatementBreak),
-            tt.kwContinue: parse_break_or_continue(SynStatementContinue),
-            tt.kwWrite: lambda: parse_write(False),
-            tt.kwWriteln: lambda: parse_write(True),
-            tt.kwResult: parse_statement_result,
-        }
-
-        key = self.token.type
+    def parse_statement(self):
+        key = self.token_type
         if key == tt.kwBegin:
             self.block_depth += 1
-            statement = self.parse_statement_block()
-            if self.token.type not in (tt.kwElse, tt.kwEnd):
-                if self.token.type == tt.dot and self.block_depth > 1:
+            statement = yield self.parse_statement_block()
+            if self.token_type not in (tt.kwElse, tt.kwEnd):
+                if self.token_type == tt.dot and self.block_depth > 1:
                     self.require_token(tt.semicolon)
-                if self.token.type in (tt.dot, tt.eof) or self.block_depth == 1:
+                if self.token_type in (tt.dot, tt.eof) or self.block_depth == 1:
                     self.require_token(tt.dot)
                     self.end_of_program = True
-                if self.token.type == tt.semicolon:
+                if self.token_type == tt.semicolon:
                     self.next_token()
-                    if self.token.type == tt.kwElse:
+                    if self.token_type == tt.kwElse:
                         # todo: fix error message
-                        self.e(E_NOT_ALLOWED, self.token.value)
+                        self.e(E_NOT_ALLOWED, self.token_value)
             self.block_depth -= 1
-        elif key in handlers:
-            statement = handlers[key]()
+        elif key in self.statement_handlers:
+            parsefunc, args = self.statement_handlers[key]
+            statement = yield parsefunc(self, *args)
         elif self.block_depth:
-            if self.token.type == tt.semicolon:
+            if self.token_type == tt.semicolon:
                 statement = SynEmptyStatement()
             else:
-                statement = self.parse_expression(expected='statement')
+                statement = yield self.expression(expected='statement')
         else:
             self.expect(tt.kwBegin.text)
-        return statement
+        yield Return(statement)
@@ -21,6 +21,7 @@ from common.functions import copy_args
 from common.errors import *
 from tok.token import tt
 from expressions import ExprParser
+from visitor import Return
 from table import SimpleSymTable
 from tree import *
 
@@ -34,22 +35,15 @@ class SimpleParser(ExprParser):
         self.symtable = SimpleSymTable()
         self.in_symbol = False
 
-    def return_factor(self, factor):
-        # это такой маленький костыль, перегрузка функции
-        need_next = isinstance(factor, SynConst)
-        if need_next:
-            self.next_token()
-        return factor
-
     def parse_declarations(self):
         ''' Разбор блока объявлений '''
         simple_types = { "array": tt.kwArray, "function": tt.kwFunction,
                          "record": tt.kwRecord, "var": tt.kwVar }
-        while self.token.value in simple_types:
-            idtype = simple_types[self.token.value]
+        while self.token_value in simple_types:
+            idtype = simple_types[self.token_value]
             self.next_token()
-            idname = self.token.value
-            if self.token.type == tt.identifier:
+            idname = self.token_value
+            if self.token_type == tt.identifier:
                 self.symtable[idname] = idtype
             elif idname in simple_types:
                 self.e(E_RESERVED_NAME.format(idname))
@@ -58,34 +52,32 @@ class SimpleParser(ExprParser):
             self.next_token()
 
     def parse_complex_expr(self, result):
-        ''' Разбор "сложных" операций. '''
+        ''' Разбор "сложных" операций. Каждая операция заканчивается на своей
+        последней лексеме, следующая за ней лексема только просматривается. '''
         def parse_record(opr):
-            if self.token.type == tt.identifier:
+            if self.token_type == tt.identifier:
                 res = SynOperation(opr, result, SynVar(self.token))
             else:
                 self.e('Identifier expected')
-            self.next_token()
-            return res
+            yield Return(res)
 
         def parse_array(opr):
             self.in_symbol = False
-            res = SynOperation(opr, result, self.parse_expression())
-            if self.token.type != tt.rbracket:
+            res = SynOperation(opr, result, (yield self.expression()))
+            if self.token_type != tt.rbracket:
                 self.e('Brackets mismatch', self.prevpos)
-            self.next_token()
-            return res
+            yield Return(res)
 
         def parse_func(opr):
             self.in_symbol = False
             func = result
-            args = [self.parse_expression()] if self.token.type != tt.rparen else []
-            while self.token.type == tt.comma:
+            args = [(yield self.expression())] if self.token_type != tt.rparen else []
+            while self.token_type == tt.comma:
                 self.next_token()
-                args.append(self.parse_expression())
-            if args and self.token.type != tt.rparen:
+                args.append((yield self.expression()))
+            if args and self.token_type != tt.rparen:
                 self.e(E_PAR_MISMATCH, pos=self.prevpos)
-            self.next_token()
-            return SynCall(func, args)
+            yield Return(SynCall(func, args))
 
         start_symbols = {
             tt.dot:      (tt.kwRecord,   parse_record, E_REQUEST_FIELD),
@@ -94,29 +86,35 @@ class SimpleParser(ExprParser):
         }
 
         var = str(result)
-        if self.token.type in start_symbols:
-            symtype, symfunc, symerror = start_symbols[self.token.type]
-            while self.token.type in start_symbols and \
-                 (self.in_symbol or self.symtable[var] == symtype):
-                symtype, symfunc, symerror = start_symbols[self.token.type]
-                opr = self.token
-                self.next_token()
-                result = symfunc(opr)
-                self.in_symbol = True
-            else:
-                if not self.in_symbol: self.e(symerror)
-        return result
+        symtype, symfunc, symerror = start_symbols[self.token_type]
+        if not (self.in_symbol or self.symtable[var] == symtype):
+            self.e(symerror)
+        while True:
+            opr = self.token
+            self.next_token()
+            result = yield symfunc(opr)
+            self.in_symbol = True
+            if self.tokenizer.peek() not in start_symbols:
+                yield Return(result)
+            self.next_token()
+            symtype, symfunc, symerror = start_symbols[self.token_type]
 
-    def parse_identifier(self):
+    def parse_factor(self):
         ''' Виртуальная функция. Вызывается в родительском классе
         при разборе операндов арифметической операции. Перегружена для
-        реализации разбора "сложных" операций. '''
+        реализации разбора "сложных" операций, наличие которых определяется
+        по следующей за идентификатором лексеме. '''
+        if self.token_type != tt.identifier:
+            return ExprParser.parse_factor(self)
+        return self.parse_variable()
+
+    def parse_variable(self):
+        ''' Разбор идентификатора и следующих за ним "сложных" операций '''
         complex_ops = (tt.dot, tt.lparen, tt.lbracket)
-        if self.token.value not in self.symtable:
-            self.e(E_UNDECLARED.format(self.token.value))
+        if self.token_value not in self.symtable:
+            self.e(E_UNDECLARED.format(self.token_value))
         result = SynVar(self.token)
-        self.next_token()
-        if self.token.type in complex_ops:
-            return self.parse_complex_expr(result)
-        else:
-            return result
+        if self.tokenizer.peek() in complex_ops:
+            self.next_token()
+            result = yield self.parse_complex_expr(result)
+        yield Return(self.return_factor(result))
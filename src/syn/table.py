@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 
 from UserDict import UserDict
+from collections import OrderedDict
 
 from common.functions import copy_args
 
+def align(offset, alignment):
+    return (offset + alignment - 1) // alignment * alignment
+
 class Symbol(object):
     @copy_args
     def __init__(self, name): pass
@@ -29,6 +33,10 @@ class SymVar(Symbol):
     def size(self):
         return self.type.size
 
+    @property
+    def alignment(self):
+        return self.type.alignment
+
     def is_local(self):
         return hasattr(self, 'local')
 
@@ -40,39 +48,34 @@ class SymFunctionArgument(SymVar):
         self.value = None
 
 class SymType(Symbol):
+    # layout of a type (its size and alignment in bytes, offsets of fields)
+    # is computed once when the type is created from complete parts
     def is_type(self): return True
 
 class SymTypeFunction(SymType):
+    size = alignment = 4 # call by offset
+
     @copy_args
     def __init__(self, name): pass
 
-    @property
-    def size(self):
-        return 4 # call by offset
-
 class SymTypeAlias(SymType):
     @copy_args
-    def __init__(self, name, type): pass
+    def __init__(self, name, type):
+        self.size, self.alignment = type.size, type.alignment
 
     def __str__(self):
         return '{0} = {1}'.format(self.name, self.type.name)
 
-    @property
-    def size(self):
-        return self.type.size
-
 class SymTypeArray(SymType):
     @copy_args
     def __init__(self, type, range):
         SymType.__init__(self, self.__str__())
+        self.size = type.size * range.size
+        self.alignment = type.alignment
 
     def __str__(self):
         return 'array[{0}] of {1}'.format(self.range, self.type.name)
 
-    @property
-    def size(self):
-        return self.type.size * self.range.size
-
 class SymTypeRange(SymType):
     @copy_args
     def __init__(self, leftbound, rightbound):
@@ -90,27 +93,22 @@ class SymTypeRecord(SymType):
     def __init__(self, name, table):
         self._symtable = table
         SymType.__init__(self, name)
+        # fields have got their offsets when they were inserted
+        self.alignment = max([1] + [f.alignment for f in table.values()])
+        self.size = align(table.size, self.alignment)
 
     @property
     def symtable(self): return self._symtable
 
-    @property
-    def size(self):
-        return sum(type_.size for type_ in self.symtable.values())
-
 class SymTypeInt(SymType):
+    size = alignment = 4
     def __init__(self):
         SymType.__init__(self, 'integer')
-    @property
-    def size(self):
-        return 4
 
 class SymTypeReal(SymType):
+    size = alignment = 4
     def __init__(self):
         SymType.__init__(self, 'real')
-    @property
-    def size(self):
-        return 4
 
 
 class SimpleSymTable(UserDict):
@@ -127,23 +125,20 @@ class SimpleSymTable(UserDict):
         for sym, symtype in sorted(self.items()):
             print('{0}: {1}'.format(sym, self.clean_type(symtype)))
 
-class SymTable(UserDict):
+class SymTable(OrderedDict):
+    # symbols are listed and declared in the order of the source
     def __init__(self):
-        UserDict.__init__(self)
+        OrderedDict.__init__(self)
         self.current_offset = 0
 
     def insert(self, symbol):
         assert isinstance(symbol, Symbol)
-        self.__setitem__(symbol.name, symbol)
+        self[symbol.name] = symbol
         if isinstance(symbol, SymVar):
-            symbol.offset = self.current_offset
-            self.current_offset += symbol.size
+            symbol.offset = align(self.current_offset, symbol.alignment)
+            self.current_offset = symbol.offset + symbol.size
         return symbol
 
-    def iteritems(self):
-        # avoid bug with iteration over UserDict (Python 2.6.4)
-        return dict(self).iteritems()
-
     @property
     def size(self):
         return self.current_offset
@@ -183,6 +178,19 @@ class SymTable(UserDict):
                     self.write_symbols(f.declarations, ' ' * 2)
                 f.body.display()
 
+class SymArgumentList(list):
+    ''' Function arguments in order of declaration, indexed by name. '''
+    def __init__(self):
+        list.__init__(self)
+        self.names = {}
+
+    def append(self, symbol):
+        list.append(self, symbol)
+        self.names.setdefault(symbol.name, symbol)
+
+    def get(self, name, default=None):
+        return self.names.get(name, default)
+
 class SymTableStack(object):
     def __init__(self, table):
         self.content = []
@@ -195,13 +203,11 @@ class SymTableStack(object):
         return self.content.pop()
 
     def find(self, name):
-        for table in self.tables:
-            if isinstance(table, list):
-                ntable = [symbol.name for symbol in table]
-                if name in ntable:
-                    return table[ntable.index(name)]
-            if name in table:
-                return table[name]
+        # every scope is a mapping from names to symbols
+        for table in reversed(self.content):
+            symbol = table.get(name)
+            if symbol is not None:
+                return symbol
         return None
 
     @property
@@ -3,19 +3,31 @@
 from common.functions import copy_args
 from tok.token import Token, tt
 
+# assign and comparison tokens of every for statement
+for_assign, for_check = Token(tt.assign), Token(tt.less_or_equal)
+
 class SynNode(object):
+    # nodes are slotted, a parsed program keeps no dictionary per node;
+    # attributes of each class are its initializer arguments
+    __slots__ = ()
+
     def indent(self, depth, string): return ' ' * depth + string
     def deeper(self, depth): return depth + 2
 
-class SynStatement(SynNode): pass
+class SynStatement(SynNode):
+    __slots__ = ()
 
 class SynEmptyStatement(SynNode):
+    __slots__ = ()
     def display(self, depth):
         print self.indent(depth, ';')
 
 class SynStatementBlock(SynStatement):
     @copy_args
-    def __init__(self, statements=[]): pass
+    def __init__(self, statements=None):
+        if statements is None:
+            self.statements = []
+    __slots__ = __init__.argnames
     def add(self, statement): self.statements.append(statement)
     def display(self, depth=0):
         print self.indent(depth, 'begin')
@@ -26,10 +38,9 @@ class SynStatementBlock(SynStatement):
 class SynStatementFor(SynStatement):
     @copy_args
     def __init__(self, counter, initial, final, action):
-        self.assignment = SynOperation(
-            Token(tt.assign), counter, initial)
-        self.check = SynOperation(
-            Token(tt.less_or_equal), counter, final)
+        self.assignment = SynOperation(for_assign, counter, initial)
+        self.check = SynOperation(for_check, counter, final)
+    __slots__ = __init__.argnames + ('assignment', 'check')
 
     def display(self, depth):
         print self.indent(depth, 'for {0} := {1} to {2} do'.format(
@@ -39,6 +50,7 @@ class SynStatementFor(SynStatement):
 class SynStatementWhile(SynStatement):
     @copy_args
     def __init__(self, condition, action): pass
+    __slots__ = __init__.argnames
     def display(self, depth):
         print self.indent(depth, 'while {0} do'.format(self.condition))
         self.action.display(self.deeper(depth))
@@ -46,6 +58,7 @@ class SynStatementWhile(SynStatement):
 class SynStatementRepeat(SynStatement):
     @copy_args
     def __init__(self, condition, action): pass
+    __slots__ = __init__.argnames
     def display(self, depth):
         print self.indent(depth, 'repeat')
         self.action.display(self.deeper(depth))
@@ -54,6 +67,7 @@ class SynStatementRepeat(SynStatement):
 class SynStatementIf(SynStatement):
     @copy_args
     def __init__(self, condition, action, else_action): pass
+    __slots__ = __init__.argnames
     def display(self, depth):
         print self.indent(depth, 'if {0} then'.format(self.condition))
         self.action.display(self.deeper(depth))
@@ -62,10 +76,12 @@ class SynStatementIf(SynStatement):
             self.else_action.display(self.deeper(depth))
 
 class SynStatementBreak(SynStatement):
+    __slots__ = ()
     def display(self, depth):
         print self.indent(depth, 'break')
 
 class SynStatementContinue(SynStatement):
+    __slots__ = ()
     def display(self, depth):
         print self.indent(depth, 'continue')
 
@@ -73,6 +89,7 @@ class SynStatementWrite(SynStatement):
     @copy_args
     def __init__(self, newline, *args):
         self.args = args
+    __slots__ = __init__.argnames + ('args',)
     def display(self, depth):
         name = 'writeln' if self.newline else 'write'
         print self.indent(depth, '{0}({1})'.format(
@@ -81,10 +98,14 @@ class SynStatementWrite(SynStatement):
 class SynStatementResult(SynStatement):
     @copy_args
     def __init__(self, value, type_): pass
+    __slots__ = __init__.argnames
     def display(self, depth):
         print self.indent(depth, 'result := {0!s}'.format(self.value))
 
 class SynExpr(SynNode):
+    # type of expression, set by Parser.expr_type when it's first computed
+    __slots__ = ('resolved_type',)
+
     def display(self, depth): print self.indent(depth, self.__str__())
     @property
     def children(self): return []
@@ -92,12 +113,16 @@ class SynExpr(SynNode):
 class SynCastToReal(SynExpr):
     @copy_args
     def __init__(self, expression): pass
+    __slots__ = __init__.argnames
+    @property
+    def pos(self): return self.expression.pos
     def type_(self, stack):
         return stack.find('real')
 
 class SynCall(SynExpr):
     @copy_args
     def __init__(self, caller, args=[]): pass
+    __slots__ = __init__.argnames
     def __str__(self): return '{0}({1})'.format(
         self.caller, ', '.join(str(arg) for arg in self.args))
     def type_(self, stack):
@@ -111,22 +136,26 @@ class SynCall(SynExpr):
 class SynSubscript(SynExpr):
     @copy_args
     def __init__(self, array, index): pass
+    __slots__ = __init__.argnames
     def __str__(self): return '{0}[{1}]'.format(self.array, self.index)
     def type_(self, stack):
-        arrtype = self.array.type_(stack).type
-        if hasattr(arrtype, 'type'):
+        # variable symbol and type aliases lead to the array type
+        arrtype = self.array.type_(stack)
+        while not hasattr(arrtype, 'range'):
             arrtype = arrtype.type
-        return arrtype
+        return arrtype.type
     @property
     def name(self): return self.array.name
+    def resolve(self, stack): return self.array.resolve(stack)
 
 class SynFieldRequest(SynExpr):
     @copy_args
     def __init__(self, record, field): pass
+    __slots__ = __init__.argnames
     def __str__(self): return '{0}.{1}'.format(self.record, self.field)
     def type_(self, stack):
         rectype = self.record.type_(stack)
-        if hasattr(rectype, 'type'):
+        while rectype.symtable is None:
             rectype = rectype.type
         stack.append(rectype.symtable)
         result = self.field.type_(stack)
@@ -137,6 +166,7 @@ class SynOperation(SynExpr):
     @copy_args
     def __init__(self, operation, *operands):
         self.operands = list(operands)
+    __slots__ = __init__.argnames + ('operands',)
     def __str__(self):
         if len(self.operands) == 1:
             op = self.operation.text
@@ -162,8 +192,10 @@ class SynOperation(SynExpr):
     def children(self): return self.operands
 
 class SynVar(SynExpr):
+    # symbol is the one name refers to, if the parser has resolved it
     @copy_args
-    def __init__(self, token): pass
+    def __init__(self, token, symbol=None): pass
+    __slots__ = __init__.argnames
     def __str__(self): return str(self.name)
     @property
     def label(self): return self.token.text
@@ -171,7 +203,12 @@ class SynVar(SynExpr):
     def name(self): return self.token.value
     @property
     def pos(self): return self.token.linepos
-    def type_(self, stack): return stack.find(self.name)
+    def resolve(self, stack):
+        if self.symbol is None:
+            return stack.find(self.name)
+        return self.symbol
+    def type_(self, stack): return self.resolve(stack)
 
 class SynConst(SynVar):
+    __slots__ = ()
     def type_(self, stack): return stack.find(str(self.token.type))
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+import sys
+from types import GeneratorType
+
+class Return(object):
+    ''' Result of a handler which is a generator. '''
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+class Visitor(object):
+    ''' Walks syntax trees using an explicit stack, so the depth of a tree
+    is not limited by the depth of the Python stack.
+
+    A handler table maps node classes to functions called with the walker,
+    the node and the arguments given to walk(). A class without its own
+    handler is handled as its nearest base class in the table. A handler
+    either returns result of the node or is a generator:
+
+        * code before the first yield is run before visiting children and
+          code after the last yield after visiting them;
+        * `yield child` or `yield child, arg, ...` visits the child, result
+          of the child is the value of the yield expression;
+        * `yield generator` runs another generator of the same kind, its
+          result is the value of the yield expression;
+        * `yield Return(value)` finishes the handler with the result.
+
+    Exception raised while visiting a child is raised at the yield, as if
+    the child was visited by a call. '''
+
+    def walk(self, handlers, node, *args):
+        return self.run(self._dispatch(handlers, node, args), handlers)
+
+    def run(self, value, handlers=None):
+        ''' Runs a generator the same way as handlers are run by walk(). '''
+        stack, error = [], None
+        while True:
+            if type(value) is GeneratorType:
+                stack.append(value)
+                value = None
+            elif not stack:
+                return value
+            # give result to the innermost handler which is not finished
+            try:
+                if error is None:
+                    item = stack[-1].send(value)
+                else:
+                    item = stack[-1].throw(*error)
+            except StopIteration:
+                stack.pop()
+                value, error = None, None
+                continue
+            except Exception:
+                # exception of a handler is raised at the yield of the
+                # handler which has started it, so it can be caught there
+                stack.pop()
+                if not stack:
+                    raise
+                value, error = None, sys.exc_info()
+                continue
+            value, error = None, None
+            try:
+                if type(item) is GeneratorType:
+                    value = item
+                elif type(item) is Return:
+                    stack.pop().close()
+                    value = item.value
+                elif type(item) is tuple:
+                    value = self._dispatch(handlers, item[0], item[1:])
+                else:
+                    value = self._dispatch(handlers, item, ())
+            except Exception:
+                error = sys.exc_info()
+
+    def _dispatch(self, handlers, node, args):
+        cls = node.__class__
+        handler = handlers.get(cls)
+        if handler is None:
+            for base in cls.__mro__:
+                if base in handlers:
+                    handler = handlers[cls] = handlers[base]
+                    break
+            else:
+                raise TypeError('No handler for {0}'.format(cls.__name__))
+        return handler(self, node, *args)
@@ -7,12 +7,15 @@ import shutil
 import glob
 import getopt
 import subprocess
+import StringIO
+import random
 
 import dot_parser
 
-from common.errors import CompileError
+from common.errors import CompileError, LexError
 from common.functions import copy_args
-from spc import main as run_compiler
+from spc import main as run_compiler, Compiler
+from tok.tokenizer import Tokenizer
 
 class TestError(Exception):
     template = "Test #{0} {1}"
@@ -146,6 +149,298 @@ class ExecutableTester(Tester):
             subprocess.Popen(exe, shell=True, stdout=out).wait()
         super(ExecutableTester, self).check()
 
+class NestingTester(object):
+    ''' Compiles generated programs with constructs nested up to 100000
+    levels deep. Code of every program must be the same as code of the
+    program without nesting. '''
+
+    depths = (10, 100, 1000, 10000, 100000)
+    program = 'var x: integer;\nbegin\n  x := 3;\n  {0}\nend.\n'
+    # name -> (nested statement, flat statement)
+    cases = {
+        'parens': (
+            lambda n: 'x := ' + '(' * n + 'x + 1' + ')' * n,
+            'x := x + 1'),
+        'unary': (
+            lambda n: 'x := ' + '- ' * (n * 2) + '3',
+            'x := 3'),
+        'blocks': (
+            lambda n: 'begin ' * n + 'x := x + 1' + ' end' * n,
+            'x := x + 1'),
+    }
+
+    @copy_args
+    def __init__(self, verbose, full=False): pass
+
+    def compile(self, statement):
+        source = StringIO.StringIO(self.program.format(statement))
+        return Compiler(source, '').common_generate()
+
+    def run(self):
+        count = 0
+        for name in sorted(self.cases):
+            nested, flat = self.cases[name]
+            expected = self.compile(flat)
+            for depth in self.depths:
+                count += 1
+                testname = '{0}-{1}'.format(name, depth)
+                try:
+                    try:
+                        code = self.compile(nested(depth))
+                    except (CompileError, RuntimeError) as e:
+                        raise AdvancedFail(testname, str(e))
+                    if code != expected:
+                        raise Fail(testname)
+                except TestError as result:
+                    print(str(result))
+                    if not self.full:
+                        return (1, count)
+                else:
+                    if self.verbose:
+                        print "Test #{0} OK".format(testname)
+        return (0, count)
+
+class SSATester(object):
+    ''' Compiles programs with the optimizer, code of every program must
+    be the same as code of the program simplified the way the SSA form
+    simplifies it: constants carried around loops and through branches,
+    loops which are never entered, repeated expressions and values which
+    are never used. '''
+
+    # name -> (program, simplified program)
+    cases = {
+        'loop-constant': (
+            "var i, n, x: integer;\n"
+            "begin\n"
+            "  n := 7; x := 5;\n"
+            "  while i < n do begin i := i + x; x := 5 end;;\n"
+            "  writeln(i, x)\n"
+            "end.\n",
+            "var i, n, x: integer;\n"
+            "begin\n"
+            "  while i < 7 do i := i + 5;\n"
+            "  writeln(i, 5)\n"
+            "end.\n"),
+        'for-constant': (
+            "var i, x: integer;\n"
+            "begin\n"
+            "  x := 3;\n"
+            "  for i := 1 to 4 do begin\n"
+            "    if x < 3 then x := x + 1;\n"
+            "    writeln(i * x)\n"
+            "  end\n"
+            "end.\n",
+            "var i, x: integer;\n"
+            "begin\n"
+            "  for i := 1 to 4 do writeln(i * 3)\n"
+            "end.\n"),
+        'branch-constant': (
+            "var x, y: integer;\n"
+            "begin\n"
+            "  x := 1;\n"
+            "  if x > 0 then y := 2 else y := 3;\n"
+            "  if y = 2 then writeln(1) else writeln(0)\n"
+            "end.\n",
+            "var x, y: integer;\n"
+            "begin\n"
+            "  writeln(1)\n"
+            "end.\n"),
+        'loop-not-entered': (
+            "var i: integer;\n"
+            "begin\n"
+            "  i := 10;\n"
+            "  while i < 5 do begin writeln(i); i := i + 1 end;;\n"
+            "  writeln(i)\n"
+            "end.\n",
+            "var i: integer;\n"
+            "begin\n"
+            "  writeln(10)\n"
+            "end.\n"),
+        'same-expression': (
+            "function f(a, b: integer): integer;\n"
+            "var y, z: integer;\n"
+            "begin\n"
+            "  y := a * b + 1; z := a * b + 1; result := y + z\n"
+            "end;\n"
+            "begin\n"
+            "  writeln(f(2, 3))\n"
+            "end.\n",
+            "function f(a, b: integer): integer;\n"
+            "var y, z: integer;\n"
+            "begin\n"
+            "  y := a * b + 1; result := y + y\n"
+            "end;\n"
+            "begin\n"
+            "  writeln(f(2, 3))\n"
+            "end.\n"),
+        'unused-loop-variable': (
+            "var i, k: integer;\n"
+            "begin\n"
+            "  k := 0;\n"
+            "  while i < 10 do begin k := k + 2; i := i + 1 end;;\n"
+            "  writeln(i)\n"
+            "end.\n",
+            "var i, k: integer;\n"
+            "begin\n"
+            "  while i < 10 do i := i + 1;\n"
+            "  writeln(i)\n"
+            "end.\n"),
+    }
+
+    @copy_args
+    def __init__(self, verbose, full=False): pass
+
+    def compile(self, program):
+        return Compiler(StringIO.StringIO(program), '').common_generate(True)
+
+    def run(self):
+        count = 0
+        for name in sorted(self.cases):
+            program, simplified = self.cases[name]
+            count += 1
+            try:
+                try:
+                    code = self.compile(program)
+                    expected = self.compile(simplified)
+                except CompileError as e:
+                    raise AdvancedFail(name, str(e))
+                if code != expected:
+                    raise Fail(name)
+            except TestError as result:
+                print(str(result))
+                if not self.full:
+                    return (1, count)
+            else:
+                if self.verbose:
+                    print "Test #{0} OK".format(name)
+        return (0, count)
+
+class RetokenizeTester(object):
+    ''' Edits a program and compares tokens of the edited program got by
+    Tokenizer.retokenize with tokens of a fresh Tokenizer. Besides the
+    listed edits there are random ones inserting and removing the
+    characters opening and closing comments and literals, and a chain of
+    them where every edit is retokenized from the previous one. '''
+
+    program = (
+        "{ first line }\n"
+        "var x, y: integer; (* second *)\n"
+        "    s: real;\n"
+        "begin\n"
+        "  x := 1; { comment }\n"
+        "  y := x + 2; // line comment\n"
+        "  s := 3.5 * x;\n"
+        "  writeln(x, 'str', y);\n"
+        "  (* block\n"
+        "     comment *)\n"
+        "  x := 'a' + #10;\n"
+        "end.\n")
+    # name -> (first replaced line, number of replaced lines, new lines),
+    # lines are numbered from 1
+    cases = {
+        'first-line': (1, 1, ['var z: integer;']),
+        'first-line-insert': (1, 0, ['{ new }', '']),
+        'last-line': (12, 1, ['end. x']),
+        'last-line-delete': (12, 1, []),
+        'last-line-append': (13, 0, ['{ after }']),
+        'open-brace': (5, 1, ['  x := 1; { comment']),
+        'close-brace': (5, 1, ['  x := 1; } comment }']),
+        'open-paren-star': (4, 1, ['begin (*']),
+        'close-paren-star': (9, 1, ['  (* block *)']),
+        'remove-close-paren-star': (10, 1, ['     comment']),
+        'open-string': (8, 1, ["  writeln(x, 'str, y);"]),
+        'close-string': (7, 1, ["  s := 3.5 * x;'"]),
+        'join-lines': (6, 2, ['  y := x + 2; s := 3.5 * x;']),
+        'split-line': (5, 1, ['  x :=', '  1; { comment }']),
+        'unchanged': (3, 1, ['    s: real;']),
+        'everything': (1, 12, ['begin', 'end.']),
+    }
+    random_edits = 300
+    chained_edits = 300
+    edit_chars = ['{', '}', '(*', '*)', "'", '\n', '//', ' ', 'x']
+
+    @copy_args
+    def __init__(self, verbose, full=False): pass
+
+    def tokens(self, make):
+        # tokens with positions and end of file, or the lexical error
+        try:
+            tokenizer = make()
+            result = [(tok.type, tok.text, tok.value, tok.linepos)
+                for tok in tokenizer]
+            return result + [tokenizer.linepos]
+        except LexError as e:
+            return str(e)
+
+    def check(self, name, old_tokenizer, old, first, count, lines):
+        # returns the edited program and its tokenizer, the tokenizer is
+        # None if the program has a lexical error
+        new_lines = old.split('\n')
+        new_lines[first - 1:first - 1 + count] = lines
+        new = '\n'.join(new_lines)
+        expected = self.tokens(
+            lambda: Tokenizer(StringIO.StringIO(new)))
+        tokenizers = []
+        def retokenize():
+            tokenizers.append(old_tokenizer.retokenize(
+                StringIO.StringIO(new), first, first + len(lines) - 1))
+            return tokenizers[0]
+        if self.tokens(retokenize) != expected:
+            raise Fail(name)
+        if isinstance(expected, str):
+            return new, None
+        return new, tokenizers[0]
+
+    def random_edit(self, generator, program):
+        lines = program.split('\n')
+        first = generator.randint(1, len(lines) - 1)
+        line = lines[first - 1]
+        pos = generator.randint(0, len(line))
+        if generator.random() < 0.5:
+            line = line[:pos] + generator.choice(self.edit_chars) + \
+                line[pos:]
+        else:
+            line = line[:pos] + line[pos + 1:]
+        return first, 1, line.split('\n')
+
+    def edits(self):
+        for name in sorted(self.cases):
+            yield (name, False) + self.cases[name]
+        generator = random.Random(0)
+        for i in range(self.random_edits):
+            yield ('random-{0}'.format(i), False) + \
+                self.random_edit(generator, self.program)
+        for i in range(self.chained_edits):
+            yield ('chained-{0}'.format(i), True)
+
+    def run(self):
+        count = 0
+        program = self.program
+        tokenizer = Tokenizer(StringIO.StringIO(program))
+        generator = random.Random(1)
+        for edit in self.edits():
+            name, chained = edit[:2]
+            count += 1
+            try:
+                if chained:
+                    edited, edited_tokenizer = self.check(name, tokenizer,
+                        program, *self.random_edit(generator, program))
+                    # the chain goes on from programs without errors
+                    if edited_tokenizer is not None:
+                        program, tokenizer = edited, edited_tokenizer
+                else:
+                    self.check(name,
+                        Tokenizer(StringIO.StringIO(self.program)),
+                        self.program, *edit[2:])
+            except TestError as result:
+                print(str(result))
+                if not self.full:
+                    return (1, count)
+            else:
+                if self.verbose:
+                    print "Test #{0} OK".format(name)
+        return (0, count)
+
 def error(msg):
     print(msg)
     return 2
@@ -157,8 +452,13 @@ def main(argv):
         's': 'sdecl',
         'd': 'decl',
         'f': 'full',
+        'r': 'recover',
         '' : 'gen',
         'o': 'gen',
+        'x': 'gen',
+        'n': None,
+        'i': None,
+        'm': None,
     }
 
     names = {
@@ -167,10 +467,15 @@ def main(argv):
         's': 'Simple declarations parser',
         'd': 'Declarations parser',
         'f': 'Full syntax parser',
+        'r': 'Error recovery',
         ' ': 'Generator',
         'o': 'Optimizer',
+        'x': 'SSE generator',
+        'n': 'Nesting',
+        'i': 'Retokenizing',
+        'm': 'SSA form',
     }
-    priorities = 'lesdf o'
+    priorities = 'liesdfr oxmn'
 
     try:
         opts, args = getopt.getopt(argv, ''.join(optpaths.keys()) + 'avu')
@@ -207,8 +512,18 @@ def main(argv):
             print '{0} tests ok'.format(count)
         return 0
 
+    if option == 'n':
+        return NestingTester(verbose, full).run()
+    if option == 'i':
+        return RetokenizeTester(verbose, full).run()
+    if option == 'm':
+        return SSATester(verbose, full).run()
     path = 'tests/{0}/'.format(optpaths[option])
-    if option in ('l', 'f'):
+    if option == 'r':
+        # errors of parser and checker are reported before code generation
+        option = 'rg'
+        tester_class = Tester
+    elif option in ('l', 'f'):
         tester_class = Tester
     elif option in ('s', 'd', 'e'):
         tester_class = DotTester
@@ -1 +1 @@
-__all__ = ['printer', 'token', 'tokenizer']
+__all__ = ['printer', 'stream', 'token', 'tokenizer']
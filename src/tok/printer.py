@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+import sys
+
 from token import tt, keywords
 
 lexems_str = { tt.identifier: "Identifier", tt.integer: "Integer",
@@ -38,62 +40,61 @@ indent_len = 2
 indent = indent_len * space
 b_horz, b_vert, b_cross = "-", "|", "+"
 
-def print_tokens(tokens):
+headers = ["Line, pos", "Token text", "Token value", "Token type"]
+lp_template = "{0}, {1}"
+
+def token_rows(tokens):
+    # table cells of every token, read straight from the token stream
+    type_reprs = {}
+    values = tokens.values
+    for i, (line, pos) in enumerate(tokens.linepositions()):
+        ttype = tokens.types[i]
+        if ttype not in type_reprs:
+            type_reprs[ttype] = get_string_repr(tokens.type(i))
+        yield (lp_template.format(line, pos),
+               tokens.text(i), str(values[tokens.value_ids[i]]),
+               type_reprs[ttype])
+
+def print_tokens(tokens, out=None):
 
     if not tokens:
         return
-
-    headers = ["Line, pos", "Token text", "Token value", "Token type"]
-    colcount = len(headers)
-
-    # разделители + пустые строки + заголовок + основной массив
-    rowcount = 3 + 4 + 1 + len(tokens)
-
-    # номера строк
-    empty_lines = [1, 3, 5, 5 + len(tokens) + 1]
-    borders = [0, 4, rowcount - 1]
-    header = 2
-
-    # перед токенами два разделителя, три пустых строки и заголовок
-    tokens_shift = (len(empty_lines) - 1) + (len(borders) - 1) + 1
-
-    lp_template = "{0}, {1}"
-    def values(tok):
-        return [lp_template.format(tok.line, tok.pos), tok.text, str(tok.value), get_string_repr(tok.type)]
-
-    def print_line(out, row, col):
-        left_border = b_vert if col == 0 else ""
-        left, right = left_border + indent, indent + b_vert
-        emptyline = left + max_value_lens[col] * space + right
-
-        if row in borders:
-            length = max_value_lens[col] + len(left + right)
-            right_border = b_cross if col == colcount - 1 else ""
-            out[row] += b_cross + b_horz * (length - len(left_border + b_vert)) + right_border
-        elif row in empty_lines:
-            out[row] += emptyline
-        elif row == header:
-            a, b = max_value_lens[col], len(headers[col])
-            lshift = (a - b) // 2 if a > b else 0
-            rshift = max_value_lens[col] - len(headers[col]) - lshift
-            out[row] += left + space * lshift + headers[col] + space * rshift + right
-        else:
-            tok = tokens[row - tokens_shift]
-            value = values(tok)[col]
-            rshift = max_value_lens[col] - len(value)
-            out[row] += left + value + space * rshift + right
-
-    max_value_lens = [0] * colcount
-
-    for tok in tokens:
-        for i in xrange(colcount):
-            max_value_lens[i] = max(len(headers[i]), len(values(tok)[i]), max_value_lens[i])
-
-    out = [""] * rowcount
-
-    for row in xrange(rowcount):
-        for col in xrange(colcount):
-            print_line(out, row, col)
-
-    for s in out:
-        print(s)
+    if out is None:
+        out = sys.stdout
+
+    # first pass: only widths of columns are kept
+    widths = map(len, headers)
+    for row in token_rows(tokens):
+        widths = map(max, widths, map(len, row))
+
+    def line(cells):
+        out.write(b_vert + "".join(
+            indent + cell + indent + b_vert for cell in cells) + "\n")
+
+    def border():
+        out.write("".join(
+            b_cross + b_horz * (width + 2 * indent_len)
+            for width in widths) + b_cross + "\n")
+
+    def empty_line():
+        line(space * width for width in widths)
+
+    def header():
+        cells = []
+        for title, width in zip(headers, widths):
+            lshift = (width - len(title)) // 2
+            rshift = width - len(title) - lshift
+            cells.append(space * lshift + title + space * rshift)
+        line(cells)
+
+    # second pass: rows are written as soon as they are formatted
+    border()
+    empty_line()
+    header()
+    empty_line()
+    border()
+    empty_line()
+    for row in token_rows(tokens):
+        line(value.ljust(width) for value, width in zip(row, widths))
+    empty_line()
+    border()
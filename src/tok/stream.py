@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+import bisect
+from array import array
+
+from token import SourceToken, tt
+
+class ShiftedArray(object):
+    ''' Increasing offsets stored as pieces, each shifted by its own delta.
+    A part of another array is copied with its pieces and moved by adding
+    the delta to them, the values themselves are copied as a block and
+    not touched one by one. '''
+
+    def __init__(self, values=None):
+        self.values = array('i', values or [])
+        # indexes of the first values of the pieces and their deltas
+        self.pieces = [0]
+        self.deltas = [0]
+        # the last piece is never shifted, so values are appended as they are
+        self.append = self.values.append
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.values)
+        piece = bisect.bisect_right(self.pieces, index) - 1
+        return self.values[index] + self.deltas[piece]
+
+    def __iter__(self):
+        stops = self.pieces[1:] + [len(self.values)]
+        for start, stop, delta in zip(self.pieces, stops, self.deltas):
+            for i in xrange(start, stop):
+                yield self.values[i] + delta
+
+    def _add_piece(self, index, delta):
+        if self.pieces[-1] == index:
+            self.deltas[-1] = delta
+        elif self.deltas[-1] != delta:
+            self.pieces.append(index)
+            self.deltas.append(delta)
+
+    def extend(self, other, start, stop, delta=0):
+        # values start..stop of other array, moved by delta
+        if start >= stop:
+            return
+        base = len(self.values) - start
+        first = bisect.bisect_right(other.pieces, start) - 1
+        for piece in xrange(first, len(other.pieces)):
+            index = max(other.pieces[piece], start)
+            if index >= stop:
+                break
+            self._add_piece(index + base, other.deltas[piece] + delta)
+        self.values.extend(other.values[start:stop])
+        self._add_piece(len(self.values), 0)
+
+    def truncate(self, length):
+        del self.values[length:]
+        while len(self.pieces) > 1 and self.pieces[-1] > length:
+            self.pieces.pop()
+            self.deltas.pop()
+        self._add_piece(length, 0)
+
+    def bisect(self, value, lo=0, right=False):
+        # the piece is found by its first value, the index inside of it by
+        # bisect of the stored values
+        pieces, deltas, values = self.pieces, self.deltas, self.values
+        count, a, b = len(values), 0, len(pieces)
+        while a < b:
+            m = (a + b) // 2
+            if pieces[m] < count and (values[pieces[m]] + deltas[m] <= value
+                if right else values[pieces[m]] + deltas[m] < value):
+                a = m + 1
+            else:
+                b = m
+        piece = max(a - 1, 0)
+        start = pieces[piece]
+        stop = pieces[piece + 1] if piece + 1 < len(pieces) else count
+        find = bisect.bisect_right if right else bisect.bisect_left
+        return max(lo, find(values, value - deltas[piece], start, stop))
+
+class TokenStream(object):
+    ''' Scanned tokens stored as parallel arrays of type codes and source
+    offsets. Values are kept once in the interned table, Token objects
+    and line/column positions are computed only on request. '''
+
+    def __init__(self, source, previous=None):
+        self.source = source
+        # offsets of the first characters of lines, for the positions; the
+        # stream of an edited source takes them from the previous one
+        self.line_starts = ShiftedArray([0])
+        if previous is None:
+            self.find_lines(0, len(source))
+        self.types = array('B')
+        self.starts = ShiftedArray()
+        self.ends = ShiftedArray()
+        self.value_ids = array('i')
+        # stream of the previous version of source shares value ids
+        if previous is None:
+            self.values = ['']
+            self._value_ids = {(str, ''): 0}
+        else:
+            self.values = list(previous.values)
+            self._value_ids = dict(previous._value_ids)
+        # position of end of file, known when the whole source is scanned
+        self.eof_linepos = None
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        tok = SourceToken(self.type(index), self.source,
+            self.starts[index], self.ends[index], self.value(index))
+        tok.line, tok.pos = self.linepos(index)
+        return tok
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+
+    def intern(self, value):
+        # 1 and 1.0 are equal as keys, so value type is a part of the key
+        key = value.__class__, value
+        value_id = self._value_ids.get(key)
+        if value_id is None:
+            value_id = self._value_ids[key] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+    def append(self, type, start, end, value=''):
+        value_id = self.intern(value) if value != '' else 0
+        self.types.append(type)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.value_ids.append(value_id)
+        return self.values[value_id]
+
+    def extend(self, other, start, stop, offset_delta=0):
+        ''' Appends tokens start..stop of the stream this one was created
+        from, moving them by offset_delta characters. Offsets are moved by
+        pieces, not one by one, so the work doesn't depend on the number
+        of tokens after the edit. '''
+        self.types.extend(other.types[start:stop])
+        self.starts.extend(other.starts, start, stop, offset_delta)
+        self.ends.extend(other.ends, start, stop, offset_delta)
+        self.value_ids.extend(other.value_ids[start:stop])
+
+    def truncate(self, length):
+        del self.types[length:]
+        del self.value_ids[length:]
+        self.starts.truncate(length)
+        self.ends.truncate(length)
+
+    def find_lines(self, start, stop, count=None):
+        # appends starts of lines beginning after newlines in start..stop,
+        # or of the first count of them
+        find, start = self.source.find, self.source.find('\n', start, stop)
+        while start != -1 and count != 0:
+            self.line_starts.append(start + 1)
+            start = find('\n', start + 1, stop)
+            if count is not None:
+                count -= 1
+
+    def reuse_lines(self, other, first_line, last_line, offset_delta):
+        ''' Takes starts of lines from the stream of the source before the
+        edit: lines up to first_line are the same, lines after last_line
+        are moved by offset_delta characters, newlines are searched only
+        in the edited lines. '''
+        line_delta = self.source.count('\n') - (len(other.line_starts) - 1)
+        kept = max(1, min(first_line, len(other.line_starts)))
+        self.line_starts.extend(other.line_starts, 1, kept)
+        self.find_lines(self.line_starts[-1], len(self.source),
+            max(last_line + 1 - kept, 0))
+        moved = len(self.line_starts) - line_delta
+        self.line_starts.extend(other.line_starts, moved,
+            len(other.line_starts), offset_delta)
+        return line_delta
+
+    def type(self, index):
+        return tt[self.types[index]]
+
+    def text(self, index):
+        return self.source[self.starts[index]:self.ends[index]]
+
+    def value(self, index):
+        return self.values[self.value_ids[index]]
+
+    def line_start(self, line):
+        # offset of the first character of the line, numbered from 1
+        if line <= len(self.line_starts):
+            return self.line_starts[line - 1]
+        return len(self.source)
+
+    def offset_linepos(self, offset):
+        line = self.line_starts.bisect(offset, right=True)
+        return line, offset - self.line_starts[line - 1] + 1
+
+    def linepos(self, index):
+        return self.offset_linepos(self.starts[index])
+
+    def linepositions(self):
+        # positions of all tokens in one pass, as tokens go in source order
+        line_starts, line = list(self.line_starts), 0
+        for start in self.starts:
+            while line < len(line_starts) and line_starts[line] <= start:
+                line += 1
+            yield line, start - line_starts[line - 1] + 1
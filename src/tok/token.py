@@ -7,11 +7,50 @@ class Token(object):
     @copy_args
     def __init__(self, type=None, text='', value=''):
         self.line, self.pos = -1, -1
+    __slots__ = __init__.argnames + ('line', 'pos')
 
     @property
     def linepos(self):
         return self.line, self.pos
 
+class SourceToken(Token):
+    ''' Token with text given by offsets in the source buffer '''
+    @copy_args
+    def __init__(self, type, source, start, end, value=''):
+        self.line, self.pos = -1, -1
+    __slots__ = ('source', 'start', 'end')
+
+    @property
+    def text(self):
+        return self.source[self.start:self.end]
+
+class TokenType(int):
+    ''' Enumeration value for token types. It is a plain integer, so
+    hashing and comparison in dispatch tables cost nothing, but it is
+    displayed by its name like any other enumeration value. '''
+
+    def __new__(cls, enumtype, index, key):
+        value = int.__new__(cls, index)
+        value.enumtype, value.key = enumtype, key
+        return value
+
+    def __str__(self):
+        return self.key
+
+    def __repr__(self):
+        return 'TokenType({0!r}, {1!r})'.format(int(self), self.key)
+
+    @property
+    def index(self):
+        return int(self)
+
+    # values are singletons of their enumeration
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
 def prepare(prefix, seq):
     return [prefix + item.capitalize() for item in seq]
 
@@ -88,7 +127,8 @@ special = {
 }
 reverse_special = dict((v, k) for k, v in special.iteritems())
 
-tt = Enum(*(prepare('kw', keywords) + alphabetic + special.values()))
+tt = Enum(*(prepare('kw', keywords) + alphabetic + special.values()),
+          value_type=TokenType)
 del alphabetic
 for token in tt:
     s = str(token)
@@ -98,3 +138,15 @@ for token in tt:
         s = s.replace('kw', '', 1).lower()
         if s in keywords:
             token.text = s
+
+# text of a lexem -> its token type, precomputed for the tokenizer;
+# keywords take precedence over word operators and those over type names
+word_types = dict((key, getattr(tt, key)) for key in map(str, tt)
+                  if key == key.lower())
+word_types.update((text, getattr(tt, name))
+                  for text, name in special.iteritems() if text.isalpha())
+word_types.update((word, getattr(tt, 'kw' + word.capitalize()))
+                  for word in keywords)
+delimiter_types = dict((text, getattr(tt, name))
+                       for text, name in special.iteritems()
+                       if not text.isalpha())
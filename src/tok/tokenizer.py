@@ -4,16 +4,60 @@ import re
 import string
 
 from common.errors import *
-from token import Token, tt, special, reverse_special, keywords
+from token import Token, tt, special, word_types, delimiter_types
+from stream import TokenStream
+
+# patterns are compiled once, not on every identifier or number
+spaces_re = re.compile(r'\s*')
+identifier_re = re.compile(r'(\w+)')
+hex_re = re.compile(r'(\$[\da-fA-F]*)')
+real_re = re.compile(r'(\d+\.\d+)|(\d+[Ee]-{0,1}\d+)')
+integer_re = re.compile(r'\d+')
+char_re = re.compile(r'(#\d*)')
+# characters of a wrong number, skipped after the error in recovery mode
+number_re = re.compile(r'[$\w.]+')
+# quote doubling is an escape, so closing quote can't be followed by another
+string_re = re.compile(r"'(?:[^'\n]|'')*'(?!')")
+
+def build_dispatch_table():
+    # first character of a lexem -> name of the method reading it
+    table = ['_read_illegal'] * 256
+    def assign(chars, method):
+        for ch in chars:
+            table[ord(ch)] = method
+    assign((s for s in special if len(s) == 1), '_read_delimiter')
+    assign(string.letters + '_', '_read_identifier')
+    assign(string.digits + '$', '_read_number')
+    assign('/', '_read_comment')
+    assign('{(', '_read_block_comment')
+    assign("'", '_read_string_const')
+    assign('#', '_read_char_const')
+    return table
+
+dispatch_table = build_dispatch_table()
 
 class Tokenizer(object):
-    def __init__(self, program):
-        self._token = None
+    def __init__(self, program, previous=None, edited_lines=None,
+        errors=None
+    ):
+        # errors are appended to the list if it's given and scanning goes
+        # on, otherwise the first error is raised
+        self.errors = errors
+        # the whole source is read at once, tokens refer to offsets in it
+        self._source = program.read()
+        if self._source and self._source[-1] != '\n':
+            self._source += '\n'
+        self.tokens = TokenStream(self._source, previous)
+        # current token: its index in the stream, type and value
         self.eof = False
-        self._file = program
-        self._cline, self._cpos = -1, -1
-        self._text = self._getline()
-        self._tokenpos = 0, 0
+        self._token, self._index = None, -1
+        self.token_type, self.token_value = None, ''
+        # scanner state
+        self._at_end = not self._source
+        self._offset = self._tokenstart = 0
+        self._handlers = [getattr(self, name) for name in dispatch_table]
+        if previous is not None:
+            self._reuse(previous, *edited_lines)
         self.next_token()
 
     def __iter__(self):
@@ -22,183 +66,252 @@ class Tokenizer(object):
             self.next_token()
 
     def e(self, message, *args):
-        raise LexError(message, self._tokenpos, *args)
+        raise LexError(
+            message, self.tokens.offset_linepos(self._tokenstart), *args)
+
+    def retokenize(self, program, first_line, last_line):
+        ''' Returns tokenizer for the edited program. Lines from first_line
+        to last_line (numbered as in the edited program) have been changed,
+        all lines before and after them are the same as in the program of
+        this tokenizer. Scanning stops as soon as a new token starts where
+        an old one did after last_line, the rest of tokens and lines is
+        taken from this tokenizer and moved as a whole, so the work is
+        proportional to the size of the edit. '''
+        while self.tokens.eof_linepos is None:
+            self._scan()
+        return Tokenizer(program, self.tokens, (first_line, last_line))
 
-    def _getch(self):
-        self._cpos += 1
-        if not self.eof and self._cpos == len(self._text):
-            self._text = self._getline()
-        return self._text[self._cpos] if not self.eof else ""
+    def _reuse(self, old, first_line, last_line):
+        tokens = self.tokens
+        offset_delta = len(self._source) - len(old.source)
+        line_delta = tokens.reuse_lines(old, first_line, last_line,
+            offset_delta)
+        # tokens before the edit are kept, scanning restarts after the last
+        # of them: there are no comments or literals open at that point
+        kept = old.starts.bisect(tokens.line_start(first_line))
+        tokens.extend(old, 0, kept)
+        if kept:
+            self._offset = old.ends[kept - 1]
+        # scan until new token starts where some old token did, from there
+        # text is the same and so are the tokens
+        unchanged = tokens.line_start(last_line + 1)
+        i, count = kept, len(old)
+        while self._scan():
+            new = len(tokens) - 1
+            start = tokens.starts[new]
+            if start < unchanged:
+                continue
+            i = old.starts.bisect(start - offset_delta, i)
+            if i < count and old.starts[i] == start - offset_delta:
+                tokens.truncate(new)
+                tokens.extend(old, i, count, offset_delta)
+                line, pos = old.eof_linepos
+                tokens.eof_linepos = line + line_delta, pos
+                return
 
-    def _getline(self):
-        line = self._file.readline()
-        self._cline, self._cpos = self._cline + 1, -1
-        self.eof = len(line) == 0
-        if not self.eof and line[-1] != '\n':
-           line += '\n'
-        return line
+    def _make_token(self, ttype, end, value=''):
+        self.tokens.append(ttype, self._offset, end, value)
+        self._offset = end
+        return True
 
-    def _putch(self, count=1):
-        self._cpos -= count
+    def _scan(self):
+        # appends next token to the stream, returns False at the end of file
+        source = self._source
+        while not self._at_end:
+            self._offset = spaces_re.match(source, self._offset).end()
+            self._tokenstart = self._offset
+            if self._offset == len(source):
+                self._at_end = True
+                break
+            ch = source[self._offset]
+            try:
+                if self._handlers[ord(ch)](ch):
+                    return True
+            except LexError as error:
+                if self.errors is None:
+                    raise
+                self.errors.append(error)
+                # skip the wrong lexeme if its end is known, else the line;
+                # position of the error is the start of the lexeme
+                if self._offset == self._tokenstart:
+                    self._offset = source.find('\n', self._offset) + 1
+        if self._tokenstart == len(source):
+            line, pos = len(self.tokens.line_starts) - 1 or 1, 0
+        else:
+            line, pos = self.tokens.offset_linepos(self._tokenstart)
+            line -= 1
+        self.tokens.eof_linepos = line, pos
+        return False
 
     def get_token(self):
+        # Token object is created only if parser needs more than type/value
+        if self._token is None:
+            self._token = self.tokens[self._index]
         return self._token
 
+    @property
+    def linepos(self):
+        return self.position(self._index)
+
+    def position(self, mark):
+        # line and column of the token at the position returned by mark()
+        if mark < len(self.tokens):
+            return self.tokens.linepos(mark)
+        return self.tokens.eof_linepos
+
     def next_token(self):
-        found = False
-        while not found and not self.eof:
-            ch = self._getch()
-            if ch.isspace(): continue
-            self._tokenpos = self._cline + 1, self._cpos + 1
-
-            if ch in string.letters + "_": tok = self._read_identifier(ch)
-            elif ch in string.digits + "$": tok = self._read_number(ch)
-            elif ch == "/": tok = self._read_comment(ch)
-            elif ch in "{(": tok = self._read_block_comment(ch)
-            elif ch == "'": tok = self._read_string_const(ch)
-            elif ch == "#": tok = self._read_char_const(ch)
-            elif ch in special:
-                tok = self._read_delimiter(ch)
-            elif ch:
-                self.e("Illegal character '{0}'", ch)
-
-            found = ch and tok is not None
-
-        if found and ch:
-            tok.line, tok.pos = self._tokenpos
+        self._seek(self._index + 1)
+
+    def _seek(self, index):
+        # make token with the given index current, scanning up to it if needed
+        tokens = self.tokens
+        while index >= len(tokens) and tokens.eof_linepos is None:
+            self._scan()
+        self._token = None
+        if index < len(tokens):
+            self._index, self.eof = index, False
+            self.token_type = tt[tokens.types[index]]
+            self.token_value = tokens.values[tokens.value_ids[index]]
         else:
+            self._index, self.eof = len(tokens), True
             tok = Token(tt.eof, value='EOF')
-            tok.line, tok.pos = self._tokenpos
-            if tok.line:
-                tok.line -= 1
-            else:
-                tok.line += 1
-        self._token = tok
+            tok.line, tok.pos = tokens.eof_linepos
+            self._token = tok
+            self.token_type, self.token_value = tok.type, tok.value
+
+    def peek(self, k=1):
+        ''' Returns type of the k-th token after the current one. Tokens
+        are scanned once and stay in the stream, so looking ahead costs
+        nothing when the parser gets to them. '''
+        tokens, index = self.tokens, self._index + k
+        while index >= len(tokens) and tokens.eof_linepos is None:
+            self._scan()
+        if index < len(tokens):
+            return tt[tokens.types[index]]
+        return tt.eof
+
+    def mark(self):
+        # position to return to with rewind()
+        return self._index
+
+    def rewind(self, mark):
+        self._seek(mark)
 
     def _read_number(self, ch):
         ttype = tt.integer
         if ch == '$':
             # hex
-            numstring = self._match_regexp(r'(\$[\da-fA-F]*)')
-            if numstring == '$':
-                numstring = ''
+            end = self._match_regexp(hex_re)
+            if end - self._offset == 1:
+                end = None
             else:
-                value = eval('0x' + numstring[1:])
+                value = eval('0x' + self._source[self._offset + 1:end])
         else:
             # try real
-            numstring = self._match_regexp(r'(\d+\.\d+)|(\d+[Ee]-{0,1}\d+)')
+            end = self._match_regexp(real_re)
             # try int
-            if not numstring:
-                numstring = self._match_regexp(r'\d+')
-                value = int(numstring)
+            if end is None:
+                end = self._match_regexp(integer_re)
+                value = int(self._source[self._offset:end])
                 # check for real
-                if self._getch() in '.eE':
-                    if self._getch() != '.':
-                        numstring = ''
-                        ttype = tt.real
-                    self._putch()
-                self._putch()
+                if (self._source[end] in '.eE' and
+                    self._source[end + 1] != '.'
+                ):
+                    end = None
+                    ttype = tt.real
             else:
-                 ttype, value = tt.real, eval(numstring)
+                 ttype = tt.real
+                 value = eval(self._source[self._offset:end])
 
         etypes = {
             tt.integer: 'Invalid integer constant',
             tt.real: 'Invalid real constant',
         }
-        if not numstring:
+        if end is None:
+            self._offset = self._match_regexp(number_re)
             self.e(etypes[ttype])
-        return Token(ttype, numstring, value)
+        return self._make_token(ttype, end, value)
 
     def _read_comment(self, ch):
-        if self._getch() == '/':
-            self._text = self._getline()
-            return None
-        else:
-            self._putch()
+        if self._source[self._offset + 1] != '/':
             return self._read_delimiter(ch)
+        end = self._source.find('\n', self._offset) + 1
+        self._offset = end
+        # comment on the last line leaves end of file at its position
+        self._at_end = end == len(self._source)
+        return None
 
     def _read_block_comment(self, ch):
         # first - {}, second - (**)
+        source = self._source
 
         def fail():
+            # comment without end takes the rest of file
+            self._offset = len(source)
             self.e('Unexpected end of file in block comment')
 
-        def read_first(ch):
-            while ch not in ('}', ''):
-                ch = self._getch()
-            if ch == '}': return None
-            fail()
+        def read_first():
+            end = source.find('}', self._offset)
+            if end == -1:
+                fail()
+            return end + 1
+
+        def read_second():
+            # character after each '*' is consumed even if it isn't ')'
+            start = self._offset + 2
+            while True:
+                star = source.find('*', start)
+                if star == -1:
+                    fail()
+                if source[star + 1:star + 2] == ')':
+                    return star + 2
+                start = star + 2
 
-        def read_second(ch):
-            if self._getch() != '*':
-                self._putch()
+        if ch == '(':
+            if source[self._offset + 1] != '*':
                 return self._read_delimiter(ch)
-            found = False
-            while not found and ch:
-                ch = self._getch()
-                if ch == '*':
-                    found = self._getch() == ')'
-            if found: return None
-            fail()
+            self._offset = read_second()
+        else:
+            self._offset = read_first()
+        return None
 
-        methods = [read_first, read_second]
-        return methods[ch == '('](ch)
+    def _read_illegal(self, ch):
+        self._offset += 1
+        self.e("Illegal character '{0}'", ch)
 
     def _read_delimiter(self, ch):
-        first, both = ch, ch + self._getch()
-        if both in special:
-            text, ttype = both, tt.__dict__[special[both]]
-        else:
-            text, ttype = first, tt.__dict__[special[first]]
-            self._putch()
-        return Token(ttype, text)
+        both = self._source[self._offset:self._offset + 2]
+        ttype = delimiter_types.get(both)
+        if ttype is not None:
+            return self._make_token(ttype, self._offset + 2)
+        return self._make_token(delimiter_types[ch], self._offset + 1)
 
     def _read_string_const(self, ch):
-        s, ch = [ch], self._getch()
-        s_end = False
-        line = self._cline
-        while not s_end and not self.eof:
-            if ch == "'":
-                pos = self._cpos
-                while ch == "'": ch = self._getch()
-                ap_count = self._cpos - pos
-                s.append("'" * ap_count)
-                if ap_count % 2 != 0:
-                    s_end = True
-                    self._putch()
-                continue
-            s.append(ch)
-            ch = self._getch()
-        if s_end and line == self._cline:
-            s = "".join(c for c in s)
-            value = '"' + s[1:-1].replace("''", "'") + '"'
-            return Token(tt.string_const, s, value)
-        else:
+        end = self._match_regexp(string_re)
+        if end is None:
             self.e('Unexpected end of file in string literal')
+        s = self._source[self._offset + 1:end - 1]
+        value = '"' + s.replace("''", "'") + '"'
+        return self._make_token(tt.string_const, end, value)
 
-    def _match_regexp(self, pattern):
-        match = re.compile(pattern).match(self._text, self._cpos)
-        if match is None:
-            return ''
-        match = match.group(0)
-        self._cpos += len(match) - 1
-        return match
+    def _match_regexp(self, regexp):
+        # returns end offset of the match or None if nothing matched
+        match = regexp.match(self._source, self._offset)
+        if match is None or match.end() == self._offset:
+            return None
+        return match.end()
 
     def _read_identifier(self, ch):
-        name = self._match_regexp(r'(\w+)')
-        value = name.lower()
-        if value in keywords:
-            ttype = tt.__dict__['kw' + value.capitalize()]
-        elif value in special:
-            ttype = tt.__dict__[special[value]]
-        elif value in tt:
-            ttype = tt.__dict__[value]
-        else:
-            ttype = tt.identifier
-        return Token(ttype, name, value)
+        end = self._match_regexp(identifier_re)
+        # names are interned so all occurrences share one string
+        value = intern(self._source[self._offset:end].lower())
+        return self._make_token(
+            word_types.get(value, tt.identifier), end, value)
 
     def _read_char_const(self, ch):
-        char = self._match_regexp(r'(#\d*)').lstrip('#')
+        end = self._match_regexp(char_re)
+        char = self._source[self._offset + 1:end]
         if not char or int(char) > 255:
+            self._offset = end
             self.e('Invalid character constant')
-        return Token(tt.char_const, '#' + char, chr(int(char)))
+        return self._make_token(tt.char_const, end, chr(int(char)))
@@ -0,0 +1,4 @@
+const
+  n = 4;
+var
+  a: array[-n..n * 2] of integer;
@@ -0,0 +1,5 @@
+const
+  c = real;
+
+begin
+end.
@@ -0,0 +1,5 @@
+var
+  a: array[1..real] of integer;
+
+begin
+end.
@@ -0,0 +1,5 @@
+var
+  a: array[10..integer] of 20;
+
+begin
+end.
@@ -0,0 +1,5 @@
+var
+  a: array[1:=10] of integer;
+
+begin
+end.
@@ -0,0 +1,17 @@
+var
+  one, two: integer;
+
+procedure first;
+begin
+  one := 1
+end;
+
+procedure second;
+begin
+  two := 2
+end;
+
+begin
+  second();
+  first()
+end.
@@ -0,0 +1,16 @@
+const
+  n = 2 + 3;
+  half: real = n / 2;
+var
+  a: array[1..n * 2] of integer;
+  i: integer;
+  r: real;
+begin
+  for i := 1 to n * 2 do a[i] := i * n;
+  writeln(a[n * 2]);
+  writeln(-n, n shl 2, n div 2, n mod 2);
+  r := half;
+  writeln(r);
+  writeln(n > 4, n = 4, not n);
+  writeln(1 / 4 + half);
+end.
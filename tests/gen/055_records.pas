@@ -0,0 +1,76 @@
+type
+  TPoint = record
+    x, y: integer;
+  end;
+  TShape = record
+    id: integer;
+    origin: TPoint;
+    size: real;
+    corners: array[1..4] of TPoint;
+  end;
+  TP = TPoint;
+  TArr = array[1..3] of TP;
+  TA2 = TArr;
+
+var
+  p: TPoint;
+  s: TShape;
+  shapes: array[0..2] of TShape;
+  i, j: integer;
+  v: TP;
+  w: TA2;
+
+procedure fill(k: integer);
+var
+  t: array[1..3] of TShape;
+begin
+  t[k].id := k;
+  t[k].origin.x := k + 100;
+  t[k].corners[k].y := k * k;
+  writeln(t[k].id, t[k].origin.x, t[k].corners[k].y);
+end;
+
+procedure local();
+var
+  q: TPoint;
+  a: array[1..5] of integer;
+  k: integer;
+begin
+  for k := 1 to 5 do
+    a[k] := k * 10;
+  q.x := a[1] + a[5];
+  q.y := q.x * 2;
+  writeln(q.x, q.y, a[5]);
+  for k := 1 to 3 do
+    fill(k);
+end;
+
+begin
+  p.x := 3;
+  p.y := p.x + 4;
+  s.id := 7;
+  s.origin.x := p.y;
+  s.origin.y := s.origin.x * 2;
+  s.size := 2.5;
+  s.corners[2].x := 11;
+  s.corners[4].y := s.corners[2].x + 1;
+  writeln(p.x, p.y, s.id, s.origin.x, s.origin.y);
+  writeln(s.size);
+  writeln(s.corners[2].x, s.corners[4].y);
+  for i := 0 to 2 do
+    shapes[i].id := i * 3;
+  for i := 0 to 2 do
+    for j := 1 to 4 do
+      shapes[i].corners[j].x := i * 10 + j;
+  writeln(shapes[0].id, shapes[1].id, shapes[2].id);
+  writeln(shapes[1].corners[3].x, shapes[2].corners[4].x, shapes[0].corners[1].x);
+  for i := 1 to 3 do
+    p.x := p.x + i;
+  writeln(p.x);
+  local();
+  v.x := 5;
+  v.y := v.x + 1;
+  for i := 1 to 3 do
+    w[i].y := i + v.y;
+  writeln(v.x, v.y, w[1].y, w[3].y);
+end.
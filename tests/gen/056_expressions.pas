@@ -0,0 +1,48 @@
+var
+  a, b, c, d, i: integer;
+  v: array[1..8] of integer;
+  m: array[1..3] of array[1..3] of integer;
+
+function sq(x: integer): integer;
+begin
+  result := x * x;
+end;
+
+function sum3(x, y, z: integer): integer;
+begin
+  result := x + y + z;
+end;
+
+begin
+  a := 7;
+  b := 3;
+  c := 100;
+  d := -2;
+  for i := 1 to 8 do
+    v[i] := i * i;
+  for i := 1 to 3 do
+    for a := 1 to 3 do
+      m[i][a] := i * 10 + a;
+  a := 7;
+  writeln((a + b) * (c - d) - (a * b + c * d));
+  writeln(((a + b) * (c + d)) * ((a - b) * (c - d)) + ((a * c) - (b * d)));
+  writeln(c div b, c mod b, c div (a - b), (c + a) mod (b + b));
+  writeln(a shl b, c shr 2, (a + c) shl (b - 1), c shr (a - 5));
+  writeln(a and b, (a - 7) and b, a or (b - 3), (a - 7) or (b - 3));
+  writeln(a xor b, not a, not (a - 7), - (a + b));
+  writeln(a < b, a <= 7, a > b, c >= 101, a = 7, a <> 7);
+  writeln(v[a] + v[b] * v[a - b], v[v[2]] - v[b + 1]);
+  writeln(m[b][b - 1] * m[1][a - 5] + m[a - 4][b]);
+  writeln(sq(a) + sq(b) * sq(a - b), sq(sq(b)) - sq(a + sum3(a, b, c)));
+  writeln(sum3(sq(a), sum3(a, b, sq(b)), sq(c div 10)) + a * b);
+  writeln(c div sq(b) + c mod sq(b) * (a - b));
+  i := (((((a + 1) * (b + 2)) + ((c + 3) * (d + 4))) * (((a + 5) * (b + 6)) - ((c + 7) - (d + 8)))) div 7);
+  writeln(i);
+  if (a + b > c div 10) and (v[b] = 9) then
+    writeln(1)
+  else
+    writeln(0);
+  while (a > 0) and (v[a] > 10) do
+    a := a - 1;
+  writeln(a);
+end.
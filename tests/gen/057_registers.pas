@@ -0,0 +1,70 @@
+var
+  i, j, n, total, calls: integer;
+  v: array[1..10] of integer;
+
+function gcd(a, b: integer): integer;
+var t: integer;
+begin
+  calls := calls + 1;
+  result := a;
+  while b <> 0 do
+  begin
+    t := a mod b;
+    a := b;
+    b := t;
+    result := a;
+  end;
+end;
+
+function sum(first, last, step: integer): integer;
+var s, k, x, y, z: integer;
+begin
+  s := 0;
+  x := 1;
+  y := 2;
+  z := 3;
+  result := s + x - y + z;
+  for k := first to last do
+  begin
+    s := s + k * step;
+    x := x + y;
+    y := y + z;
+    z := z + x;
+    result := s + x - y + z;
+  end;
+end;
+
+function power(base, exp: integer): integer;
+var p: integer;
+begin
+  p := 1;
+  result := p;
+  while exp > 0 do
+  begin
+    p := p * base;
+    exp := exp - 1;
+    result := p;
+  end;
+end;
+
+begin
+  n := 10;
+  for i := 1 to n do
+    v[i] := (i * 37) mod 11;
+  total := 0;
+  for i := 1 to n do
+    for j := i + 1 to n do
+      total := total + gcd(v[i] + 1, v[j] + 1) * (j - i);
+  writeln(total);
+  writeln(calls);
+  writeln(sum(1, 10, 3));
+  writeln(sum(5, 4, 1));
+  writeln(power(3, 7), power(2, 0));
+  i := 0;
+  j := 100;
+  repeat begin
+    i := i + j;
+    j := j - 7;
+  end until j < 0;
+  writeln(i, j);
+end.
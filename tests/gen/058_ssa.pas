@@ -0,0 +1,85 @@
+var
+  i, j, k, x, y, z, g: integer;
+
+function h(n: integer): integer;
+var p, q: integer;
+begin
+  p := 0;
+  q := 1;
+  while 1 do
+  begin
+    p := p + q;
+    if p > n then
+      break;
+    q := q * 2
+  end;;
+  result := p
+end;
+
+function f(x, y: integer): integer;
+var t, u, w: integer;
+begin
+  t := x * y + 1;
+  u := x * y + 1;
+  w := 3;
+  if w > 2 then
+    result := t + u + w
+  else
+    result := 0
+end;
+
+function m(n: integer): integer;
+var a, b: integer;
+begin
+  a := n;
+  repeat
+  begin
+    a := a + 1;
+    b := a * 3;
+    if b > 40 then
+      continue;
+    b := b - 1
+  end
+  until a > 10;
+  result := a + b
+end;
+
+begin
+  x := 0;
+  for i := 1 to 5 do
+  begin
+    if i = 3 then
+      continue;
+    x := x + i
+  end;;
+  writeln(x);
+  y := 7;
+  z := 0;
+  if x > 100 then
+    y := 7
+  else
+    z := 2;
+  writeln(y + z);
+  k := 1;
+  j := 0;
+  while j < 10 do
+  begin
+    j := j + k;
+    k := 1
+  end;;
+  writeln(j);
+  writeln(g);
+  writeln(h(50));
+  writeln(m(2));
+  x := i * 2;
+  y := i * 2 + 1;
+  writeln(x + y);
+  repeat
+    g := g + 1
+  until 1;
+  writeln(g);
+  writeln(f(3, 4));
+  for i := 1 to 0 do
+    writeln(i);
+  writeln(i)
+end.
@@ -0,0 +1,126 @@
+var
+  a, b, c, d: real;
+  i, n, k: integer;
+  v: array [1..5] of real;
+
+function half(x: real): real;
+begin
+  result := x / 2.0
+end;
+
+function f(x: real): real;
+begin
+  result := x * 0.5 + 0.25
+end;
+
+function g(x: integer): integer;
+begin
+  result := x + 1
+end;
+
+function sq(k: integer): integer;
+begin
+  result := k * k
+end;
+
+begin
+  a := 16777216.0;
+  b := 1.0;
+  c := (a + b) - a;
+  writeln(c);
+  a := 1.5;
+  b := 2.25;
+  n := 3;
+  writeln(a + b * 2.0);
+  writeln(a - b);
+  writeln(b - a);
+  writeln(a / b);
+  writeln(n / 2);
+  writeln(-a * (b - n));
+  writeln(half(a) + half(b));
+  writeln(a * sq(n) - half(b * 4.0));
+  for i := 1 to 5 do
+    v[i] := i * 0.5;
+  for i := 1 to 5 do
+    writeln(v[i] - v[6 - i]);
+  if a < b then writeln(1) else writeln(0);
+  if a > b then writeln(1) else writeln(0);
+  if a + 1.0 >= b then writeln(1) else writeln(0);
+  if b <= a + 0.75 then writeln(1) else writeln(0);
+  if a = 1.5 then writeln(1) else writeln(0);
+  if a <> 1.5 then writeln(1) else writeln(0);
+  n := a < b;
+  writeln(n);
+  n := b < a;
+  writeln(n);
+  d := ((a + b) * (a - b)) / ((a * b) + (b / a));
+  writeln(d);
+  d := (a + (b + (a + (b + (a + (b + (a + (b + (a + (b + a)))))))))) * 1.0;
+  writeln(d);
+  d := a * (b * (a * (b * (a - (b - (a * (b - (a / (b + (a - b)))))))))) -
+    (a - (b - (a - (b - (a - (b - (a - (b - (a - (b - 1.0)))))))))) + 0.5;
+  writeln(d);
+  d := ((a + b) * (a - b) - (b + a) * (b - a)) * ((a * b - b * a) + (a / b
+    + b / a)) - (((a - b) - (b - a)) - ((a + a) - (b + b))) * (((a * a) -
+    (b * b)) + ((a / a) - (b / b)));
+  writeln(d);
+  c := 2.0;
+  k := 3;
+  d := (((((((((a - (k * 2)) - (k - b)) - ((c + b) + (k + k))) - (((a + (k
+    * 2)) - ((k * 2) - b)) + ((k + k) - (a + a)))) - ((((k + a) - (a * k))
+    - ((b - (k * 2)) - (a * a))) - (((a * k) + ((k * 2) + c)) + ((k - c) *
+    (a + k))))) + (((((a + a) * (b + b)) + ((a + (k * 2)) + (a + a))) +
+    (((c * a) - (c * a)) - ((b + b) + (a + a)))) + ((((b - a) - (b - (k *
+    2))) + (((k * 2) + a) - (a + a))) + (((k * k) + (c - a)) - ((a - k) -
+    ((k * 2) - k)))))) + ((((((a * k) + (c - k)) - ((a + a) * (b + k))) -
+    (((c - c) + (a - b)) - ((k + k) - (k - a)))) + ((((k - k) * ((k * 2) -
+    b)) - ((b - (k * 2)) - (a + k))) - (((a + a) + (k + c)) + ((c + a) -
+    (a - c))))) + (((((a - k) - (k - a)) + ((b - (k * 2)) * (a + c))) -
+    (((a - a) + (c - c)) + ((b - a) - (b * a)))) - ((((k - a) - (a + c)) -
+    ((a + k) * (a + a))) * (((a - a) * (k + c)) * ((k - c) + (a * (k *
+    2)))))))) - (((((((k + (k * 2)) - (a + k)) + ((a - a) + ((k * 2) +
+    a))) + (((a * (k * 2)) + (a - a)) * ((a - k) + (a - c)))) + ((((b + (k
+    * 2)) + (a + k)) + ((c + a) - (c * b))) - (((b - k) - ((k * 2) * a)) -
+    ((c - a) + (b * (k * 2)))))) + (((((k - c) + (b - b)) - ((k * k) + ((k
+    * 2) + a))) - (((a + a) - (b * k)) * (((k * 2) + k) + ((k * 2) + c))))
+    + ((((k + a) * (k * k)) + ((k * c) + ((k * 2) * k))) - (((a - a) + (a
+    - k)) - ((k - b) * ((k * 2) + a)))))) + ((((((b - k) + (c + b)) * ((k
+    + (k * 2)) + (b + b))) - ((((k * 2) - k) * (k - k)) * ((k + k) - (a -
+    a)))) + ((((b + (k * 2)) + (a + k)) - ((k - k) - (a * c))) + (((b + b)
+    + (a + c)) - ((c * (k * 2)) - (c + k))))) + (((((a - k) * (a * a)) +
+    ((a + k) - (b + k))) + (((b + k) - (k - (k * 2))) * ((k + (k * 2)) +
+    (k + b)))) + ((((k * (k * 2)) - ((k * 2) - b)) - ((k - k) - (c * (k *
+    2)))) + (((c - k) - (k - k)) + ((a - b) * (k + a)))))))) + ((((((((a -
+    k) + (a - a)) - ((a - k) + (a + k))) + (((a - a) * (c - a)) + ((c - a)
+    + (a - k)))) + ((((a + b) - (b - a)) * (((k * 2) * c) * (k - a))) +
+    (((a - k) + (k - c)) + ((a - a) - ((k * 2) + a))))) - (((((k - (k *
+    2)) - ((k * 2) - b)) - ((k - k) - (k - k))) - (((b * c) - (c - b)) -
+    ((a - b) - (b - (k * 2))))) - ((((a + k) + (k + k)) * ((a - (k * 2)) -
+    (a + b))) + (((a * (k * 2)) * ((k * 2) - k)) - (((k * 2) - k) * (k -
+    a)))))) + ((((((k - k) - (b + b)) + ((b + b) - (c - (k * 2)))) + (((b
+    + (k * 2)) - (a + k)) + ((a * a) + (k + c)))) + ((((a * (k * 2)) - (k
+    + b)) - ((a + c) - (a * b))) + (((k + k) - (c + a)) - ((k - b) + (k -
+    c))))) + (((((b + c) - ((k * 2) - c)) + ((a - b) + (a - k))) * (((a +
+    a) * ((k * 2) * k)) * ((c - (k * 2)) + (c * b)))) * ((((a - a) - (a -
+    (k * 2))) - ((k + a) - (a - a))) + (((c - a) + (k + a)) - ((a + a) -
+    (c * c))))))) - (((((((k - a) - (k + (k * 2))) + ((k - (k * 2)) + (a +
+    b))) - (((k - a) + (k - k)) + ((a + a) + (k * a)))) - ((((c - a) * (k
+    * c)) * ((a + k) * (k - a))) - (((a + c) + (a + k)) - ((k + b) * ((k *
+    2) + a))))) - (((((k + (k * 2)) - (b + k)) + (((k * 2) - a) - (k +
+    a))) - (((k - a) + (k * b)) + ((a * b) + (a + k)))) * ((((k * (k * 2))
+    + (k - b)) - ((b - a) * (k + c))) * (((c * c) - ((k * 2) - (k * 2))) -
+    ((b - (k * 2)) - (k * b)))))) * ((((((a + c) + (a * a)) - ((a + b) -
+    (c - a))) - (((b - (k * 2)) - (a * a)) + ((c - c) * ((k * 2) + b)))) -
+    ((((k - k) + (a - a)) + ((k + b) * (b * (k * 2)))) + (((k * k) * (a -
+    (k * 2))) - ((a - a) * (a * k))))) - (((((k + (k * 2)) - (c + k)) -
+    ((c + b) + (a - (k * 2)))) + (((c * b) + (c - (k * 2))) * ((a * c) *
+    (k + k)))) + ((((a * c) - (a - (k * 2))) + ((a - c) - (a * c))) * (((k
+    + b) - (c - k)) + ((b - k) + (k - b)))))))));
+  writeln(d);
+  d := (((((f(a) - a) * (f(a) * c)) - ((b - k) + ((k * 2) + k))) * (((b *
+    c) + (a - k)) - ((k + (k * 2)) - ((k * 2) * f(a))))) + ((((b - a) +
+    (f(a) + a)) + ((k - c) + (k - b))) + (((k - g(k)) - (f(a) + k)) +
+    ((f(a) - f(a)) + (f(a) - k)))));
+  writeln(d);
+  writeln(n, a, k, b)
+end.
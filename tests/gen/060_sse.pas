@@ -0,0 +1,58 @@
+type TP = record u: real; n: integer; end;
+var i: integer; s, t, w, m: real; arr: array[1..5] of real; p: TP;
+function poly(x: real; n: integer): real;
+var k: integer; acc, pw, q: real;
+begin
+  acc := 0.0; pw := 1.0; q := x / 4;
+  for k := 0 to n do
+  begin
+    acc := acc + pw * (k + 1);
+    pw := pw * q;
+    if acc > 100.0 then acc := acc - 100.0;
+  end;;
+  result := -acc;
+end;
+function twice(x: real): real;
+var y, z: real;
+begin
+  y := x; z := x;
+  y := y + poly(z, 3);
+  writeln(y, z);
+  result := y + z;
+end;
+procedure show(a, b: real);
+var c: real;
+begin
+  c := a - b;
+  writeln(a, b, c, a * b / (c + 0.5));
+end;
+begin
+  s := 0.0; t := 1.0; w := 0.5; m := 0.75;
+  for i := 1 to 5 do
+  begin
+    arr[i] := s - t * i;
+    s := s + twice(t) / 3.0;
+    t := t * 1.25;
+    if s < t then w := w * 2 else w := w - s;
+    m := m * s - t;
+    show(s, w);
+  end;;
+  p.u := s; p.n := 4;
+  for i := 1 to 5 do
+    p.u := p.u - arr[i] * poly(arr[i], p.n);
+  writeln(p.u, s, t, w, -(s - t), s / t, s <= t, s >= w, t <> t, t = t);
+  writeln(((s + t) * (s - m) - (t + s) * (t - w)) * ((s * w - m * t) +
+    (s / t + w / m)) - (((s - t) - (m - w)) - ((s + m) - (w + t))) *
+    (((s * m) - (t * t)) + ((w / s) - (m / w))));
+  writeln(((s * w - m * t) + (s / t + poly(w, 2) / m)) *
+    ((s + w) * (t - m) - (w - s) * (m + t)) <
+    (((s - t) - (m - w)) - ((s + m) - (w + t))) *
+    ((w - poly(s, 1)) + (t * m - s / w)));
+  repeat
+  begin
+    s := s - 7.5;
+    w := w + s * 0.5;
+  end
+  until s < -10;
+  writeln(s, w, m);
+end.
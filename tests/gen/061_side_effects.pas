@@ -0,0 +1,45 @@
+var
+  g, h: integer;
+  rc: record
+    x: integer;
+    y: real;
+  end;
+  r: real;
+
+function f(n: integer): integer;
+begin
+  g := 10;
+  rc.y := 255.0;
+  Result := n;
+end;
+
+function fr(n: real): real;
+begin
+  g := 20;
+  rc.y := 100.0;
+  Result := n;
+end;
+
+begin
+  g := 1;
+  writeln(g + f(0));
+  g := 1;
+  writeln(g * (f(1) + g));
+  h := 1;
+  rc.y := 0.0;
+  writeln(f(0) + (h + rc.y));
+  rc.y := 0.0;
+  writeln(fr(0.0) + (h + rc.y));
+  rc.y := 0.0;
+  writeln((h + rc.y) + fr(0.0));
+  rc.y := 1.0;
+  r := rc.y - fr(1.0) * 2.0;
+  writeln(r);
+  g := 2;
+  writeln(g - f(3));
+  g := 3;
+  r := g / fr(2.0);
+  writeln(r);
+  g := 1;
+  writeln(g < f(5));
+end.
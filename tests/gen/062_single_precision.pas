@@ -0,0 +1,24 @@
+var
+  g: integer;
+  r, s: real;
+
+function square(x: real): real;
+begin
+  Result := x * x;
+end;
+
+begin
+  g := 16777217;
+  r := g;
+  writeln(r = g);
+  writeln(g - r);
+  writeln(g + 0.0 - 16777216.0);
+  r := 1e30;
+  s := r * r;
+  writeln(s / r > 1e31);
+  writeln(square(r) / r > 1e31);
+  r := 1e-30;
+  s := r * r;
+  writeln(s = 0.0);
+  writeln(s / r);
+end.
@@ -0,0 +1,30 @@
+procedure show(n: integer);
+begin
+  writeln(n);
+end;
+
+function sum(n: integer): real;
+var
+  i: integer;
+  s, step: real;
+begin
+  s := 0.0;
+  step := 0.5;
+  for i := 1 to n do begin
+    s := s + step;
+    show(i);
+  end;;
+  Result := s;
+end;
+
+var
+  a, b: real;
+
+begin
+  a := 1.5;
+  b := 2.25;
+  show(0);
+  writeln(a + b);
+  writeln(sum(3));
+  writeln(a * b + sum(2));
+end.
@@ -0,0 +1,23 @@
+var
+  i, count: integer;
+  total: real;
+
+function half(x: real): real;
+begin
+  count := count + 1;
+  Result := x / 2.0;
+end;
+
+begin
+  count := 0;
+  half(2.0);
+  writeln(1);
+  for i := 1 to 20 do
+    half(i * 1.0);
+  total := 0.0;
+  for i := 1 to 10 do
+    total := total + half(2.0);
+  writeln(count);
+  writeln(total);
+  writeln(half(3.0) + 1.0);
+end.
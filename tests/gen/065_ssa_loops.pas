@@ -0,0 +1,71 @@
+var
+  a, b, t, i, j, k, n, s: integer;
+
+function fib(m: integer): integer;
+var p, q, r, c: integer;
+begin
+  p := 0;
+  q := 1;
+  for c := 1 to m do
+  begin
+    r := p;
+    p := q;
+    q := r + q
+  end;;
+  result := p
+end;
+
+function last(m: integer): integer;
+var c, x, y: integer;
+begin
+  x := 1;
+  y := 0;
+  c := 0;
+  while c < m do
+  begin
+    y := x;
+    x := c * 10;
+    c := c + 1
+  end;;
+  result := x + y
+end;
+
+begin
+  a := 1;
+  b := 2;
+  for i := 1 to 3 do
+  begin
+    t := a;
+    a := b;
+    b := t
+  end;;
+  writeln(a, b);
+  writeln(fib(10), fib(1), fib(0));
+  writeln(last(0), last(1), last(4));
+  s := 0;
+  k := 1;
+  for i := 1 to 4 do
+  begin
+    j := 0;
+    while j < i do
+    begin
+      j := j + 1;
+      if j = 2 then
+        continue;
+      s := s + k;
+      k := k + 1;
+      if s > 30 then
+        break
+    end
+  end;;
+  writeln(s, k, j);
+  n := 5;
+  i := 0;
+  repeat
+  begin
+    n := n - 1;
+    i := i + n
+  end
+  until n = 0;
+  writeln(n, i)
+end.
@@ -0,0 +1,32 @@
+var
+  a: integer;
+  b: intger;
+  c: real;
+  d: integer;
+const
+  k = 5;
+
+function f(x: integer): integer;
+var y: integer;
+begin
+  y := x + z;
+  result := y;
+end;
+
+procedure p(q: intgr);
+begin
+  writeln(q);
+end;
+
+begin
+  a := 1;
+  a := a + ;
+  k := 3;
+  writeln(a, d);
+  if a > 0 then
+  begin
+    d := a @ 2;
+    a := (d + 1;
+    while a do a := a - 1
+  end
+end.
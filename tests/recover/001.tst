@@ -0,0 +1,30 @@
+var
+  a, b: integer;
+  r: record
+    x: integer;
+    y: rael;
+  end;
+  c: real;
+
+procedure p(var v: integer);
+begin
+  v := v + 1;
+end;
+
+function g(x: real): real;
+begin
+  result := x / 2;
+end;
+
+begin
+  a := 1;
+  p(5);
+  b := a and 1.5;
+  c := g(a);
+  a := g(c);
+  r.x := a;
+  while c do
+    a := a + 1;
+  p(a);
+  writeln(a, b, c)
+end.
@@ -0,0 +1,18 @@
+var
+  a: integer;
+  s: integer := 1;
+  t: array [1..$] of integer;
+  u: array [1..3] of integer;
+
+begin
+  a := 'text;
+  a := #300;
+  u[1] := 2 ! 3;
+  for a := 1 to 3 do
+    u[a] := a;
+  repeat
+    a := a - ;
+  until a = 0;
+  writeln(u[1], 1 +)
+end.
+{ comment without end
@@ -0,0 +1,10 @@
+const
+  c = integer + 1;
+var
+  x: integer;
+  r: real;
+
+begin
+  x := integer + 1;
+  r := real * 2.0;
+end.